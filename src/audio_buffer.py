@@ -0,0 +1,189 @@
+import threading
+import numpy as np
+
+
+class AudioBuffer:
+    """
+    A preallocated, growable int16 arena for microphone capture.
+
+    The audio callback appends blocks with a single slice copy, so no per-sample
+    Python work happens on the audio thread. Readers get zero-copy views into the
+    arena: frames for the VAD via `read_frame`, and the whole recording via `data`.
+
+    When the arena is full it is reallocated at twice the size. Views handed out
+    before the reallocation keep pointing at the old array, whose contents never
+    change again, so they stay valid. `take` moves samples within the arena, so it
+    is the one call that invalidates earlier views.
+    """
+
+    def __init__(self, sample_rate=16000, initial_seconds=30):
+        """
+        Initialize the buffer.
+
+        :param sample_rate: Sample rate of the audio that will be written
+        :param initial_seconds: Number of seconds to preallocate
+        """
+        self.sample_rate = sample_rate
+        self._data = np.empty(max(1, int(sample_rate * initial_seconds)), dtype=np.int16)
+        self._length = 0
+        self._read_pos = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def capacity(self):
+        """Number of samples that fit before the arena has to grow."""
+        return len(self._data)
+
+    @property
+    def duration(self):
+        """Duration of the buffered audio in seconds."""
+        return self._length / self.sample_rate
+
+    def write(self, samples):
+        """
+        Append a block of samples. Safe to call from the audio callback.
+
+        :param samples: 1-D int16 array (e.g. `indata[:, 0]`)
+        """
+        count = len(samples)
+        if count == 0:
+            return
+        with self._lock:
+            end = self._length + count
+            if end > len(self._data):
+                self._grow(end)
+            self._data[self._length:end] = samples
+            self._length = end
+
+    def _grow(self, min_capacity):
+        """Reallocate the arena to at least `min_capacity` samples. Caller holds the lock."""
+        capacity = len(self._data)
+        while capacity < min_capacity:
+            capacity *= 2
+        data = np.empty(capacity, dtype=np.int16)
+        data[:self._length] = self._data[:self._length]
+        self._data = data
+
+    @property
+    def read_position(self):
+        """Number of samples consumed by `read_frame` so far."""
+        return self._read_pos
+
+    def available(self):
+        """Number of samples written but not yet consumed by `read_frame`."""
+        return self._length - self._read_pos
+
+    def read_frame(self, frame_size):
+        """
+        Return the next unread frame as a zero-copy view, or None if a full frame
+        is not available yet.
+
+        :param frame_size: Number of samples per frame
+        """
+        with self._lock:
+            start = self._read_pos
+            if self._length - start < frame_size:
+                return None
+            self._read_pos = start + frame_size
+            return self._data[start:start + frame_size]
+
+    def data(self):
+        """Return a zero-copy view of everything recorded so far."""
+        with self._lock:
+            return self._data[:self._length]
+
+    def take(self, count):
+        """
+        Detach the first `count` samples and keep buffering the rest.
+
+        The detached samples are copied out, and the remaining samples are moved to the
+        start of the arena, so the arena is kept and only the utterance is copied. Views
+        returned earlier by `data` or `read_frame` must not be used after a take. Used to
+        cut utterances out of a long-lived stream.
+
+        :param count: Number of samples to detach, at most `len(self)`
+        :return: Copy of the detached samples
+        """
+        with self._lock:
+            count = min(count, self._length)
+            taken = self._data[:count].copy()
+            remaining = self._length - count
+            self._data[:remaining] = self._data[count:self._length]  # NumPy handles the overlap
+            self._length = remaining
+            self._read_pos = max(0, self._read_pos - count)
+            return taken
+
+    def clear(self):
+        """Discard all buffered audio, keeping the allocation."""
+        with self._lock:
+            self._length = 0
+            self._read_pos = 0
+
+
+class PreRollRing:
+    """
+    A fixed-size int16 ring holding the most recent audio.
+
+    Used to keep a short pre-roll between recordings: writes overwrite the oldest
+    samples with at most two slice copies, and `drain_into` moves the buffered audio,
+    oldest first, into an AudioBuffer when a recording starts.
+    """
+
+    def __init__(self, capacity):
+        """
+        Initialize the ring.
+
+        :param capacity: Maximum number of samples to keep
+        """
+        self._data = np.zeros(max(0, int(capacity)), dtype=np.int16)
+        self._pos = 0
+        self._filled = 0
+
+    def __len__(self):
+        return self._filled
+
+    def write(self, samples):
+        """
+        Append samples, overwriting the oldest ones once the ring is full.
+
+        :param samples: 1-D int16 array
+        """
+        capacity = len(self._data)
+        count = len(samples)
+        if capacity == 0 or count == 0:
+            return
+        if count >= capacity:
+            self._data[:] = samples[-capacity:]
+            self._pos = 0
+            self._filled = capacity
+            return
+
+        end = self._pos + count
+        if end <= capacity:
+            self._data[self._pos:end] = samples
+        else:
+            first = capacity - self._pos
+            self._data[self._pos:] = samples[:first]
+            self._data[:count - first] = samples[first:]
+        self._pos = end % capacity
+        self._filled = min(capacity, self._filled + count)
+
+    def drain_into(self, audio_buffer):
+        """
+        Write the buffered samples, oldest first, into an AudioBuffer and empty the ring.
+
+        :param audio_buffer: AudioBuffer to receive the pre-roll
+        :return: Number of samples written
+        """
+        count = self._filled
+        start = (self._pos - count) % len(self._data) if count else 0
+        if start + count <= len(self._data):
+            audio_buffer.write(self._data[start:start + count])
+        else:
+            audio_buffer.write(self._data[start:])
+            audio_buffer.write(self._data[:self._pos])
+        self._filled = 0
+        return count
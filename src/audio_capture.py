@@ -0,0 +1,159 @@
+import threading
+import sounddevice as sd
+
+import tracing
+from audio_buffer import PreRollRing
+from utils import ConfigManager
+
+# Try to import webrtcvad, but don't fail if it's not available
+try:
+    import webrtcvad
+    WEBRTCVAD_AVAILABLE = True
+except ImportError:
+    WEBRTCVAD_AVAILABLE = False
+    ConfigManager.console_print("webrtcvad not available, falling back to continuous recording mode")
+
+
+def get_input_device():
+    """
+    Return the configured input device index, falling back to the system default.
+    """
+    sound_device = ConfigManager.get_config_value('recording_options', 'sound_device')
+    if sound_device not in (None, ''):
+        try:
+            return int(sound_device)
+        except ValueError:
+            ConfigManager.console_print(f"Invalid sound device '{sound_device}', using default device.")
+    try:
+        return sd.query_devices(kind='input')['index']
+    except Exception as e:
+        ConfigManager.console_print(f"Error getting default device: {str(e)}")
+        return None
+
+
+class SpeechDetector:
+    """
+    Detect the start and end of speech over 30 ms frames using WebRTC VAD.
+    """
+
+    def __init__(self, sample_rate, silence_duration_ms, frame_duration_ms=30):
+        """
+        Initialize the detector.
+
+        :param sample_rate: Sample rate of the frames
+        :param silence_duration_ms: Silence after speech that ends an utterance
+        :param frame_duration_ms: Duration of each frame passed to `process`
+        """
+        self.sample_rate = sample_rate
+        self.vad = webrtcvad.Vad(1)  # Reduced VAD aggressiveness for better handling of quiet speech
+        self.silence_frames = int(silence_duration_ms / frame_duration_ms)
+        self.min_speech_frames = 3  # Minimum consecutive speech frames to confirm speech
+        self.reset()
+
+    def reset(self):
+        """Forget any speech seen so far."""
+        self.speech_detected = False
+        self.silent_frame_count = 0
+        self.speech_frame_count = 0  # Track consecutive speech frames
+
+    def process(self, frame):
+        """
+        Feed one frame to the detector.
+
+        :param frame: int16 frame of `frame_duration_ms` audio
+        :return: True once speech has been followed by enough silence to end the utterance
+        """
+        if self.vad.is_speech(frame.tobytes(), self.sample_rate):
+            self.speech_frame_count += 1
+            self.silent_frame_count = 0
+
+            # Only set speech_detected after enough consecutive speech frames
+            if self.speech_frame_count >= self.min_speech_frames and not self.speech_detected:
+                ConfigManager.console_print("Speech detected.")
+                tracing.instant('first_speech')
+                self.speech_detected = True
+        else:
+            self.speech_frame_count = 0
+            if self.speech_detected:
+                self.silent_frame_count += 1
+                if self.silent_frame_count == self.silence_frames + 1:
+                    tracing.instant('end_of_speech')
+
+        return self.speech_detected and self.silent_frame_count > self.silence_frames
+
+
+class CaptureService:
+    """
+    A long-lived microphone stream shared by all recordings.
+
+    Between recordings the stream keeps the last `pre_roll_duration` milliseconds in
+    a PreRollRing. When a recording starts, the pre-roll is spliced onto the front of
+    the recording's AudioBuffer and the callback switches to writing there, so the
+    first syllables are kept and no device-open latency is paid per activation.
+    """
+
+    FRAME_DURATION_MS = 30
+
+    def __init__(self):
+        """
+        Initialize the capture service from the recording options.
+        """
+        recording_options = ConfigManager.get_config_section('recording_options')
+        self.sample_rate = recording_options.get('sample_rate') or 16000
+        self.frame_size = int(self.sample_rate * (self.FRAME_DURATION_MS / 1000.0))
+        pre_roll_ms = recording_options.get('pre_roll_duration') or 0
+        self.pre_roll = PreRollRing(self.sample_rate * pre_roll_ms // 1000)
+        self.data_ready = threading.Event()
+        self.stream = None
+        self._target = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Open the input stream."""
+        if self.stream:
+            return
+        with tracing.span('stream_open', persistent=True):
+            self.stream = sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='int16',
+                                         blocksize=self.frame_size, device=get_input_device(),
+                                         callback=self._audio_callback)
+            self.stream.start()
+        ConfigManager.console_print('Persistent audio capture started.')
+
+    def stop(self):
+        """Close the input stream."""
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+    def is_active(self):
+        """Whether the stream is open and delivering audio."""
+        return self.stream is not None and self.stream.active
+
+    def begin_recording(self, audio_buffer):
+        """
+        Start routing audio into `audio_buffer`, preceded by the buffered pre-roll.
+
+        :param audio_buffer: AudioBuffer for the new recording
+        :return: Number of pre-roll samples written to the buffer
+        """
+        with self._lock:
+            self.data_ready.clear()
+            pre_roll_samples = self.pre_roll.drain_into(audio_buffer)
+            self._target = audio_buffer
+        return pre_roll_samples
+
+    def end_recording(self):
+        """Stop routing audio into the current recording and resume filling the pre-roll."""
+        with self._lock:
+            self._target = None
+
+    def _audio_callback(self, indata, frames, time, status):
+        if status:
+            ConfigManager.console_print(f"Audio callback status: {status}")
+        with self._lock:
+            if self._target is not None:
+                self._target.write(indata[:, 0])
+                self.data_ready.set()
+            else:
+                self.pre_roll.write(indata[:, 0])
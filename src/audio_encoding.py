@@ -0,0 +1,54 @@
+import io
+import time
+import soundfile as sf
+
+# Upload formats accepted by the transcription API: name -> (soundfile format, subtype, extension)
+UPLOAD_FORMATS = {
+    'flac': ('FLAC', 'PCM_16', 'flac'),
+    'ogg': ('OGG', 'OPUS', 'ogg'),
+    'mp3': ('MP3', 'MPEG_LAYER_III', 'mp3'),
+    'wav': ('WAV', 'PCM_16', 'wav'),
+}
+
+# Opus only supports these sample rates
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def encode_audio(audio_data, sample_rate, upload_format='mp3', compression_level=None):
+    """
+    Encode audio into an in-memory file ready to be uploaded.
+
+    Args:
+        audio_data: int16 numpy array
+        sample_rate: Sample rate of the audio
+        upload_format: One of UPLOAD_FORMATS
+        compression_level: Optional value between 0.0 (fastest, largest; highest MP3
+            and Opus bitrate) and 1.0 (slowest, smallest; lowest bitrate)
+
+    Returns:
+        Tuple of (file object positioned at the start and named with the format's
+        extension, encoded size in bytes, encode time in seconds)
+    """
+    if upload_format not in UPLOAD_FORMATS:
+        raise ValueError(f"Unsupported upload format '{upload_format}'. "
+                         f"Use one of: {', '.join(UPLOAD_FORMATS)}")
+    file_format, subtype, extension = UPLOAD_FORMATS[upload_format]
+    if subtype == 'OPUS' and sample_rate not in OPUS_SAMPLE_RATES:
+        raise ValueError(f'Opus does not support a sample rate of {sample_rate} Hz.')
+    if file_format == 'WAV':
+        compression_level = None  # Uncompressed
+    elif file_format == 'MP3' and compression_level is not None:
+        compression_level = min(compression_level, 0.95)  # LAME rejects the lowest bitrate at 16 kHz
+
+    start_time = time.perf_counter()
+    buffer = io.BytesIO()
+    # The API infers the format from the file name
+    buffer.name = f'audio.{extension}'
+    # soundfile converts int16 itself, so no float copy of the recording is made
+    sf.write(buffer, audio_data, sample_rate, subtype=subtype, format=file_format,
+             compression_level=compression_level)
+    encode_time = time.perf_counter() - start_time
+
+    size = buffer.getbuffer().nbytes
+    buffer.seek(0)
+    return buffer, size, encode_time
@@ -0,0 +1,114 @@
+import re
+import numpy as np
+
+
+def split_at_silence(audio_data, sample_rate, max_chunk_seconds, overlap_seconds=0.0, frame_duration_ms=30):
+    """
+    Split audio into chunks no longer than `max_chunk_seconds`, cutting at the quietest point.
+
+    Each cut is placed at the lowest-energy 30 ms frame in the last third of the chunk,
+    which in dictation is almost always a pause between words.
+
+    Args:
+        audio_data: int16 numpy array
+        sample_rate: Sample rate of the audio
+        max_chunk_seconds: Maximum chunk duration
+        overlap_seconds: Audio to repeat at the start of every chunk but the first,
+            so words cut at a boundary are heard in full by one of the chunks
+        frame_duration_ms: Frame size used for the energy analysis
+
+    Returns:
+        List of (start, end) sample ranges covering the audio in order
+    """
+    total = len(audio_data)
+    max_length = int(max_chunk_seconds * sample_rate)
+    if total <= max_length or max_length <= 0:
+        return [(0, total)]
+
+    frame_size = int(sample_rate * frame_duration_ms / 1000)
+    frame_count = total // frame_size
+    frames = audio_data[:frame_count * frame_size].reshape(frame_count, frame_size).astype(np.float32)
+    energy = np.sqrt(np.mean(frames * frames, axis=1))
+
+    cuts = []
+    start = 0
+    while total - start > max_length:
+        first_frame = (start + max_length * 2 // 3) // frame_size
+        last_frame = min((start + max_length) // frame_size, frame_count)
+        if last_frame > first_frame:
+            quietest = first_frame + int(np.argmin(energy[first_frame:last_frame]))
+            cut = quietest * frame_size + frame_size // 2
+        else:
+            cut = start + max_length
+        cuts.append((start, cut))
+        start = cut
+    cuts.append((start, total))
+
+    overlap = int(overlap_seconds * sample_rate)
+    return [(max(0, chunk_start - overlap) if i else chunk_start, chunk_end)
+            for i, (chunk_start, chunk_end) in enumerate(cuts)]
+
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
+
+
+def split_sentences(text, max_chunk_words):
+    """
+    Split text into chunks of whole sentences of up to `max_chunk_words` words.
+
+    A single sentence longer than the limit (or unpunctuated text) is split at word
+    boundaries.
+
+    Args:
+        text: Text to split
+        max_chunk_words: Maximum words per chunk
+
+    Returns:
+        List of chunks that join back into the text with single spaces
+    """
+    chunks = []
+    current = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        words = sentence.split()
+        if current and len(current) + len(words) > max_chunk_words:
+            chunks.append(' '.join(current))
+            current = []
+        current.extend(words)
+        while len(current) > max_chunk_words:
+            chunks.append(' '.join(current[:max_chunk_words]))
+            current = current[max_chunk_words:]
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+def last_sentence(text, max_words=30):
+    """Return the last sentence of `text`, limited to its last `max_words` words."""
+    sentences = _SENTENCE_END.split(text.strip())
+    return ' '.join(sentences[-1].split()[-max_words:])
+
+
+def _normalize(word):
+    return re.sub(r'[^\w]', '', word).lower()
+
+
+def stitch_transcripts(previous_text, text, max_overlap_words=8):
+    """
+    Remove the words at the start of `text` that repeat the end of `previous_text`.
+
+    Args:
+        previous_text: Text transcribed so far
+        text: Transcription of the next, possibly overlapping, chunk
+        max_overlap_words: Longest overlap to look for
+
+    Returns:
+        The part of `text` to append
+    """
+    previous_words = [_normalize(w) for w in previous_text.split()[-max_overlap_words:]]
+    words = text.split()
+    normalized = [_normalize(w) for w in words[:max_overlap_words]]
+
+    for size in range(min(len(previous_words), len(normalized)), 0, -1):
+        if previous_words[-size:] == normalized[:size]:
+            return ' '.join(words[size:])
+    return text.strip()
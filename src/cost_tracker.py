@@ -1,13 +1,91 @@
+import atexit
+import contextlib
+import gzip
 import json
 import os
-from datetime import datetime
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+from usage_analytics import UsageHistory
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Entry type stored with every line of the usage log -> usage_data list it belongs to
+ENTRY_TYPES = {
+    "whisper": "whisper_usage",
+    "gpt": "gpt_usage",
+    "local": "local_usage",
+    "typing": "typing_usage",
+}
+
 class CostTracker:
-    def __init__(self, log_file: str = "usage_costs.json"):
-        """Initialize the cost tracker."""
+    """
+    Track API usage and costs in an append-only JSON Lines log.
+
+    Every logged request is one line appended to `log_file`, so logging costs a small
+    write regardless of how much history there is. A usage log in the old single-JSON
+    format is migrated once, on first load.
+
+    Entries older than a retention period can be compacted: each old day becomes one
+    rollup line in the log and its entries move to a gzip archive segment.
+
+    Logging updates the in-memory totals at once and queues the line; a background
+    thread appends queued lines in batches, holding an advisory lock on the file so
+    other processes can append to the same log. Use get_cost_tracker() for the
+    instance shared by the application.
+    """
+
+    def __init__(self, log_file: str = "usage_costs.jsonl", legacy_file: Optional[str] = None,
+                 flush_interval: float = 1.0, batch_size: int = 50, archive_dir: Optional[str] = None):
+        """
+        Initialize the cost tracker.
+
+        Args:
+            log_file: JSON Lines file usage is appended to
+            legacy_file: Old-format JSON usage file to migrate from; defaults to
+                `log_file` with a .json extension
+            flush_interval: Longest time in seconds a logged entry waits before being
+                written; 0 writes every entry before the log call returns
+            batch_size: Number of queued entries that triggers a write right away
+            archive_dir: Directory compacted entries are archived in; defaults to
+                `log_file` without extension plus "_archive"
+        """
         self.log_file = log_file
+        self.legacy_file = legacy_file or os.path.splitext(log_file)[0] + ".json"
+        self.archive_dir = archive_dir or os.path.splitext(log_file)[0] + "_archive"
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()  # Requests may be logged from several threads at once
+        self._write_lock = threading.Lock()  # Serialises file writes; always taken before _lock
+        self._pending = []  # Lines logged but not yet written
+        self._pending_ready = threading.Condition(self._lock)
+        self._writer = None
+        self._closed = False
         self.usage_data = self._load_usage_data()
+
+        # Running totals, kept up to date on every log call so summaries are O(1)
+        self.totals = self._initialize_totals()
+        # Hourly ('YYYY-MM-DDTHH') and daily ('YYYY-MM-DD') rollups for date-range queries
+        self.hourly = {}
+        self.daily = {}
+        # Sorted timestamps per entry type, parallel to the usage_data lists, for bisecting
+        self._timestamps = {}
+        for entry_type, key in ENTRY_TYPES.items():
+            entries = self.usage_data[key]
+            entries.sort(key=lambda e: e["timestamp"])
+            self._timestamps[entry_type] = [e["timestamp"] for e in entries]
+            for entry in entries:
+                self._index_entry(entry_type, entry)
+        # Compacted days only have daily totals
+        for day, rollup in sorted(self.usage_data["rollups"].items()):
+            self._merge_totals(self.daily.setdefault(day, self._initialize_totals()), rollup)
+            self._merge_totals(self.totals, rollup)
         
         # API costs in USD
         self.api_costs = {
@@ -33,37 +111,363 @@ class CostTracker:
         }
 
     def _load_usage_data(self) -> Dict:
-        """Load existing usage data from file."""
-        if os.path.exists(self.log_file):
-            try:
-                with open(self.log_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return self._initialize_usage_data()
-        return self._initialize_usage_data()
+        """Load existing usage data from file, reading the old format if it hasn't been migrated yet."""
+        usage_data = self._initialize_usage_data()
+        self._migration_pending = False
+        if not os.path.exists(self.log_file):
+            if self.legacy_file != self.log_file and os.path.exists(self.legacy_file):
+                try:
+                    with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                        legacy_data = json.load(f)
+                    for key in ENTRY_TYPES.values():
+                        usage_data[key] = legacy_data.get(key, [])
+                    usage_data["total_cost"] = legacy_data.get("total_cost", 0.0)
+                    # Migrate on the first write, so merely loading never touches the files
+                    self._migration_pending = True
+                except (json.JSONDecodeError, OSError):
+                    pass
+            return usage_data
+
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    entry_type = entry.pop("type")
+                    if entry_type == "rollup":
+                        day = entry.pop("date")
+                        self._merge_totals(usage_data["rollups"].setdefault(day, self._initialize_totals()), entry)
+                        usage_data["total_cost"] += entry["total_cost"]
+                        continue
+                    key = ENTRY_TYPES[entry_type]
+                except (json.JSONDecodeError, KeyError, AttributeError):
+                    continue  # Skip a line torn by a crash mid-write
+                usage_data[key].append(entry)
+                usage_data["total_cost"] += entry.get("cost", entry.get("total_cost", 0.0))
+        return usage_data
+
+    def _migrate_legacy_file(self):
+        """Write the entries loaded from the old single-JSON file as the JSON Lines log. Caller holds the lock."""
+        temp_file = f"{self.log_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            for entry_type, key in ENTRY_TYPES.items():
+                for entry in self.usage_data[key]:
+                    f.write(json.dumps({"type": entry_type, **entry}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.log_file)
+        # Keep the old file as a backup rather than deleting it
+        os.replace(self.legacy_file, f"{self.legacy_file}.migrated")
+        self._migration_pending = False
 
     def _initialize_usage_data(self) -> Dict:
         """Initialize a new usage data structure."""
         return {
             "whisper_usage": [],
             "gpt_usage": [],
+            "local_usage": [],
+            "typing_usage": [],
+            "rollups": {},  # Day -> totals of entries compacted out of the log
             "total_cost": 0.0,
             "last_updated": datetime.now().isoformat()
         }
 
-    def _save_usage_data(self):
-        """Save usage data to file."""
-        self.usage_data["last_updated"] = datetime.now().isoformat()
-        with open(self.log_file, 'w') as f:
-            json.dump(self.usage_data, f, indent=2)
+    @staticmethod
+    def _initialize_totals() -> Dict:
+        """Initialize the running totals."""
+        return {
+            "whisper_duration_seconds": 0,
+            "whisper_cost": 0.0,
+            "num_transcriptions": 0,
+            "gpt_input_tokens": 0,
+            "gpt_output_tokens": 0,
+            "gpt_cost": 0.0,
+            "num_enhancements": 0,
+            "local_duration_seconds": 0,
+            "num_local_transcriptions": 0,
+            "typing_seconds": 0.0,
+            "typed_characters": 0,
+            "num_typed": 0,
+            "total_cost": 0.0,
+            "last_whisper_entry": None,
+            "last_gpt_entry": None,
+        }
+
+    def _index_entry(self, entry_type: str, entry: Dict):
+        """Add one entry to the running totals and its hourly and daily rollups."""
+        timestamp = entry["timestamp"]
+        self._add_to_totals(self.totals, entry_type, entry)
+        self._add_to_totals(self.hourly.setdefault(timestamp[:13], self._initialize_totals()), entry_type, entry)
+        self._add_to_totals(self.daily.setdefault(timestamp[:10], self._initialize_totals()), entry_type, entry)
+
+    @staticmethod
+    def _add_to_totals(totals: Dict, entry_type: str, entry: Dict):
+        """Add one entry to a set of totals."""
+        if entry_type == "whisper":
+            totals["whisper_duration_seconds"] += entry["duration_seconds"]
+            totals["whisper_cost"] += entry["cost"]
+            totals["num_transcriptions"] += 1
+            totals["total_cost"] += entry["cost"]
+            totals["last_whisper_entry"] = entry
+        elif entry_type == "local":
+            totals["local_duration_seconds"] += entry["duration_seconds"]
+            totals["num_local_transcriptions"] += 1
+        elif entry_type == "typing":
+            totals["typing_seconds"] += entry["latency"]["typing"]
+            totals["typed_characters"] += entry["characters"]
+            totals["num_typed"] += 1
+        else:
+            totals["gpt_input_tokens"] += entry["input_tokens"]
+            totals["gpt_output_tokens"] += entry["output_tokens"]
+            totals["gpt_cost"] += entry["total_cost"]
+            totals["num_enhancements"] += 1
+            totals["total_cost"] += entry["total_cost"]
+            totals["last_gpt_entry"] = entry
+
+    def snapshot(self) -> Dict:
+        """Return a copy of the running totals, to measure the usage of a request with usage_since()."""
+        with self._lock:
+            return dict(self.totals)
+
+    def usage_since(self, snapshot: Dict) -> Dict:
+        """
+        Return the usage logged since `snapshot` was taken.
+
+        Args:
+            snapshot: Totals returned by snapshot()
+
+        Returns:
+            Dictionary of the numeric totals' increase since the snapshot
+        """
+        with self._lock:
+            return {key: value - snapshot[key] for key, value in self.totals.items()
+                    if not key.startswith("last_")}
+
+    def _append_entry(self, entry_type: str, entry: Dict):
+        """Record an entry in memory and queue it to be appended to the log file."""
+        line = json.dumps({"type": entry_type, **entry}, ensure_ascii=False) + "\n"
+        if self._migration_pending:
+            with self._write_lock, self._lock:
+                if self._migration_pending:
+                    self._migrate_legacy_file()
+        with self._lock:
+            # Entries arrive in time order, unless the clock was turned back
+            timestamps = self._timestamps[entry_type]
+            index = bisect_right(timestamps, entry["timestamp"])
+            timestamps.insert(index, entry["timestamp"])
+            self.usage_data[ENTRY_TYPES[entry_type]].insert(index, entry)
+            self.usage_data["total_cost"] += entry.get("cost", entry.get("total_cost", 0.0))
+            self.usage_data["last_updated"] = entry["timestamp"]
+            self._index_entry(entry_type, entry)
+            self._pending.append(line)
+            if self.flush_interval > 0 and not self._closed:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._run_writer, name="CostTrackerWriter", daemon=True)
+                    self._writer.start()
+                if len(self._pending) >= self.batch_size:
+                    self._pending_ready.notify()
+                return
+        self.flush()
+
+    def _run_writer(self):
+        """Write queued lines whenever a batch fills up or the oldest has waited flush_interval."""
+        while True:
+            with self._pending_ready:
+                self._pending_ready.wait_for(lambda: self._pending or self._closed)
+                if self._closed:
+                    return
+                self._pending_ready.wait_for(lambda: len(self._pending) >= self.batch_size or self._closed,
+                                             self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Could not write usage log: {e}")
+                with self._pending_ready:
+                    self._pending_ready.wait(self.flush_interval)  # Retry the same lines later
+
+    def flush(self):
+        """
+        Append all queued lines to the log file.
+
+        The lines are written under an advisory file lock, then flushed and fsynced,
+        and a line torn by an earlier crash is terminated first, so one bad write never
+        corrupts the rest. If the write fails the lines stay queued.
+        """
+        with self._write_lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        """Append the queued lines to the log file. Caller holds the write lock."""
+        with self._lock:
+            lines, self._pending = self._pending, []
+        if not lines:
+            return
+        try:
+            with self._locked_log_file() as f:
+                data = "".join(lines).encode('utf-8')
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        data = b"\n" + data
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError:
+            with self._lock:
+                self._pending[:0] = lines
+            raise
+
+    @contextlib.contextmanager
+    def _locked_log_file(self):
+        """Open the log file holding an advisory lock, reopening it if compaction replaced it meanwhile."""
+        while True:
+            f = open(self.log_file, 'a+b')
+            self._lock_file(f)
+            if os.fstat(f.fileno()).st_ino == os.stat(self.log_file).st_ino:
+                break
+            self._unlock_file(f)
+            f.close()
+        try:
+            yield f
+        finally:
+            self._unlock_file(f)
+            f.close()
+
+    @staticmethod
+    def _lock_file(f):
+        """Take an exclusive advisory lock on an open file, waiting for other processes."""
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    @staticmethod
+    def _unlock_file(f):
+        """Release the lock taken by _lock_file()."""
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def compact(self, retention_days: int = 30) -> int:
+        """
+        Move entries older than `retention_days` out of the log file.
+
+        Each older day's entries are replaced in the log by one rollup line with the
+        day's totals, and appended in full to that day's gzip segment in `archive_dir`
+        (see get_archived_entries()). The log, and so the startup load, stays bounded by
+        the retention period plus one short line per older day. Summaries still count
+        compacted days, but a date range starting or ending inside one counts the
+        whole day.
+
+        Args:
+            retention_days: Number of days, counting today, whose entries stay in the log
+
+        Returns:
+            Number of entries archived
+        """
+        cutoff = (datetime.now() - timedelta(days=retention_days - 1)).strftime("%Y-%m-%d")
+        with self._write_lock:
+            if self._migration_pending:
+                with self._lock:
+                    self._migrate_legacy_file()
+            self._write_pending()
+            if not os.path.exists(self.log_file):
+                return 0
+
+            # Re-read the file rather than trusting memory: other processes may have appended to it
+            with self._locked_log_file() as f:
+                f.seek(0)
+                kept, rollups, archived = [], {}, {}
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        entry_type = entry.pop("type")
+                        if entry_type == "rollup":
+                            self._merge_totals(rollups.setdefault(entry.pop("date"), self._initialize_totals()), entry)
+                            continue
+                        day = entry["timestamp"][:10]
+                        if entry_type in ENTRY_TYPES and day < cutoff:
+                            self._add_to_totals(rollups.setdefault(day, self._initialize_totals()), entry_type, entry)
+                            archived.setdefault(day, []).append(line.rstrip(b"\n") + b"\n")
+                            continue
+                    except (json.JSONDecodeError, KeyError, AttributeError, TypeError):
+                        continue  # Drop lines torn by a crash mid-write
+                    kept.append(line.rstrip(b"\n") + b"\n")
+                if not archived:
+                    return 0
+
+                # Archive before rewriting the log, so a crash in between can't lose entries
+                os.makedirs(self.archive_dir, exist_ok=True)
+                for day, lines in archived.items():
+                    with gzip.open(self._archive_path(day), 'ab') as archive:
+                        archive.writelines(lines)
+
+                temp_file = f"{self.log_file}.tmp"
+                with open(temp_file, 'wb') as temp:
+                    for day, rollup in sorted(rollups.items()):
+                        rollup = {key: value for key, value in rollup.items() if not key.startswith("last_")}
+                        temp.write(json.dumps({"type": "rollup", "date": day, **rollup}).encode('utf-8') + b"\n")
+                    temp.writelines(kept)
+                    temp.flush()
+                    os.fsync(temp.fileno())
+                if fcntl:
+                    os.replace(temp_file, self.log_file)
+            if not fcntl:
+                # Windows can't replace a file that is open
+                os.replace(temp_file, self.log_file)
+
+        with self._lock:
+            for entry_type, key in ENTRY_TYPES.items():
+                index = bisect_left(self._timestamps[entry_type], cutoff)
+                del self._timestamps[entry_type][:index]
+                del self.usage_data[key][:index]
+            self.usage_data["rollups"] = rollups
+        return sum(len(lines) for lines in archived.values())
+
+    def _archive_path(self, day: str) -> str:
+        """Return the archive segment file of a day ('YYYY-MM-DD')."""
+        return os.path.join(self.archive_dir, f"{day}.jsonl.gz")
+
+    def get_archived_entries(self, day: str) -> List[Dict]:
+        """
+        Read the entries of a compacted day back from its archive segment.
+
+        Args:
+            day: Date in ISO format ('YYYY-MM-DD')
 
-    def log_whisper_usage(self, duration_seconds: float, model: str = "whisper-1"):
+        Returns:
+            List of the day's entries, each with its "type", oldest first
+        """
+        path = self._archive_path(day[:10])
+        if not os.path.exists(path):
+            return []
+        with gzip.open(path, 'rb') as archive:
+            # A compaction interrupted before rewriting the log archives its entries again next time
+            lines = dict.fromkeys(line.rstrip(b"\n") for line in archive if line.strip())
+        return sorted((json.loads(line) for line in lines), key=lambda entry: entry["timestamp"])
+
+    def close(self):
+        """Stop the background writer and write everything still queued."""
+        with self._pending_ready:
+            self._closed = True
+            self._pending_ready.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+
+    def log_whisper_usage(self, duration_seconds: float, model: str = "whisper-1",
+                          latency: Optional[Dict[str, float]] = None):
         """
         Log Whisper API usage.
         
         Args:
             duration_seconds: Length of the audio in seconds
             model: Whisper model used
+            latency: Optional seconds spent per stage, "encode" and "upload" (the
+                request, including decoding on the server)
         """
         # Round to nearest second as per OpenAI billing
         duration_seconds = round(duration_seconds)
@@ -76,10 +480,10 @@ class CostTracker:
             "duration_seconds": duration_seconds,
             "cost": cost
         }
+        if latency:
+            usage_entry["latency"] = latency
         
-        self.usage_data["whisper_usage"].append(usage_entry)
-        self.usage_data["total_cost"] += cost
-        self._save_usage_data()
+        self._append_entry("whisper", usage_entry)
         
         return cost
 
@@ -88,7 +492,9 @@ class CostTracker:
                       input_tokens: int,
                       output_tokens: int,
                       original_text: str,
-                      enhanced_text: str):
+                      enhanced_text: str,
+                      cached: bool = False,
+                      latency: Optional[Dict[str, float]] = None):
         """
         Log GPT API usage.
         
@@ -98,6 +504,8 @@ class CostTracker:
             output_tokens: Number of output tokens
             original_text: Original text before enhancement
             enhanced_text: Enhanced text after GPT processing
+            cached: Whether the enhancement was served from the cache without an API call
+            latency: Optional seconds spent per stage, "enhancement" for the request
         """
         input_cost = (input_tokens / 1000) * self.api_costs[model]["input"]
         output_cost = (output_tokens / 1000) * self.api_costs[model]["output"]
@@ -112,66 +520,238 @@ class CostTracker:
             "output_cost": output_cost,
             "total_cost": total_cost,
             "original_text": original_text,
-            "enhanced_text": enhanced_text
+            "enhanced_text": enhanced_text,
+            "cached": cached
         }
+        if latency:
+            usage_entry["latency"] = latency
         
-        self.usage_data["gpt_usage"].append(usage_entry)
-        self.usage_data["total_cost"] += total_cost
-        self._save_usage_data()
+        self._append_entry("gpt", usage_entry)
         
         return total_cost
 
+    def log_local_usage(self, duration_seconds: float, model: str, latency: Optional[Dict[str, float]] = None):
+        """
+        Log a transcription by a local model, which is free but worth tracking for its speed.
+
+        Args:
+            duration_seconds: Length of the audio in seconds
+            model: Local model used
+            latency: Optional seconds spent per stage, "decode" for the transcription
+        """
+        usage_entry = {
+            "timestamp": datetime.now().isoformat(),
+            "model": model,
+            "duration_seconds": round(duration_seconds, 2),
+            "cost": 0.0
+        }
+        if latency:
+            usage_entry["latency"] = latency
+
+        self._append_entry("local", usage_entry)
+
+    def log_typing(self, characters: int, seconds: float):
+        """
+        Log how long typing out a result took.
+
+        Args:
+            characters: Number of characters typed
+            seconds: Time spent typing
+        """
+        self._append_entry("typing", {
+            "timestamp": datetime.now().isoformat(),
+            "characters": characters,
+            "latency": {"typing": seconds}
+        })
+
     def get_usage_summary(self, 
                          start_date: Optional[str] = None,
-                         end_date: Optional[str] = None) -> Dict:
+                         end_date: Optional[str] = None,
+                         include_entries: bool = False) -> Dict:
         """
         Get a summary of API usage and costs.
+
+        Without a date range the summary comes from the running totals in O(1); with
+        one it comes from the hourly and daily rollups plus the two partial hours at its ends.
         
         Args:
             start_date: Optional start date in ISO format
             end_date: Optional end date in ISO format
+            include_entries: Whether to include the matching entries themselves
         
         Returns:
             Dictionary containing usage summary
         """
-        whisper_entries = self.usage_data["whisper_usage"]
-        gpt_entries = self.usage_data["gpt_usage"]
-        
-        if start_date:
-            whisper_entries = [e for e in whisper_entries 
-                             if e["timestamp"] >= start_date]
-            gpt_entries = [e for e in gpt_entries 
-                          if e["timestamp"] >= start_date]
-        
-        if end_date:
-            whisper_entries = [e for e in whisper_entries 
-                             if e["timestamp"] <= end_date]
-            gpt_entries = [e for e in gpt_entries 
-                          if e["timestamp"] <= end_date]
-        
-        total_whisper_cost = sum(e["cost"] for e in whisper_entries)
-        total_gpt_cost = sum(e["total_cost"] for e in gpt_entries)
-        
-        return {
-            "period_start": start_date or whisper_entries[0]["timestamp"] if whisper_entries else None,
-            "period_end": end_date or datetime.now().isoformat(),
+        if not start_date and not end_date:
+            with self._lock:
+                totals = dict(self.totals)
+                whisper_entries = self.usage_data["whisper_usage"] if include_entries else None
+                gpt_entries = self.usage_data["gpt_usage"] if include_entries else None
+                first_entry = self.usage_data["whisper_usage"][0] if self.usage_data["whisper_usage"] else None
+            return self._build_summary(totals, first_entry["timestamp"] if first_entry else None, None,
+                                       whisper_entries, gpt_entries)
+
+        start = self._normalize_timestamp(start_date) if start_date else None
+        end = self._normalize_timestamp(end_date) if end_date else None
+        with self._lock:
+            totals = self._range_totals(start, end)
+            whisper_entries = gpt_entries = None
+            if include_entries:
+                whisper_entries = self.usage_data["whisper_usage"][slice(*self._range_indices("whisper", start, end))]
+                gpt_entries = self.usage_data["gpt_usage"][slice(*self._range_indices("gpt", start, end))]
+            first, last = self._range_indices("whisper", start, end)
+            period_start = start_date or (self.usage_data["whisper_usage"][first]["timestamp"] if last > first else None)
+        return self._build_summary(totals, period_start, end_date, whisper_entries, gpt_entries)
+
+    def get_usage_history(self) -> UsageHistory:
+        """Return the entries in the log, compacted ones excluded, as a UsageHistory for columnar analytics."""
+        with self._lock:
+            entries = {entry_type: list(self.usage_data[key]) for entry_type, key in ENTRY_TYPES.items()}
+        return UsageHistory.from_entries(entries)
+
+    def get_daily_usage(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
+        """
+        Get per-day usage and cost, for charting.
+
+        Args:
+            start_date: Optional first day in ISO format
+            end_date: Optional last day in ISO format
+
+        Returns:
+            List of dictionaries with the day, Whisper duration, GPT tokens, request
+            counts and cost, one per day with usage, oldest first
+        """
+        with self._lock:
+            days = sorted(day for day in self.daily
+                          if (not start_date or day >= start_date[:10]) and (not end_date or day <= end_date[:10]))
+            return [{
+                "date": day,
+                "whisper_duration_seconds": self.daily[day]["whisper_duration_seconds"],
+                "gpt_tokens": self.daily[day]["gpt_input_tokens"] + self.daily[day]["gpt_output_tokens"],
+                "num_transcriptions": self.daily[day]["num_transcriptions"],
+                "num_enhancements": self.daily[day]["num_enhancements"],
+                "total_cost": self.daily[day]["total_cost"],
+            } for day in days]
+
+    @staticmethod
+    def _normalize_timestamp(value: str) -> str:
+        """Bring an ISO date or timestamp into the format entries are stored in."""
+        return datetime.fromisoformat(value).isoformat()
+
+    def _range_indices(self, entry_type: str, start: Optional[str], end: Optional[str]):
+        """Return the slice bounds of the entries between `start` and `end`, inclusive. Caller holds the lock."""
+        timestamps = self._timestamps[entry_type]
+        first = bisect_left(timestamps, start) if start else 0
+        last = bisect_right(timestamps, end) if end else len(timestamps)
+        return first, max(first, last)
+
+    def _scan_totals(self, totals: Dict, start: str, end: str):
+        """Add the entries between `start` and `end` to `totals`, found by bisecting. Caller holds the lock."""
+        for entry_type, key in ENTRY_TYPES.items():
+            first, last = self._range_indices(entry_type, start, end)
+            for entry in self.usage_data[key][first:last]:
+                self._add_to_totals(totals, entry_type, entry)
+
+    def _range_totals(self, start: Optional[str], end: Optional[str]) -> Dict:
+        """
+        Total the usage between `start` and `end`, inclusive. Caller holds the lock.
+
+        Whole days come from the daily rollups and whole hours from the hourly ones;
+        only the partial first and last hours are scanned entry by entry. Compacted
+        days only have a daily rollup, so a range starting or ending inside one counts
+        the whole day.
+        """
+        totals = self._initialize_totals()
+        rollups = self.usage_data["rollups"]
+        # Clamp the range to the logged entries so the walk over buckets stays short
+        bounds = [ts for timestamps in self._timestamps.values() if timestamps for ts in (timestamps[0], timestamps[-1])]
+        bounds += [f"{day}T{time}" for day in rollups for time in ("00:00:00", "23:59:59.999999")]
+        if not bounds:
+            return totals
+        start = max(start or min(bounds), min(bounds))
+        end = min(end or max(bounds), max(bounds))
+        if start[:10] in rollups:
+            start = f"{start[:10]}T00:00:00"
+        if end[:10] in rollups:
+            if end == f"{end[:10]}T00:00:00":
+                # Ends where the compacted day begins, so none of it is in the range
+                end = (datetime.fromisoformat(end) - timedelta(microseconds=1)).isoformat()
+            else:
+                end = f"{end[:10]}T23:59:59.999999"
+        if start > end:
+            return totals
+
+        first_hour = datetime.strptime(start[:13], "%Y-%m-%dT%H")
+        last_hour = datetime.strptime(end[:13], "%Y-%m-%dT%H")
+        if first_hour == last_hour:
+            self._scan_totals(totals, start, end)
+            return totals
+
+        hour = first_hour
+        if start > first_hour.isoformat():
+            # Starts inside its first hour
+            self._scan_totals(totals, start, f"{start[:13]}:59:59.999999")
+            hour += timedelta(hours=1)
+        while hour <= last_hour:
+            day = hour.strftime("%Y-%m-%d")
+            if hour.hour == 0 and end >= f"{day}T23:59:59.999999":
+                self._merge_totals(totals, self.daily.get(day))
+                hour += timedelta(days=1)
+            elif hour < last_hour:
+                self._merge_totals(totals, self.hourly.get(hour.strftime("%Y-%m-%dT%H")))
+                hour += timedelta(hours=1)
+            else:
+                # Ends inside its last hour
+                self._scan_totals(totals, last_hour.isoformat(), end)
+                break
+        return totals
+
+    @staticmethod
+    def _merge_totals(totals: Dict, other: Optional[Dict]):
+        """Add a rollup to `totals`; rollups must be merged oldest first."""
+        if not other:
+            return
+        for key, value in other.items():
+            if key.startswith("last_"):
+                totals[key] = value or totals[key]
+            else:
+                totals[key] += value
+
+    @staticmethod
+    def _build_summary(totals: Dict, period_start: Optional[str], period_end: Optional[str],
+                       whisper_entries: Optional[List], gpt_entries: Optional[List]) -> Dict:
+        """Shape totals into the summary returned by get_usage_summary()."""
+        summary = {
+            "period_start": period_start,
+            "period_end": period_end or datetime.now().isoformat(),
             "whisper_usage": {
-                "total_duration_seconds": sum(e["duration_seconds"] for e in whisper_entries),
-                "total_cost": total_whisper_cost,
-                "num_transcriptions": len(whisper_entries),
-                "entries": whisper_entries  # Include full entries
+                "total_duration_seconds": totals["whisper_duration_seconds"],
+                "total_cost": totals["whisper_cost"],
+                "num_transcriptions": totals["num_transcriptions"],
             },
             "gpt_usage": {
-                "total_input_tokens": sum(e["input_tokens"] for e in gpt_entries),
-                "total_output_tokens": sum(e["output_tokens"] for e in gpt_entries),
-                "total_cost": total_gpt_cost,
-                "num_enhancements": len(gpt_entries),
-                "entries": gpt_entries  # Include full entries
+                "total_input_tokens": totals["gpt_input_tokens"],
+                "total_output_tokens": totals["gpt_output_tokens"],
+                "total_cost": totals["gpt_cost"],
+                "num_enhancements": totals["num_enhancements"],
+            },
+            "local_usage": {
+                "total_duration_seconds": totals["local_duration_seconds"],
+                "num_transcriptions": totals["num_local_transcriptions"],
             },
-            "total_cost": total_whisper_cost + total_gpt_cost,
-            "last_whisper_entry": whisper_entries[-1] if whisper_entries else None,
-            "last_gpt_entry": gpt_entries[-1] if gpt_entries else None
+            "typing": {
+                "total_seconds": totals["typing_seconds"],
+                "total_characters": totals["typed_characters"],
+                "num_results": totals["num_typed"],
+            },
+            "total_cost": totals["total_cost"],
+            "last_whisper_entry": totals["last_whisper_entry"],
+            "last_gpt_entry": totals["last_gpt_entry"]
         }
+        if whisper_entries is not None:
+            summary["whisper_usage"]["entries"] = whisper_entries
+            summary["gpt_usage"]["entries"] = gpt_entries
+        return summary
 
     def get_detailed_usage(self,
                           limit: int = 10,
@@ -197,4 +777,19 @@ class CostTracker:
         return {
             "recent_whisper_usage": whisper_entries,
             "recent_gpt_usage": gpt_entries
-        }
\ No newline at end of file
+        }
+
+
+_shared_tracker = None
+_shared_tracker_lock = threading.Lock()
+
+
+def get_cost_tracker() -> CostTracker:
+    """Return the cost tracker shared by the whole application, loading it on first use."""
+    global _shared_tracker
+    with _shared_tracker_lock:
+        if _shared_tracker is None:
+            _shared_tracker = CostTracker()
+            # Don't lose queued entries if the app exits without calling close()
+            atexit.register(_shared_tracker.close)
+        return _shared_tracker
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class EnhancementCache:
+    """
+    A persistent, size-bounded LRU cache of GPT enhancements.
+
+    Entries are content-addressed: the key is a hash of the normalised text and every
+    input that changes the enhancement (language, system prompt version, model and
+    temperature), so a changed prompt or model never returns a stale result.
+
+    Changes are written by a background thread at most once per `save_interval`,
+    so storing an enhancement doesn't rewrite the file; call close() to write the
+    last changes.
+    """
+
+    def __init__(self, cache_file: str = "enhancement_cache.json", max_entries: int = 1000,
+                 save_interval: float = 5.0):
+        """
+        Initialize the cache, loading existing entries from disk.
+
+        Args:
+            cache_file: JSON file the cache is stored in
+            max_entries: Maximum number of cached enhancements
+            save_interval: Seconds changes are collected before the file is written
+        """
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.save_interval = save_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._dirty = False
+        self._closed = False
+        self._saver = None
+        self._entries = self._load_entries()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load_entries(self) -> OrderedDict:
+        """Load cached entries from file, least recently used first."""
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return OrderedDict(json.load(f))
+            except (json.JSONDecodeError, TypeError, ValueError):
+                pass
+        return OrderedDict()
+
+    def _save_entries(self, entries):
+        """Write the cache to file atomically."""
+        temp_file = f"{self.cache_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(temp_file, self.cache_file)
+
+    def _mark_changed(self):
+        """Schedule a write of the changed cache. Caller holds the lock."""
+        self._dirty = True
+        if self._saver is None and not self._closed:
+            self._saver = threading.Thread(target=self._run_saver, name="EnhancementCacheSaver", daemon=True)
+            self._saver.start()
+        self._changed.notify_all()
+
+    def _run_saver(self):
+        """Write the cache once changes have been collected for save_interval."""
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._dirty or self._closed)
+                if self._closed:
+                    return
+                self._changed.wait_for(lambda: self._closed, self.save_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Could not write enhancement cache: {e}")
+
+    def flush(self):
+        """Write the cache to file if it has changed since the last write."""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries, self._dirty = list(self._entries.items()), False
+        try:
+            self._save_entries(entries)
+        except OSError:
+            with self._lock:
+                self._dirty = True
+            raise
+
+    def close(self):
+        """Stop the background writer and write any unsaved changes."""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        if self._saver is not None:
+            self._saver.join()
+        self.flush()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalise text so trivially different transcriptions share an entry."""
+        return re.sub(r'\s+', ' ', text).strip().lower()
+
+    @classmethod
+    def make_key(cls, text: str, language: Optional[str], prompt_version: str,
+                 model: str, temperature: float) -> str:
+        """
+        Build the cache key for an enhancement request.
+
+        Args:
+            text: Text to enhance
+            language: Detected language of the text
+            prompt_version: Version of the system prompt
+            model: GPT model used
+            temperature: Sampling temperature
+        """
+        material = json.dumps([cls.normalize(text), language, prompt_version, model, temperature])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached enhancement for `key`, or None on a miss."""
+        with self._lock:
+            enhanced_text = self._entries.get(key)
+            if enhanced_text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return enhanced_text
+
+    def put(self, key: str, enhanced_text: str):
+        """Store an enhancement, evicting the least recently used entries over the limit."""
+        with self._lock:
+            self._entries[key] = enhanced_text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._mark_changed()
+
+    def clear(self):
+        """Remove all cached enhancements."""
+        with self._lock:
+            self._entries.clear()
+            self._mark_changed()
@@ -4,6 +4,7 @@ import signal
 import time
 from pynput.keyboard import Controller as PynputController, Key
 
+import tracing
 from utils import ConfigManager
 
 def run_command_or_exit_on_failure(command):
@@ -51,31 +52,36 @@ class InputSimulator:
             os.kill(self.dotool_process.pid, signal.SIGINT)
             self.dotool_process = None
 
-    def typewrite(self, text):
+    def typewrite(self, text, incremental=False):
         """
         Simulate typing the given text with the specified interval between keystrokes.
 
         Args:
             text (str): The text to type.
+            incremental (bool): Whether the text continues text that was just typed,
+                in which case no settling delays are added around it.
         """
         interval = ConfigManager.get_config_value('post_processing', 'writing_key_press_delay')
-        if self.input_method == 'pynput':
-            self._typewrite_pynput(text, interval)
-        elif self.input_method == 'ydotool':
-            self._typewrite_ydotool(text, interval)
-        elif self.input_method == 'dotool':
-            self._typewrite_dotool(text, interval)
+        with tracing.span('typing', characters=len(text), method=self.input_method):
+            if self.input_method == 'pynput':
+                self._typewrite_pynput(text, interval, incremental)
+            elif self.input_method == 'ydotool':
+                self._typewrite_ydotool(text, interval)
+            elif self.input_method == 'dotool':
+                self._typewrite_dotool(text, interval)
 
-    def _typewrite_pynput(self, text, interval):
+    def _typewrite_pynput(self, text, interval, incremental=False):
         """
         Simulate typing using pynput with improved reliability.
 
         Args:
             text (str): The text to type.
             interval (float): The interval between keystrokes in seconds.
+            incremental (bool): Whether to skip the delays before and after typing.
         """
         # Small delay before starting to type
-        time.sleep(0.2)
+        if not incremental:
+            time.sleep(0.2)
 
         # Instead of clearing existing text, just insert at current position
         for char in text:
@@ -97,7 +103,8 @@ class InputSimulator:
                 continue
 
         # Add a small delay after finishing
-        time.sleep(0.1)
+        if not incremental:
+            time.sleep(0.1)
 
     def _typewrite_ydotool(self, text, interval):
         """
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 from enum import Enum, auto
 from typing import Callable, Set
 
+import tracing
 from utils import ConfigManager
 
 
@@ -394,6 +395,7 @@ class KeyListener:
         is_active = self.key_chord.update(key, event_type)
 
         if not was_active and is_active:
+            tracing.instant('key_press')
             self._trigger_callbacks("on_activate")
         elif was_active and not is_active:
             self._trigger_callbacks("on_deactivate")
@@ -1,5 +1,7 @@
+import copy
 import os
 import sys
+import threading
 import time
 from audioplayer import AudioPlayer
 from pynput.keyboard import Controller
@@ -7,16 +9,30 @@ from PyQt5.QtCore import QObject, QProcess
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction, QMessageBox
 
+from audio_capture import CaptureService
 from key_listener import KeyListener
+from pipeline import ContinuousPipeline
 from result_thread import ResultThread
 from ui.main_window import MainWindow
 from ui.settings_window import SettingsWindow
 from ui.status_window import StatusWindow
-from transcription import create_local_model
+from model_loader import ModelLoader
+from cost_tracker import get_cost_tracker
+from openai_client import close_clients
+from prompts import preload as preload_prompts
+import tracing
 from input_simulation import InputSimulator
 from utils import ConfigManager
 
 
+# Settings that are only read when components are created, so changing them needs a restart
+RESTART_SETTINGS = [
+    ('recording_options',),
+    ('post_processing', 'input_method'),
+    ('misc', 'hide_status_window'),
+]
+
+
 class WhisperWitApp(QObject):
     def __init__(self):
         """
@@ -27,10 +43,12 @@ class WhisperWitApp(QObject):
         self.app.setWindowIcon(QIcon(os.path.join('assets', 'ww-logo.png')))
 
         ConfigManager.initialize()
+        tracing.configure(ConfigManager.get_config_value('misc', 'tracing'))
 
         self.settings_window = SettingsWindow()
         self.settings_window.settings_closed.connect(self.on_settings_closed)
-        self.settings_window.settings_saved.connect(self.restart_app)
+        self.settings_window.settings_saved.connect(self.apply_settings)
+        self.applied_restart_settings = None
 
         if ConfigManager.config_file_exists():
             self.initialize_components()
@@ -48,11 +66,28 @@ class WhisperWitApp(QObject):
         self.key_listener.add_callback("on_activate", self.on_activation)
         self.key_listener.add_callback("on_deactivate", self.on_deactivation)
 
-        model_options = ConfigManager.get_config_section('model_options')
-        model_path = model_options.get('local', {}).get('model_path')
-        self.local_model = create_local_model() if not model_options.get('use_api') else None
+        self.applied_restart_settings = self.get_restart_settings()
+
+        # Load the local model in the background so the UI comes up immediately
+        self.model_loader = None
+        self.retired_loaders = []
+        self.create_model_loader()
 
         self.result_thread = None
+        self.pipeline = None
+        self.result_streamed = False
+        # Typing time of the result being typed, logged once it is complete
+        self.typing_time = 0.0
+        self.typed_characters = 0
+
+        self.capture_service = None
+        if ConfigManager.get_config_value('recording_options', 'persistent_capture'):
+            try:
+                self.capture_service = CaptureService()
+                self.capture_service.start()
+            except Exception as e:
+                ConfigManager.console_print(f'Could not start persistent audio capture: {e}')
+                self.capture_service = None
 
         self.main_window = MainWindow()
         self.main_window.openSettings.connect(self.settings_window.show)
@@ -60,9 +95,7 @@ class WhisperWitApp(QObject):
         self.main_window.closeApp.connect(self.exit_app)
 
         # Initialize metrics with current values
-        from cost_tracker import CostTracker
-        cost_tracker = CostTracker()
-        summary = cost_tracker.get_usage_summary()
+        summary = get_cost_tracker().get_usage_summary()
         if summary:
             whisper_duration = summary['whisper_usage']['total_duration_seconds']
             gpt_tokens = (summary['gpt_usage']['total_input_tokens'] +
@@ -76,6 +109,41 @@ class WhisperWitApp(QObject):
         self.create_tray_icon()
         self.main_window.show()
 
+        if self.model_loader:
+            self.model_loader.start()
+
+        # Keep the usage log short by archiving old requests, off the UI thread
+        retention_days = ConfigManager.get_config_value('misc', 'usage_log_retention_days')
+        if retention_days:
+            threading.Thread(target=get_cost_tracker().compact, args=(retention_days,), daemon=True).start()
+
+        # Load the tokenizer and count the enhancement prompts off the UI thread
+        if ConfigManager.get_config_value('post_processing', 'enhance_with_gpt'):
+            gpt_model = ConfigManager.get_config_value('post_processing', 'gpt_model') or 'gpt-4o-2024-08-06'
+            threading.Thread(target=preload_prompts, args=(gpt_model,), daemon=True).start()
+
+    def create_model_loader(self):
+        """
+        Create a background loader for the configured local model, if one is used.
+        """
+        old_loader = self.model_loader
+        if old_loader and old_loader.isRunning():
+            # Ignore the replaced loader's result, but keep it referenced until its thread has
+            # finished; Qt aborts if a QThread is destroyed while it is still running
+            old_loader.statusSignal.disconnect(self.on_model_status)
+            old_loader.modelLoaded.disconnect(self.on_model_loaded)
+            self.retired_loaders.append(old_loader)
+            old_loader.finished.connect(lambda: self.retired_loaders.remove(old_loader))
+
+        self.local_model = None
+        self.model_loader = None
+        self.model_status = 'ready'
+        if not ConfigManager.get_config_value('model_options', 'use_api'):
+            self.model_status = 'loading'
+            self.model_loader = ModelLoader()
+            self.model_loader.statusSignal.connect(self.on_model_status)
+            self.model_loader.modelLoaded.connect(self.on_model_loaded)
+
     def create_tray_icon(self):
         """
         Create the system tray icon and its context menu.
@@ -97,13 +165,56 @@ class WhisperWitApp(QObject):
         tray_menu.addAction(exit_action)
 
         self.tray_icon.setContextMenu(tray_menu)
+        self.update_tray_tooltip()
         self.tray_icon.show()
 
+    def update_tray_tooltip(self):
+        """
+        Show the local model state in the tray icon tooltip.
+        """
+        tooltips = {
+            'loading': 'WhisperWit - Loading model...',
+            'ready': 'WhisperWit - Ready',
+            'error': 'WhisperWit - Model failed to load',
+        }
+        self.tray_icon.setToolTip(tooltips.get(self.model_status, 'WhisperWit'))
+
+    def on_model_status(self, status):
+        """
+        Surface the background model loading state in the tray and status window.
+        """
+        if self.sender() is not self.model_loader:
+            return  # A loader replaced by a later settings change
+        self.model_status = status
+        self.update_tray_tooltip()
+
+        # Don't interrupt the status of a recording in progress
+        busy = ((self.result_thread and self.result_thread.isRunning()) or
+                (self.pipeline and self.pipeline.isRunning()))
+        if not busy and not ConfigManager.get_config_value('misc', 'hide_status_window'):
+            self.status_window.updateStatus(status)
+
+    def on_model_loaded(self, model):
+        """
+        Keep the loaded model for the next recordings.
+        """
+        if self.sender() is self.model_loader:
+            self.local_model = model
+
     def cleanup(self):
         if self.key_listener:
             self.key_listener.stop()
         if self.input_simulator:
             self.input_simulator.cleanup()
+        if self.capture_service:
+            self.capture_service.stop()
+        close_clients()
+        get_cost_tracker().close()
+        if tracing.is_enabled():
+            trace_file = ConfigManager.get_config_value('misc', 'trace_file') or 'trace.json'
+            event_count = tracing.export_chrome_trace(trace_file)
+            ConfigManager.console_print(f'Wrote {event_count} trace events to {trace_file}.')
+            ConfigManager.console_print(tracing.format_histograms(tracing.stage_histograms()))
 
     def exit_app(self):
         """
@@ -112,6 +223,30 @@ class WhisperWitApp(QObject):
         self.cleanup()
         QApplication.quit()
 
+    def get_restart_settings(self):
+        """
+        Snapshot the settings that require a restart to take effect.
+        """
+        return [copy.deepcopy(ConfigManager.get_config_value(*keys)) for keys in RESTART_SETTINGS]
+
+    def apply_settings(self):
+        """
+        Apply saved settings in place, restarting only if a setting that needs it changed.
+
+        Model changes are picked up by a new background loader; models still cached in the
+        model registry are switched to without reloading their weights.
+        """
+        if self.applied_restart_settings is None or self.get_restart_settings() != self.applied_restart_settings:
+            self.restart_app()
+            return
+
+        ConfigManager.console_print('Applying settings without restarting...')
+        tracing.configure(ConfigManager.get_config_value('misc', 'tracing'))
+        self.create_model_loader()
+        self.update_tray_tooltip()
+        if self.model_loader:
+            self.model_loader.start()
+
     def restart_app(self):
         """Restart the application to apply the new settings."""
         self.cleanup()
@@ -134,6 +269,11 @@ class WhisperWitApp(QObject):
         """
         Called when the activation key combination is pressed.
         """
+        if self.pipeline and self.pipeline.isRunning():
+            # Stop capturing; utterances already recorded are still transcribed and typed
+            self.pipeline.finish()
+            return
+
         if self.result_thread and self.result_thread.isRunning():
             recording_mode = ConfigManager.get_config_value('recording_options', 'recording_mode')
             if recording_mode == 'press_to_toggle':
@@ -159,35 +299,83 @@ class WhisperWitApp(QObject):
         if self.result_thread and self.result_thread.isRunning():
             return
 
-        self.result_thread = ResultThread(self.local_model, self.main_window)
+        if ConfigManager.get_config_value('recording_options', 'recording_mode') == 'continuous':
+            self.start_pipeline()
+            return
+
+        self.result_thread = ResultThread(self.local_model, self.main_window, self.capture_service,
+                                          self.model_loader)
         if not ConfigManager.get_config_value('misc', 'hide_status_window'):
             self.result_thread.statusSignal.connect(self.status_window.updateStatus)
             self.status_window.closeSignal.connect(self.stop_result_thread)
+        self.result_thread.textSignal.connect(self.on_text_streamed)
         self.result_thread.resultSignal.connect(self.on_transcription_complete)
         self.result_thread.metricsUpdated.connect(self.main_window.update_metrics)
         self.result_thread.wordSignal.connect(self.main_window.add_word)
         self.main_window.word_display.clear()  # Clear previous words
         self.result_thread.start()
 
+    def start_pipeline(self):
+        """
+        Start the overlapped capture/transcription pipeline used by the continuous mode.
+        """
+        if self.pipeline and self.pipeline.isRunning():
+            return
+
+        self.pipeline = ContinuousPipeline(self.local_model, self.main_window, self.capture_service,
+                                           self.model_loader)
+        worker = self.pipeline.worker
+        if not ConfigManager.get_config_value('misc', 'hide_status_window'):
+            self.pipeline.capture_thread.statusSignal.connect(self.status_window.updateStatus)
+            worker.statusSignal.connect(self.status_window.updateStatus)
+            self.status_window.closeSignal.connect(self.stop_result_thread)
+        worker.textSignal.connect(self.on_text_streamed)
+        worker.resultSignal.connect(self.on_transcription_complete)
+        worker.metricsUpdated.connect(self.main_window.update_metrics)
+        worker.wordSignal.connect(self.main_window.add_word)
+        self.main_window.word_display.clear()  # Clear previous words
+        self.pipeline.start()
+
     def stop_result_thread(self):
         """
         Stop the result thread.
         """
         if self.result_thread and self.result_thread.isRunning():
             self.result_thread.stop()
+        if self.pipeline and self.pipeline.isRunning():
+            self.pipeline.stop()
+
+    def on_text_streamed(self, text):
+        """
+        Type a piece of the result as soon as streaming enhancement produces it.
+        """
+        start_time = time.perf_counter()
+        self.input_simulator.typewrite(text, incremental=self.result_streamed)
+        self.typing_time += time.perf_counter() - start_time
+        self.typed_characters += len(text)
+        self.result_streamed = True
 
     def on_transcription_complete(self, result):
         """
         When the transcription is complete, type the result and start listening for the activation key again.
         """
-        self.input_simulator.typewrite(result)
+        # A streamed result has already been typed piece by piece
+        if not self.result_streamed:
+            start_time = time.perf_counter()
+            self.input_simulator.typewrite(result)
+            self.typing_time += time.perf_counter() - start_time
+            self.typed_characters += len(result)
+        if self.typed_characters:
+            get_cost_tracker().log_typing(self.typed_characters, self.typing_time)
+        self.result_streamed = False
+        self.typing_time = 0.0
+        self.typed_characters = 0
 
         if ConfigManager.get_config_value('misc', 'noise_on_completion'):
             AudioPlayer(os.path.join('assets', 'beep.wav')).play(block=True)
 
-        if ConfigManager.get_config_value('recording_options', 'recording_mode') == 'continuous':
-            self.start_result_thread()
-        else:
+        # In continuous mode the pipeline keeps recording while results are typed
+        if ConfigManager.get_config_value('recording_options', 'recording_mode') != 'continuous':
             self.key_listener.start()
 
     def run(self):
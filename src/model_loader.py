@@ -0,0 +1,60 @@
+import threading
+import time
+import traceback
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from transcription import create_local_model, warm_up_local_model
+from utils import ConfigManager
+
+
+class ModelLoader(QThread):
+    """
+    Load and warm up the local model off the UI thread.
+
+    Recordings started while the model is loading keep their audio and call
+    `wait_for_model` before transcribing, instead of failing or loading a second copy.
+
+    Signals:
+        statusSignal: Emits 'loading', 'ready' or 'error'
+        modelLoaded: Emits the loaded model
+    """
+
+    statusSignal = pyqtSignal(str)
+    modelLoaded = pyqtSignal(object)
+
+    def __init__(self):
+        """Initialize the ModelLoader."""
+        super().__init__()
+        self.model = None
+        self._done = threading.Event()
+
+    def run(self):
+        """Main execution method for the thread."""
+        self.statusSignal.emit('loading')
+        try:
+            start_time = time.time()
+            model = create_local_model()
+            warm_up_local_model(model)
+            ConfigManager.console_print(f'Local model ready in {time.time() - start_time:.2f} seconds.')
+            self.model = model
+            self.modelLoaded.emit(model)
+            self.statusSignal.emit('ready')
+        except Exception:
+            traceback.print_exc()
+            self.statusSignal.emit('error')
+        finally:
+            self._done.set()
+
+    def is_ready(self):
+        """Whether the model has finished loading."""
+        return self.model is not None
+
+    def wait_for_model(self, timeout=None):
+        """
+        Block until loading has finished.
+
+        :param timeout: Optional timeout in seconds
+        :return: The loaded model, or None if loading failed or timed out
+        """
+        self._done.wait(timeout)
+        return self.model
@@ -0,0 +1,145 @@
+import gc
+import os
+import threading
+from collections import OrderedDict
+
+from utils import ConfigManager
+
+# Approximate parameter counts (millions) of the Whisper checkpoints, used to estimate memory
+MODEL_PARAMETERS_M = {
+    'tiny': 39,
+    'base': 74,
+    'small': 244,
+    'medium': 769,
+    'large': 1550,
+    'large-v1': 1550,
+    'large-v2': 1550,
+    'large-v3': 1550,
+}
+
+BYTES_PER_PARAMETER = {
+    'float32': 4,
+    'float16': 2,
+    'int8': 1,
+}
+
+
+def estimate_model_size(model, device, compute_type):
+    """
+    Estimate the resident size of a model in bytes.
+
+    Args:
+        model: Model name or path to a converted model directory
+        device: 'cpu', 'cuda' or 'auto'
+        compute_type: Compute type the model is loaded with
+    """
+    if os.path.isdir(model):
+        weights = os.path.join(model, 'model.bin')
+        if os.path.isfile(weights):
+            return os.path.getsize(weights)
+
+    parameters = MODEL_PARAMETERS_M.get(model.replace('.en', ''), MODEL_PARAMETERS_M['large']) * 1_000_000
+    # 'default' keeps the checkpoint's float16 weights on GPU and float32 on CPU
+    bytes_per_parameter = BYTES_PER_PARAMETER.get(compute_type, 2 if device == 'cuda' else 4)
+    return parameters * bytes_per_parameter
+
+
+class ModelRegistry:
+    """
+    A process-wide LRU cache of loaded Whisper models.
+
+    Models are keyed by the (model, device, compute_type, num_workers) configuration they
+    were loaded with, so switching back to a configuration that is still resident doesn't
+    reload its weights. A model that fell back to another device is cached under the device
+    it runs on, and requests for the original configuration are pointed at it. When the
+    estimated size of the cached models exceeds the memory budget, the least recently used
+    ones are dropped.
+
+    Models are loaded outside the lock, so lookups of resident models don't wait for a
+    load; concurrent requests for a configuration being loaded wait for that load instead
+    of starting a second one.
+    """
+
+    def __init__(self, budget_mb=4096):
+        """
+        Initialize the registry.
+
+        :param budget_mb: Memory budget for cached models in megabytes
+        """
+        self.budget_mb = budget_mb
+        self._models = OrderedDict()  # key -> (model, estimated size in bytes)
+        self._aliases = {}  # requested key -> key the model was loaded with
+        self._loading = {}  # key -> Event set when its load has finished
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._models
+
+    def __len__(self):
+        return len(self._models)
+
+    def get(self, key, loader):
+        """
+        Return the cached model for `key`, loading it with `loader` on a miss.
+
+        :param key: (model, device, compute_type, num_workers) tuple
+        :param loader: Callable returning a (model, key) tuple for a new model, where the key
+                       is the configuration it was actually loaded with
+        :return: The model
+        """
+        while True:
+            with self._lock:
+                loaded_key = self._aliases.get(key, key)
+                if loaded_key in self._models:
+                    self._models.move_to_end(loaded_key)
+                    self.hits += 1
+                    ConfigManager.console_print(f'Using cached model {loaded_key}.')
+                    return self._models[loaded_key][0]
+
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    # Make room before the weights are loaded, not after
+                    self._evict(estimate_model_size(*key[:3]))
+                    break
+            loading.wait()
+
+        try:
+            model, loaded_key = loader()
+            size = estimate_model_size(*loaded_key[:3])
+            with self._lock:
+                if loaded_key != key:
+                    self._aliases[key] = loaded_key
+                self._evict(size)
+                self._models[loaded_key] = (model, size)
+            return model
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def _evict(self, incoming_size):
+        """Drop least recently used models until `incoming_size` fits the budget. Caller holds the lock."""
+        budget = self.budget_mb * 1024 * 1024
+        total = sum(size for _, size in self._models.values())
+        evicted = False
+        while self._models and total + incoming_size > budget:
+            key, (_, size) = self._models.popitem(last=False)
+            total -= size
+            evicted = True
+            ConfigManager.console_print(f'Evicting cached model {key}.')
+        if evicted:
+            gc.collect()
+
+    def clear(self):
+        """Drop all cached models."""
+        with self._lock:
+            self._models.clear()
+            self._aliases.clear()
+        gc.collect()
+
+
+model_registry = ModelRegistry()
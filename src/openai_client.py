@@ -0,0 +1,81 @@
+import os
+import threading
+import httpx
+from openai import OpenAI
+
+from utils import ConfigManager
+
+# Shared clients and their connection pools, keyed by (base_url, api_key)
+_clients = {}
+_http_clients = {}
+_lock = threading.Lock()
+
+
+def _resolve(base_url=None, api_key=None):
+    """Fill in the base URL and API key from the configuration and environment."""
+    base_url = (base_url or ConfigManager.get_config_value('model_options', 'api', 'base_url')
+                or 'https://api.openai.com/v1')
+    api_key = api_key or os.getenv('OPENAI_API_KEY') or None
+    return base_url, api_key
+
+
+def get_openai_client(base_url=None, api_key=None):
+    """
+    Return the shared OpenAI client for a base URL and API key, creating it on first use.
+
+    The client keeps a pool of keep-alive connections, so consecutive transcription and
+    enhancement requests reuse the same TCP/TLS connection instead of paying DNS,
+    connect and handshake costs on every call.
+
+    Args:
+        base_url: Optional API base URL, defaults to the configured one
+        api_key: Optional API key, defaults to OPENAI_API_KEY
+    """
+    key = _resolve(base_url, api_key)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            api_options = ConfigManager.get_config_section('model_options', 'api')
+            timeout = httpx.Timeout(api_options.get('request_timeout') or 60.0,
+                                    connect=api_options.get('connect_timeout') or 5.0)
+            http_client = httpx.Client(timeout=timeout,
+                                       limits=httpx.Limits(max_connections=16,
+                                                           max_keepalive_connections=8,
+                                                           keepalive_expiry=120.0))
+            client = OpenAI(base_url=key[0], api_key=key[1], timeout=timeout, http_client=http_client)
+            _clients[key] = client
+            _http_clients[key] = http_client
+    return client
+
+
+def preconnect():
+    """
+    Open a connection to the API in the background so the first request doesn't wait for it.
+
+    Only does something when the API is used for transcription or enhancement and
+    `preconnect` is enabled.
+    """
+    if not ConfigManager.get_config_value('model_options', 'api', 'preconnect'):
+        return
+    if not (ConfigManager.get_config_value('model_options', 'use_api') or
+            ConfigManager.get_config_value('post_processing', 'enhance_with_gpt')):
+        return
+
+    def warm_up():
+        try:
+            get_openai_client()
+            key = _resolve()
+            _http_clients[key].head(key[0])
+        except Exception as e:
+            ConfigManager.console_print(f'API pre-connect failed: {e}')
+
+    threading.Thread(target=warm_up, daemon=True).start()
+
+
+def close_clients():
+    """Close all pooled connections."""
+    with _lock:
+        for http_client in _http_clients.values():
+            http_client.close()
+        _clients.clear()
+        _http_clients.clear()
@@ -0,0 +1,243 @@
+import contextlib
+import queue
+import traceback
+import sounddevice as sd
+from PyQt5.QtCore import QThread, QMutex, pyqtSignal
+from threading import Event
+
+import tracing
+from audio_buffer import AudioBuffer
+from openai_client import preconnect
+from audio_capture import WEBRTCVAD_AVAILABLE, SpeechDetector, get_input_device
+from result_thread import ResultThread
+from utils import ConfigManager
+
+
+class UtteranceCaptureThread(QThread):
+    """
+    Producer stage of the continuous recording pipeline.
+
+    Keeps one input stream open for the whole session, cuts it into utterances with
+    VAD and puts each utterance (an int16 numpy view) on `utterance_queue`. A `None`
+    sentinel is queued when capture stops.
+
+    Signals:
+        statusSignal: Emits 'recording' when capture starts
+    """
+
+    statusSignal = pyqtSignal(str)
+
+    FRAME_DURATION_MS = 30
+    LEAD_IN_MS = 300  # Audio kept in front of detected speech
+
+    def __init__(self, utterance_queue, capture_service=None):
+        """
+        Initialize the capture thread.
+
+        :param utterance_queue: Queue receiving recorded utterances
+        :param capture_service: Optional persistent CaptureService to record from
+        """
+        super().__init__()
+        self.utterance_queue = utterance_queue
+        self.capture_service = capture_service
+        self.is_running = True
+        self.mutex = QMutex()
+
+    def stop(self):
+        """Stop capturing. The utterance in progress, if any, is still queued."""
+        self.mutex.lock()
+        self.is_running = False
+        self.mutex.unlock()
+
+    def run(self):
+        """Main execution method for the thread."""
+        try:
+            self.statusSignal.emit('recording')
+            ConfigManager.console_print('Continuous recording...')
+            preconnect()  # Warm the API connection while the user speaks
+            self._capture()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            if self.capture_service:
+                self.capture_service.end_recording()
+            self.utterance_queue.put(None)
+
+    def _capture(self):
+        """Read frames until stopped, queueing an utterance each time speech is followed by silence."""
+        recording_options = ConfigManager.get_config_section('recording_options')
+        sample_rate = recording_options.get('sample_rate') or 16000
+        frame_size = int(sample_rate * (self.FRAME_DURATION_MS / 1000.0))
+        silence_duration_ms = recording_options.get('silence_duration') or 1200
+        min_samples = int((recording_options.get('min_duration') or 100) * sample_rate / 1000)
+        max_samples = int((recording_options.get('max_duration') or 0) * sample_rate)
+        lead_in = int(self.LEAD_IN_MS * sample_rate / 1000)
+
+        # Skip the sound of the activation key press
+        initial_frames_to_skip = int(0.3 * sample_rate / frame_size)
+
+        detector = None
+        if WEBRTCVAD_AVAILABLE:
+            try:
+                detector = SpeechDetector(sample_rate, silence_duration_ms, self.FRAME_DURATION_MS)
+            except Exception as e:
+                ConfigManager.console_print(f"Error initializing VAD: {str(e)}")
+
+        audio_buffer = AudioBuffer(sample_rate, initial_seconds=max(30, max_samples // sample_rate))
+
+        if self.capture_service and self.capture_service.is_active():
+            self.capture_service.begin_recording(audio_buffer)
+            data_ready = self.capture_service.data_ready
+            stream = contextlib.nullcontext()
+        else:
+            data_ready = Event()
+
+            def audio_callback(indata, frames, time, status):
+                if status:
+                    ConfigManager.console_print(f"Audio callback status: {status}")
+                audio_buffer.write(indata[:, 0])
+                data_ready.set()
+
+            with tracing.span('stream_open'):
+                stream = sd.InputStream(samplerate=sample_rate, channels=1, dtype='int16',
+                                        blocksize=frame_size, device=get_input_device(),
+                                        callback=audio_callback)
+
+        with stream:
+            while self.is_running:
+                if not data_ready.wait(timeout=0.01):
+                    continue
+                data_ready.clear()
+
+                while self.is_running and (frame := audio_buffer.read_frame(frame_size)) is not None:
+                    if initial_frames_to_skip > 0:
+                        initial_frames_to_skip -= 1
+                        continue
+                    if detector is None:
+                        continue
+
+                    try:
+                        was_speech = detector.speech_detected
+                        ended = detector.process(frame)
+                    except Exception as e:
+                        ConfigManager.console_print(f"Error in VAD processing: {str(e)}")
+                        detector = None
+                        continue
+
+                    if detector.speech_detected and not was_speech:
+                        # Drop the silence before the utterance, keeping a short lead-in
+                        speech_start = audio_buffer.read_position - detector.min_speech_frames * frame_size
+                        audio_buffer.take(max(0, speech_start - lead_in))
+                    elif not detector.speech_detected and audio_buffer.read_position > lead_in + 10 * sample_rate:
+                        # Bound the memory used while nobody is speaking
+                        audio_buffer.take(audio_buffer.read_position - lead_in)
+
+                    if ended or (max_samples and detector.speech_detected
+                                 and audio_buffer.read_position >= max_samples):
+                        self._enqueue(audio_buffer.take(audio_buffer.read_position), min_samples, sample_rate)
+                        detector.reset()
+
+        if self.capture_service:
+            self.capture_service.end_recording()
+
+        # Queue the utterance in progress when capture is stopped
+        if detector is None or detector.speech_detected:
+            self._enqueue(audio_buffer.data(), min_samples, sample_rate)
+
+    def _enqueue(self, audio_data, min_samples, sample_rate):
+        """Queue an utterance unless it is too short."""
+        if len(audio_data) < min_samples:
+            ConfigManager.console_print('Discarded utterance due to being too short.')
+            return
+        ConfigManager.console_print(f'Utterance queued. Duration: {len(audio_data) / sample_rate:.2f} seconds')
+        self.utterance_queue.put(audio_data)
+
+
+class TranscriptionWorker(ResultThread):
+    """
+    Consumer stage of the continuous recording pipeline.
+
+    Transcribes and post-processes utterances from `utterance_queue` in order and
+    emits each result, while the capture stage keeps recording.
+    """
+
+    def __init__(self, utterance_queue, local_model=None, main_window=None, model_loader=None):
+        """
+        Initialize the worker.
+
+        :param utterance_queue: Queue of recorded utterances, terminated by None
+        :param local_model: Local transcription model (if applicable)
+        :param main_window: Reference to main window for updating metrics
+        :param model_loader: Optional ModelLoader to wait on if the local model is still loading
+        """
+        super().__init__(local_model, main_window, model_loader=model_loader)
+        self.utterance_queue = utterance_queue
+
+    def stop(self):
+        """Stop the worker without processing the remaining utterances."""
+        self.utterance_queue.put(None)
+        super().stop()
+
+    def run(self):
+        """Main execution method for the thread."""
+        while self.is_running:
+            audio_data = self.utterance_queue.get()
+            if audio_data is None:
+                break
+
+            self.statusSignal.emit('transcribing')
+            ConfigManager.console_print('Transcribing...')
+            try:
+                result = self._transcribe(audio_data)
+            except Exception:
+                traceback.print_exc()
+                continue
+
+            if not self.is_running:
+                break
+            self.statusSignal.emit('recording')
+            self.resultSignal.emit(result)
+
+        self.statusSignal.emit('idle')
+
+
+class ContinuousPipeline:
+    """
+    Overlapped record/transcribe pipeline for the continuous recording mode.
+
+    One long-lived capture stage segments utterances and queues them, while a worker
+    stage transcribes, enhances and emits them in order, so speech is never lost
+    while a previous utterance is being processed.
+    """
+
+    def __init__(self, local_model=None, main_window=None, capture_service=None, model_loader=None):
+        """
+        Initialize the pipeline stages.
+
+        :param local_model: Local transcription model (if applicable)
+        :param main_window: Reference to main window for updating metrics
+        :param capture_service: Optional persistent CaptureService to record from
+        :param model_loader: Optional ModelLoader to wait on if the local model is still loading
+        """
+        self.utterance_queue = queue.Queue()
+        self.capture_thread = UtteranceCaptureThread(self.utterance_queue, capture_service)
+        self.worker = TranscriptionWorker(self.utterance_queue, local_model, main_window, model_loader)
+
+    def start(self):
+        """Start both stages."""
+        self.worker.start()
+        self.capture_thread.start()
+
+    def finish(self):
+        """Stop capturing; queued utterances are still transcribed."""
+        self.capture_thread.stop()
+
+    def stop(self):
+        """Stop both stages, dropping queued utterances."""
+        self.capture_thread.stop()
+        self.capture_thread.wait()
+        self.worker.stop()
+
+    def isRunning(self):
+        """Whether either stage is still running."""
+        return self.capture_thread.isRunning() or self.worker.isRunning()
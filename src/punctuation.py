@@ -0,0 +1,109 @@
+import re
+
+# Words that start a subordinate or contrasting clause and take a comma in front of them
+COMMA_BEFORE = {
+    'da': ('hvis', 'når', 'fordi', 'selvom', 'mens', 'hvorfor', 'hvordan', 'men'),
+    'en': ('but', 'which', 'although', 'though'),
+}
+
+# Words after which a comma is never inserted (conjunctions, prepositions, auxiliaries)
+NO_COMMA_AFTER = {
+    'da': {'og', 'eller', 'men', 'at', 'som', 'der', 'så', 'i', 'på', 'med', 'til', 'fra', 'om',
+           'for', 'af', 'er', 'var', 'bare', 'især', 'også', 'ikke'},
+    'en': {'and', 'or', 'but', 'that', 'of', 'in', 'on', 'to', 'for', 'with', 'is', 'was',
+           'just', 'even', 'not', 'as', 'nothing', 'anything', 'all', 'last'},
+}
+
+# Sentence-initial words followed by a comma
+INTRODUCTORY = {
+    'da': ('ja', 'nej', 'altså', 'okay'),
+    'en': ('however', 'yes', 'okay', 'actually'),
+}
+
+THOUSANDS_SEPARATOR = {'da': '.', 'en': ','}
+
+TERMINAL_PUNCTUATION = '.!?…'
+
+_WHITESPACE = re.compile(r'\s+')
+_SPACE_BEFORE_PUNCTUATION = re.compile(r' +([,.!?;:%)])')
+_SPACE_AFTER_OPENING = re.compile(r'([(]) +')
+_MISSING_SPACE_AFTER = re.compile(r'([,;:!?])(?=[^\W\d_])')
+_REPEATED_PUNCTUATION = re.compile(r'([,;:])[,;:]+')
+_SPACED_THOUSANDS = re.compile(r'\b(\d{1,3})((?: \d{3})+)\b')
+_SENTENCE_START = re.compile(r'(^|[.!?…] )([^\W\d_])')
+_ENGLISH_I = re.compile(r"\bi\b")
+_PUNCTUATED_RUN = re.compile(r'[,.!?;:…]')
+
+
+def _compile_language_rules():
+    rules = {}
+    for language, words in COMMA_BEFORE.items():
+        rules[language] = (
+            re.compile(r"([^\W\d_]+) (" + '|'.join(words) + r")\b", re.IGNORECASE),
+            re.compile(r"(^|[.!?…] )(" + '|'.join(INTRODUCTORY[language]) + r") (?=[^\W\d_])", re.IGNORECASE),
+        )
+    return rules
+
+
+_LANGUAGE_RULES = _compile_language_rules()
+
+
+def format_text(text, language=None):
+    """
+    Apply rule-based punctuation, casing and spacing to a transcription.
+
+    Normalises whitespace and the spacing around punctuation, groups spaced thousands,
+    adds commas before subordinate clauses and after introductory words for the
+    languages in COMMA_BEFORE, capitalises sentences and ends the text with a period.
+    Text that already has punctuation is left as it is apart from these corrections.
+
+    Args:
+        text: Text to format
+        language: ISO-639-1 code of the text's language, or None for language-neutral rules
+
+    Returns:
+        The formatted text
+    """
+    text = _WHITESPACE.sub(' ', text).strip()
+    if not text:
+        return text
+
+    text = _SPACE_BEFORE_PUNCTUATION.sub(r'\1', text)
+    text = _SPACE_AFTER_OPENING.sub(r'\1', text)
+    text = _REPEATED_PUNCTUATION.sub(r'\1', text)
+    text = _MISSING_SPACE_AFTER.sub(r'\1 ', text)
+
+    separator = THOUSANDS_SEPARATOR.get(language)
+    if separator:
+        text = _SPACED_THOUSANDS.sub(lambda m: m.group(1) + m.group(2).replace(' ', separator), text)
+
+    rules = _LANGUAGE_RULES.get(language)
+    if rules:
+        comma_before, introductory = rules
+        no_comma_after = NO_COMMA_AFTER[language]
+        text = comma_before.sub(
+            lambda m: m.group(0) if m.group(1).lower() in no_comma_after else f'{m.group(1)}, {m.group(2)}',
+            text)
+        text = introductory.sub(r'\1\2, ', text)
+
+    if language == 'en':
+        text = _ENGLISH_I.sub('I', text)
+
+    text = _SENTENCE_START.sub(lambda m: m.group(1) + m.group(2).upper(), text)
+    if text[-1] not in TERMINAL_PUNCTUATION:
+        text += '.'
+    return text
+
+
+def is_clean(text, max_unpunctuated_words=15):
+    """
+    Judge whether formatted text is clean enough to skip GPT enhancement.
+
+    Text is clean when no stretch between punctuation marks is longer than
+    `max_unpunctuated_words` words; long unpunctuated runs are where GPT helps most.
+
+    Args:
+        text: Text to judge, usually the output of format_text
+        max_unpunctuated_words: Longest acceptable run of words without punctuation
+    """
+    return all(len(run.split()) <= max_unpunctuated_words for run in _PUNCTUATED_RUN.split(text))
@@ -1,27 +1,19 @@
+import contextlib
 import time
 import traceback
 import numpy as np
 import sounddevice as sd
-import tempfile
-import wave
 from PyQt5.QtCore import QThread, QMutex, pyqtSignal
-from collections import deque
 from threading import Event
 
-from transcription import transcribe
+import tracing
+from transcription import exceeds_max_duration, transcribe, post_process_transcription
+from cost_tracker import get_cost_tracker
+from streaming import StreamingTranscriber
+from openai_client import preconnect
 from utils import ConfigManager
-from cost_tracker import CostTracker
-
-# Initialize cost tracker
-cost_tracker = CostTracker()
-
-# Try to import webrtcvad, but don't fail if it's not available
-try:
-    import webrtcvad
-    WEBRTCVAD_AVAILABLE = True
-except ImportError:
-    WEBRTCVAD_AVAILABLE = False
-    ConfigManager.console_print("webrtcvad not available, falling back to continuous recording mode")
+from audio_buffer import AudioBuffer
+from audio_capture import WEBRTCVAD_AVAILABLE, SpeechDetector, get_input_device
 
 class ResultThread(QThread):
     """
@@ -42,21 +34,27 @@ class ResultThread(QThread):
     statusSignal = pyqtSignal(str)
     resultSignal = pyqtSignal(str)
     wordSignal = pyqtSignal(str)  # Signal for word-by-word updates
+    textSignal = pyqtSignal(str)  # Final text as it streams in, when streaming enhancement is enabled
     metricsUpdated = pyqtSignal(float, int, float, float, float)  # duration, tokens, total_cost, whisper_cost, gpt_cost
 
-    def __init__(self, local_model=None, main_window=None):
+    def __init__(self, local_model=None, main_window=None, capture_service=None, model_loader=None):
         """
         Initialize the ResultThread.
 
         :param local_model: Local transcription model (if applicable)
         :param main_window: Reference to main window for updating metrics
+        :param capture_service: Optional persistent CaptureService to record from
+        :param model_loader: Optional ModelLoader to wait on if the local model is still loading
         """
         super().__init__()
         self.local_model = local_model
+        self.model_loader = model_loader
         self.main_window = main_window
+        self.capture_service = capture_service
         self.is_recording = False
         self.is_running = True
         self.sample_rate = None
+        self.streamer = None
         self.mutex = QMutex()
 
     def stop_recording(self):
@@ -85,7 +83,9 @@ class ResultThread(QThread):
 
             self.statusSignal.emit('recording')
             ConfigManager.console_print('Recording...')
-            audio_data = self._record_audio()
+            preconnect()  # Warm the API connection while the user speaks
+            with tracing.span('recording'):
+                audio_data = self._record_audio()
 
             if not self.is_running:
                 return
@@ -97,47 +97,8 @@ class ResultThread(QThread):
             self.statusSignal.emit('transcribing')
             ConfigManager.console_print('Transcribing...')
 
-            # Get initial metrics
-            initial_summary = cost_tracker.get_usage_summary()
-            initial_whisper_duration = initial_summary['whisper_usage']['total_duration_seconds'] if initial_summary else 0
-            initial_gpt_tokens = (initial_summary['gpt_usage']['total_input_tokens'] + 
-                                initial_summary['gpt_usage']['total_output_tokens']) if initial_summary else 0
-            initial_cost = initial_summary['total_cost'] if initial_summary else 0
-
-            # Time the transcription process
-            # Clear word display
-            self.wordSignal.emit("")  # Signal to clear display
-            
-            # Transcribe with word callback
-            start_time = time.time()
-            result = transcribe(audio_data, self.local_model,
-                              lambda word: self.wordSignal.emit(word))
-            end_time = time.time()
-
-            # Get updated metrics
-            current_summary = cost_tracker.get_usage_summary()
-            if current_summary:
-                # Calculate differences
-                whisper_duration = current_summary['whisper_usage']['total_duration_seconds'] - initial_whisper_duration
-                gpt_tokens = ((current_summary['gpt_usage']['total_input_tokens'] +
-                              current_summary['gpt_usage']['total_output_tokens']) - initial_gpt_tokens)
-                total_cost = current_summary['total_cost'] - initial_cost
-                
-                # Get per-request costs from last entries
-                whisper_cost = current_summary['last_whisper_entry']['cost'] if current_summary['last_whisper_entry'] else None
-                gpt_cost = current_summary['last_gpt_entry']['total_cost'] if current_summary['last_gpt_entry'] else None
-                
-                # Log the costs for debugging
-                if whisper_cost:
-                    ConfigManager.console_print(f"Last Whisper request cost: ${whisper_cost:.4f}")
-                if gpt_cost:
-                    ConfigManager.console_print(f"Last GPT request cost: ${gpt_cost:.4f}")
-                
-                # Emit metrics update with per-request costs
-                self.metricsUpdated.emit(whisper_duration, gpt_tokens, total_cost, whisper_cost, gpt_cost)
-
-            transcription_time = end_time - start_time
-            ConfigManager.console_print(f'Transcription completed in {transcription_time:.2f} seconds. Post-processed line: {result}')
+            with tracing.span('transcription'):
+                result = self._transcribe(audio_data)
 
             if not self.is_running:
                 return
@@ -150,13 +111,93 @@ class ResultThread(QThread):
             self.statusSignal.emit('error')
             self.resultSignal.emit('')
         finally:
+            if self.streamer:
+                self.streamer.cancel()
+            if self.capture_service:
+                self.capture_service.end_recording()
             self.stop_recording()
 
+    def _transcribe(self, audio_data):
+        """
+        Transcribe recorded audio and emit live words and per-request metrics.
+
+        :param audio_data: numpy array of recorded audio
+        :return: The post-processed transcription
+        """
+        # The audio is already recorded; if the model is still loading, wait for it
+        if self.local_model is None and self.model_loader:
+            if not self.model_loader.is_ready():
+                self.statusSignal.emit('loading')
+                ConfigManager.console_print('Waiting for the local model to finish loading...')
+                self.local_model = self.model_loader.wait_for_model()
+                self.statusSignal.emit('transcribing')
+            else:
+                self.local_model = self.model_loader.model
+
+        # Remember the running totals, so this request's usage can be measured in O(1)
+        usage_snapshot = get_cost_tracker().snapshot()
+
+        # Time the transcription process
+        start_time = time.time()
+        result = self._finish_streaming(audio_data) if self.streamer else None
+        if result is None:
+            # Clear word display
+            self.wordSignal.emit("")  # Signal to clear display
+
+            # Transcribe with word callback
+            result = transcribe(audio_data, self.local_model,
+                              lambda word: self.wordSignal.emit(word), self.textSignal.emit)
+        end_time = time.time()
+
+        # Usage logged by this request, every piece and chunk included
+        usage = get_cost_tracker().usage_since(usage_snapshot)
+        whisper_duration = usage['whisper_duration_seconds']
+        gpt_tokens = usage['gpt_input_tokens'] + usage['gpt_output_tokens']
+        whisper_cost = usage['whisper_cost']
+        gpt_cost = usage['gpt_cost']
+
+        # Log the costs for debugging
+        if whisper_cost:
+            ConfigManager.console_print(f"Whisper cost for this request: ${whisper_cost:.4f}")
+        if gpt_cost:
+            ConfigManager.console_print(f"GPT cost for this request: ${gpt_cost:.4f}")
+
+        # Emit metrics update with per-request costs
+        self.metricsUpdated.emit(whisper_duration, gpt_tokens, usage['total_cost'], whisper_cost, gpt_cost)
+
+        transcription_time = end_time - start_time
+        ConfigManager.console_print(f'Transcription completed in {transcription_time:.2f} seconds. Post-processed line: {result}')
+
+        return result
+
+    def _finish_streaming(self, audio_data):
+        """
+        Finish the streaming transcription and post-process it.
+
+        :param audio_data: numpy array of recorded audio
+        :return: The post-processed transcription, or None if streaming failed and the
+                 recording has to be transcribed in one batch
+        """
+        if exceeds_max_duration(audio_data):
+            self.streamer.cancel()
+            return ''
+        if not self.streamer.failed:
+            try:
+                # Committed words were already emitted live; only the unstable tail is left
+                text = self.streamer.finish()
+            except Exception:
+                traceback.print_exc()
+            else:
+                return post_process_transcription(text, self.textSignal.emit, language=self.streamer.language)
+        self.streamer.cancel()
+        ConfigManager.console_print('Falling back to batch transcription.')
+        return None
+
     def _record_audio(self):
         """
-        Record audio from the microphone and save it to a temporary file.
+        Record audio from the microphone into a preallocated int16 buffer.
 
-        :return: numpy array of audio data, or None if the recording is too short
+        :return: numpy array view of the recorded audio, or None if the recording is too short
         """
         recording_options = ConfigManager.get_config_section('recording_options')
         self.sample_rate = recording_options.get('sample_rate') or 16000
@@ -164,10 +205,9 @@ class ResultThread(QThread):
         frame_size = int(self.sample_rate * (frame_duration_ms / 1000.0))
         # Increased silence duration to give more time for slower microphones
         silence_duration_ms = recording_options.get('silence_duration') or 1200
-        silence_frames = int(silence_duration_ms / frame_duration_ms)
 
         # 300ms delay before starting VAD to avoid mistaking the sound of key pressing for voice
-        # and give microphone time to properly initialize
+        # and give microphone time to properly initialize (counted from activation, after any pre-roll)
         initial_frames_to_skip = int(0.3 * self.sample_rate / frame_size)
 
         # Create VAD only for recording modes that use it and if webrtcvad is available
@@ -175,37 +215,47 @@ class ResultThread(QThread):
         vad = None
         if WEBRTCVAD_AVAILABLE and recording_mode in ('voice_activity_detection', 'continuous'):
             try:
-                vad = webrtcvad.Vad(1)  # Reduced VAD aggressiveness for better handling of quiet speech
-                speech_detected = False
-                silent_frame_count = 0
-                speech_frame_count = 0  # Track consecutive speech frames
-                min_speech_frames = 3    # Minimum consecutive speech frames to confirm speech
+                vad = SpeechDetector(self.sample_rate, silence_duration_ms, frame_duration_ms)
             except Exception as e:
                 ConfigManager.console_print(f"Error initializing VAD: {str(e)}")
                 vad = None
 
-        audio_buffer = deque(maxlen=frame_size)
-        recording = []
-
-        data_ready = Event()
+        max_duration = recording_options.get('max_duration') or 0
+        audio_buffer = AudioBuffer(self.sample_rate, initial_seconds=max_duration or 30)
 
-        def audio_callback(indata, frames, time, status):
-            if status:
-                ConfigManager.console_print(f"Audio callback status: {status}")
-            audio_buffer.extend(indata[:, 0])
-            data_ready.set()
-
-        # Get default input device
-        try:
-            default_device = sd.query_devices(kind='input')
-            device_id = default_device['index']
-        except Exception as e:
-            ConfigManager.console_print(f"Error getting default device: {str(e)}")
-            device_id = None
-
-        with sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='int16',
-                           blocksize=frame_size, device=device_id,
-                           callback=audio_callback):
+        # Decode while recording if streaming is enabled for the local model
+        self.streamer = None
+        model_options = ConfigManager.get_config_section('model_options')
+        if (not model_options.get('use_api') and model_options['local'].get('streaming')
+                and self.local_model is not None):
+            self.wordSignal.emit("")  # Signal to clear display
+            self.streamer = StreamingTranscriber(audio_buffer, self.local_model,
+                                                 lambda word: self.wordSignal.emit(word),
+                                                 model_options['local'].get('streaming_interval') or 1.0)
+            self.streamer.start()
+
+        pre_roll_frames = 0
+        if self.capture_service and self.capture_service.is_active():
+            # The microphone is already open; splice the pre-roll onto the recording
+            pre_roll_samples = self.capture_service.begin_recording(audio_buffer)
+            pre_roll_frames = pre_roll_samples // frame_size
+            data_ready = self.capture_service.data_ready
+            stream = contextlib.nullcontext()
+        else:
+            data_ready = Event()
+
+            def audio_callback(indata, frames, time, status):
+                if status:
+                    ConfigManager.console_print(f"Audio callback status: {status}")
+                audio_buffer.write(indata[:, 0])
+                data_ready.set()
+
+            with tracing.span('stream_open'):
+                stream = sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='int16',
+                                        blocksize=frame_size, device=get_input_device(),
+                                        callback=audio_callback)
+
+        with stream:
             while self.is_running and self.is_recording:
                 # Use a short timeout to check stop condition more frequently
                 if not data_ready.wait(timeout=0.01):  # 10ms timeout
@@ -215,48 +265,40 @@ class ResultThread(QThread):
                 if not self.is_recording:  # Check again after wait
                     break
 
-                if len(audio_buffer) < frame_size:
-                    continue
-
-                # Save frame
-                frame = np.array(list(audio_buffer), dtype=np.int16)
-                audio_buffer.clear()
-                recording.extend(frame)
-
-                # Avoid trying to detect voice in initial frames
-                if initial_frames_to_skip > 0:
-                    initial_frames_to_skip -= 1
-                    continue
-
-                if not self.is_recording:  # Quick exit if recording stopped
+                # Consume every complete frame that has arrived since the last wakeup
+                stop = False
+                while (frame := audio_buffer.read_frame(frame_size)) is not None:
+                    # Pre-roll frames were captured before the key press, so they go through
+                    # VAD; only the frames right after activation are skipped
+                    if pre_roll_frames > 0:
+                        pre_roll_frames -= 1
+                    elif initial_frames_to_skip > 0:
+                        initial_frames_to_skip -= 1
+                        continue
+
+                    if not self.is_recording:  # Quick exit if recording stopped
+                        stop = True
+                        break
+
+                    if vad:
+                        try:
+                            # Stop recording if either stop condition is met
+                            if vad.process(frame) or not self.is_recording:
+                                stop = True
+                                break
+                        except Exception as e:
+                            ConfigManager.console_print(f"Error in VAD processing: {str(e)}")
+                            # If VAD fails, continue recording without it
+                            vad = None
+
+                if stop:
                     break
 
-                if vad:
-                    try:
-                        is_speech = vad.is_speech(frame.tobytes(), self.sample_rate)
-                        
-                        if is_speech:
-                            speech_frame_count += 1
-                            silent_frame_count = 0
-                            
-                            # Only set speech_detected after enough consecutive speech frames
-                            if speech_frame_count >= min_speech_frames and not speech_detected:
-                                ConfigManager.console_print("Speech detected.")
-                                speech_detected = True
-                        else:
-                            speech_frame_count = 0
-                            if speech_detected:
-                                silent_frame_count += 1
-
-                        # Stop recording if either stop condition is met
-                        if (speech_detected and silent_frame_count > silence_frames) or not self.is_recording:
-                            break
-                    except Exception as e:
-                        ConfigManager.console_print(f"Error in VAD processing: {str(e)}")
-                        # If VAD fails, continue recording without it
-                        vad = None
-
-        audio_data = np.array(recording, dtype=np.int16)
+        if self.capture_service:
+            self.capture_service.end_recording()
+
+        # Zero-copy view of the recording; transcribe() only reads from it
+        audio_data = audio_buffer.data()
         duration = len(audio_data) / self.sample_rate
 
         ConfigManager.console_print(f'Recording finished. Size: {audio_data.size} samples, Duration: {duration:.2f} seconds')
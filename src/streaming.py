@@ -0,0 +1,166 @@
+import re
+import threading
+import time
+import traceback
+
+from cost_tracker import get_cost_tracker
+from transcription import transcribe_local_words
+from utils import ConfigManager
+
+
+def _normalize(word):
+    """Normalize a word for hypothesis comparison (case and punctuation insensitive)."""
+    return re.sub(r'[^\w]', '', word).lower()
+
+
+class LocalAgreement:
+    """
+    Local-agreement commit policy for streaming transcription.
+
+    Each new hypothesis covers the audio that has not been committed yet. Words are
+    committed once two consecutive hypotheses agree on them, which in practice means
+    they will not change when more audio arrives.
+    """
+
+    def __init__(self):
+        self.committed = []
+        self._previous = []
+
+    def update(self, hypothesis):
+        """
+        Compare a new hypothesis with the previous one and commit their common prefix.
+
+        :param hypothesis: List of words covering the uncommitted audio
+        :return: List of newly committed words
+        """
+        agreed = 0
+        for previous, current in zip(self._previous, hypothesis):
+            if _normalize(previous.word) != _normalize(current.word):
+                break
+            agreed += 1
+
+        newly_committed = hypothesis[:agreed]
+        self.committed.extend(newly_committed)
+        self._previous = hypothesis[agreed:]
+        return newly_committed
+
+    def text(self):
+        """Return the committed text."""
+        return ''.join(word.word for word in self.committed)
+
+
+class _Word:
+    """A decoded word with timestamps relative to the start of the recording."""
+    __slots__ = ('start', 'end', 'word', 'probability')
+
+    def __init__(self, word, offset):
+        self.start = word.start + offset
+        self.end = word.end + offset
+        self.word = word.word
+        self.probability = word.probability
+
+
+class StreamingTranscriber:
+    """
+    Transcribe an AudioBuffer incrementally while it is still being recorded.
+
+    A background thread re-decodes the uncommitted tail of the buffer every
+    `interval` seconds of new audio. Words that two consecutive decodes agree on are
+    committed, emitted through `word_callback`, and cut from the decode window, so
+    each decode only covers the unstable tail. When recording stops, `finish` decodes
+    that tail once more and returns the full text; `language` is then the language
+    detected by that final decode. If a background decode fails, decoding stops and
+    `failed` is set, so the caller can transcribe the recording in one batch instead.
+    """
+
+    def __init__(self, audio_buffer, local_model, word_callback=None, interval=1.0):
+        """
+        Initialize the streaming transcriber.
+
+        :param audio_buffer: AudioBuffer being filled by the recording loop
+        :param local_model: Pre-initialized faster-whisper model
+        :param word_callback: Optional callback receiving each committed word
+        :param interval: Seconds of new audio between decodes
+        """
+        self.audio_buffer = audio_buffer
+        self.local_model = local_model
+        self.word_callback = word_callback
+        self.interval = interval
+        self.sample_rate = audio_buffer.sample_rate
+        self.agreement = LocalAgreement()
+        self._offset = 0  # First uncommitted sample
+        self._decoded_until = 0
+        self.language = None
+        self.failed = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start decoding in the background."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stop the background decoder without producing a result."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def finish(self):
+        """
+        Stop streaming, decode the remaining uncommitted audio and return the full text.
+
+        The session is logged as one local transcription of the whole recording, with
+        the decode time of the tail as its latency, since that is the only decode the
+        user waits for.
+
+        :return: The transcription of the whole recording
+        """
+        self.cancel()
+        start_time = time.time()
+        audio = self.audio_buffer.data()
+        tail, self.language = self._decode(audio)
+        decode_time = time.time() - start_time
+        for word in tail:
+            self._emit(word)
+        ConfigManager.console_print(f'Streaming: committed {len(self.agreement.committed)} words live, '
+                                    f'decoded {len(tail)}-word tail in {decode_time:.2f} seconds.')
+        get_cost_tracker().log_local_usage(len(audio) / self.sample_rate,
+                                           ConfigManager.get_config_value('model_options', 'local', 'model') or 'local',
+                                           latency={'decode': decode_time})
+        return self.agreement.text() + ''.join(word.word for word in tail)
+
+    def _run(self):
+        """Decode the uncommitted tail whenever enough new audio has arrived."""
+        step = int(self.interval * self.sample_rate)
+        while not self._stop.wait(0.05):
+            if len(self.audio_buffer) - self._decoded_until < step:
+                continue
+            try:
+                audio = self.audio_buffer.data()
+                self._decoded_until = len(audio)
+                for word in self.agreement.update(self._decode(audio)[0]):
+                    self._emit(word)
+                if self.agreement.committed:
+                    self._offset = int(self.agreement.committed[-1].end * self.sample_rate)
+            except Exception:
+                traceback.print_exc()
+                ConfigManager.console_print('Streaming transcription failed, the recording will be '
+                                            'transcribed when it ends.')
+                self.failed = True
+                return
+
+    def _decode(self, audio):
+        """
+        Decode audio from the first uncommitted sample, with committed text as context.
+
+        :return: Tuple of (decoded words, detected language)
+        """
+        offset_seconds = self._offset / self.sample_rate
+        prompt = self.agreement.text()[-200:] or None
+        words, language = transcribe_local_words(audio[self._offset:], self.local_model, initial_prompt=prompt)
+        return [_Word(word, offset_seconds) for word in words], language
+
+    def _emit(self, word):
+        if self.word_callback:
+            self.word_callback(word.word.strip())
@@ -0,0 +1,88 @@
+import json
+import re
+
+
+class EditError(ValueError):
+    """Raised when an edit list cannot be parsed or does not apply to the text."""
+
+
+_CODE_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+
+def parse_edits(response_text):
+    """
+    Parse an edit list returned by the model.
+
+    The expected format is a JSON array of [offset, old, new] triples, where `offset`
+    is the character offset of `old` in the original text. `old` must not be empty;
+    insertions are expressed by replacing the word next to them.
+
+    Args:
+        response_text: Raw model response
+
+    Returns:
+        List of (offset, old, new) tuples
+    """
+    try:
+        edits = json.loads(_CODE_FENCE.sub('', response_text.strip()))
+    except json.JSONDecodeError as e:
+        raise EditError(f'invalid JSON: {e}') from None
+    if not isinstance(edits, list):
+        raise EditError('expected a list of edits')
+
+    parsed = []
+    for edit in edits:
+        if (not isinstance(edit, list) or len(edit) != 3 or not isinstance(edit[0], int)
+                or not isinstance(edit[1], str) or not isinstance(edit[2], str) or not edit[1]):
+            raise EditError(f'malformed edit {edit!r}')
+        parsed.append(tuple(edit))
+    return parsed
+
+
+def apply_edits(text, edits, search_window=20):
+    """
+    Apply an edit list to `text`.
+
+    Each edit's `old` text must be found at its offset. Models often miscount offsets
+    by a few characters, so the nearest occurrence within `search_window` characters is
+    accepted too. Edits must not overlap.
+
+    Args:
+        text: Original text
+        edits: List of (offset, old, new) tuples
+        search_window: How far from the stated offset `old` may be found
+
+    Returns:
+        The edited text
+    """
+    located = []
+    for offset, old, new in edits:
+        start = _locate(text, offset, old, search_window)
+        if start is None:
+            raise EditError(f'{old!r} not found near offset {offset}')
+        located.append((start, start + len(old), new))
+
+    located.sort()
+    for (_, previous_end, _), (start, _, _) in zip(located, located[1:]):
+        if start < previous_end:
+            raise EditError('overlapping edits')
+
+    parts = []
+    position = 0
+    for start, end, new in located:
+        parts.append(text[position:start])
+        parts.append(new)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+def _locate(text, offset, old, search_window):
+    """Return the start of the occurrence of `old` closest to `offset`, or None."""
+    if offset >= 0 and text.startswith(old, offset):
+        return offset
+    low = max(0, offset - search_window)
+    high = min(len(text), offset + search_window + len(old))
+    candidates = [m.start() + low for m in re.finditer(re.escape(old), text[low:high])]
+    # finditer skips overlapping matches, which only matters for repetitive text
+    return min(candidates, key=lambda start: abs(start - offset)) if candidates else None
@@ -0,0 +1,159 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Tracing is off unless configure() turns it on; span() and instant() then cost one
+# global lookup and return immediately, so instrumentation can stay in place.
+_enabled = False
+# (name, phase, start in ns, duration in ns, thread id, args); phase 'X' is a span, 'i' an instant
+_events = deque(maxlen=100_000)
+_thread_names = {}
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def configure(enabled, max_events=100_000):
+    """
+    Turn tracing on or off.
+
+    Args:
+        enabled: Whether spans and instants are recorded
+        max_events: Number of most recent events kept
+    """
+    global _enabled, _events
+    if max_events != _events.maxlen:
+        _events = deque(_events, maxlen=max_events)
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    """Return whether tracing is on."""
+    return _enabled
+
+
+def clear():
+    """Forget all recorded events."""
+    _events.clear()
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        thread = threading.current_thread()
+        _thread_names[thread.ident] = thread.name
+        _events.append((self.name, 'X', self.start, end - self.start, thread.ident, self.args))
+        return False
+
+
+def span(name, **args):
+    """
+    Time a stage of the pipeline, as a context manager.
+
+    Args:
+        name: Stage name, shared by all spans of the stage
+        **args: Optional details shown with the span in the trace viewer
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def instant(name, **args):
+    """
+    Mark a moment in the pipeline, such as the key press or the first speech frame.
+
+    Args:
+        name: Event name
+        **args: Optional details shown with the event in the trace viewer
+    """
+    if not _enabled:
+        return
+    thread = threading.current_thread()
+    _thread_names[thread.ident] = thread.name
+    _events.append((name, 'i', time.perf_counter_ns(), 0, thread.ident, args))
+
+
+def export_chrome_trace(path):
+    """
+    Write the recorded events as a Chrome trace, viewable in Perfetto or chrome://tracing.
+
+    Args:
+        path: File to write
+
+    Returns:
+        Number of events written
+    """
+    pid = os.getpid()
+    events = list(_events)
+    trace_events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                    for tid, name in list(_thread_names.items())]
+    for name, phase, start, duration, tid, args in events:
+        event = {'name': name, 'ph': phase, 'ts': start / 1000, 'pid': pid, 'tid': tid, 'args': args}
+        if phase == 'X':
+            event['dur'] = duration / 1000
+        else:
+            event['s'] = 't'  # Instant scoped to its thread
+        trace_events.append(event)
+
+    temp_file = f"{path}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+    os.replace(temp_file, path)
+    return len(events)
+
+
+def stage_histograms(bins=20):
+    """
+    Summarise the recorded span durations per stage.
+
+    Args:
+        bins: Number of histogram bins per stage
+
+    Returns:
+        Dictionary of stage name -> count, mean, percentiles and maximum in
+        milliseconds, plus `bin_edges_ms` and `counts` of the duration histogram
+    """
+    durations = {}
+    for name, phase, _, duration, _, _ in list(_events):
+        if phase == 'X':
+            durations.setdefault(name, []).append(duration)
+
+    histograms = {}
+    for name, values in durations.items():
+        values = np.asarray(values, dtype=np.float64) / 1e6
+        counts, edges = np.histogram(values, bins=bins)
+        p50, p90, p99 = np.percentile(values, (50, 90, 99))
+        histograms[name] = {
+            'count': len(values),
+            'mean_ms': float(values.mean()),
+            'p50_ms': float(p50),
+            'p90_ms': float(p90),
+            'p99_ms': float(p99),
+            'max_ms': float(values.max()),
+            'bin_edges_ms': edges.tolist(),
+            'counts': counts.tolist(),
+        }
+    return histograms
+
+
+def format_histograms(histograms):
+    """Format stage_histograms() as one line per stage, slowest median first."""
+    lines = [f"{'stage':<20} {'count':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    for name, stats in sorted(histograms.items(), key=lambda item: -item[1]['p50_ms']):
+        lines.append(f"{name:<20} {stats['count']:>6} {stats['p50_ms']:>9.1f} {stats['p90_ms']:>9.1f} "
+                     f"{stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+    return '\n'.join(lines)
@@ -1,27 +1,43 @@
-import io
+import atexit
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import soundfile as sf
-import tiktoken
 from faster_whisper import WhisperModel
-from openai import OpenAI
 
+import tracing
 from utils import ConfigManager
-from cost_tracker import CostTracker
+from openai_client import get_openai_client
+from audio_encoding import encode_audio
+from cost_tracker import get_cost_tracker
+from enhancement_cache import EnhancementCache
+from model_registry import model_registry
+from chunking import last_sentence, split_at_silence, split_sentences, stitch_transcripts
+from punctuation import format_text, is_clean
+from prompts import PROMPT_VERSION, build_messages, count_tokens, system_prompt_tokens
+from text_edits import EditError, apply_edits, parse_edits
 
-# Initialize the cost tracker
-cost_tracker = CostTracker()
+# The cost tracker shared with the rest of the app
+cost_tracker = get_cost_tracker()
 
-# Store detected language globally
-detected_language = 'en'
+# Cache of previous enhancements, keyed by text, language, prompt version, model and temperature
+enhancement_cache = EnhancementCache()
+# Write enhancements cached since the last save when the app exits
+atexit.register(enhancement_cache.close)
 
-def create_local_model():
+def create_local_model(local_model_options=None):
     """
     Create a local model using the faster-whisper library.
+
+    Models are cached in the process-wide model registry, so asking for a
+    configuration that is already resident returns it without reloading weights.
+
+    Args:
+        local_model_options: Optional local model options overriding the configured ones,
+            e.g. to route a single utterance to a different model
     """
-    ConfigManager.console_print('Creating local model...')
-    local_model_options = ConfigManager.get_config_section('model_options')['local']
+    local_model_options = local_model_options or ConfigManager.get_config_section('model_options')['local']
     compute_type = local_model_options['compute_type']
     model_path = local_model_options.get('model_path')
 
@@ -31,61 +47,232 @@ def create_local_model():
     else:
         device = local_model_options['device']
 
+    num_workers = max(1, local_model_options.get('num_workers') or 1)
+
+    model_registry.budget_mb = local_model_options.get('model_cache_size') or model_registry.budget_mb
+    key = (model_path or local_model_options['model'], device, compute_type, num_workers)
+
+    def load():
+        model, loaded_device = _load_whisper_model(local_model_options, device, compute_type, num_workers)
+        return model, (key[0], loaded_device, compute_type, num_workers)
+
+    return model_registry.get(key, load)
+
+def _load_whisper_model(local_model_options, device, compute_type, num_workers=1):
+    """
+    Load a WhisperModel from disk or the model hub, falling back to CPU on failure.
+
+    With several workers the model can run that many transcriptions concurrently; the
+    CPU threads are divided between them so they don't oversubscribe the cores.
+
+    Returns:
+        Tuple of (model, device it was loaded on)
+    """
+    ConfigManager.console_print('Creating local model...')
+    model_path = local_model_options.get('model_path')
+    parallel_options = {}
+    if num_workers > 1:
+        parallel_options = {'num_workers': num_workers,
+                            'cpu_threads': max(1, (os.cpu_count() or num_workers) // num_workers)}
+
     try:
         if model_path:
             ConfigManager.console_print(f'Loading model from: {model_path}')
             model = WhisperModel(model_path,
                                  device=device,
                                  compute_type=compute_type,
-                                 download_root=None)  # Prevent automatic download
+                                 download_root=None,  # Prevent automatic download
+                                 **parallel_options)
         else:
             model = WhisperModel(local_model_options['model'],
                                  device=device,
-                                 compute_type=compute_type)
+                                 compute_type=compute_type,
+                                 **parallel_options)
     except Exception as e:
         ConfigManager.console_print(f'Error initializing WhisperModel: {e}')
         ConfigManager.console_print('Falling back to CPU.')
+        device = 'cpu'
         model = WhisperModel(model_path or local_model_options['model'],
                              device='cpu',
                              compute_type=compute_type,
-                             download_root=None if model_path else None)
+                             download_root=None if model_path else None,
+                             **parallel_options)
 
     ConfigManager.console_print('Local model created.')
-    return model
+    return model, device
+
+def _run_local_model(audio_data, local_model, initial_prompt=None, word_timestamps=False, vad_filter=None):
+    """
+    Run the local model over int16 audio.
+
+    Args:
+        audio_data: Audio data to transcribe
+        local_model: Pre-initialized model
+        initial_prompt: Optional prompt overriding the configured one
+        word_timestamps: Whether to request word-level timestamps
+        vad_filter: Optional override of the configured VAD filter setting
+
+    Returns:
+        Tuple of (lazily decoded segments, detected language)
+    """
+    model_options = ConfigManager.get_config_section('model_options')
+    language = model_options['common']['language']
+    if vad_filter is None:
+        vad_filter = model_options['local']['vad_filter']
+
+    # Convert int16 to float32 with a single allocation
+    audio_data_float = audio_data.astype(np.float32)
+    audio_data_float /= 32768.0
+
+    segments, info = local_model.transcribe(audio=audio_data_float,
+                                         language=None if language == 'auto' else language,
+                                         initial_prompt=initial_prompt or model_options['common']['initial_prompt'],
+                                         condition_on_previous_text=model_options['local']['condition_on_previous_text'],
+                                         temperature=model_options['common']['temperature'],
+                                         vad_filter=vad_filter,
+                                         word_timestamps=word_timestamps)
+    return segments, info.language
+
+def warm_up_local_model(local_model):
+    """
+    Run a short silent decode so the first real transcription doesn't pay lazy initialisation costs.
+
+    Args:
+        local_model: Pre-initialized model
+    """
+    sample_rate = ConfigManager.get_config_section('recording_options').get('sample_rate') or 16000
+    silence = np.zeros(sample_rate, dtype=np.int16)  # 1 second of silence
+    # The VAD filter would drop all of the silence before the encoder and decoder run
+    segments, _ = _run_local_model(silence, local_model, vad_filter=False)
+    for _ in segments:
+        pass
 
 def transcribe_local(audio_data, local_model=None, word_callback=None):
     """
     Transcribe an audio file using a local model.
+
+    Recordings longer than `long_form_threshold` are split at silences and decoded
+    in parallel when the model has more than one worker.
     
     Args:
         audio_data: Audio data to transcribe
         local_model: Optional pre-initialized model
         word_callback: Optional callback function for word-by-word updates
     """
+    return _transcribe_local(audio_data, local_model, word_callback)[0]
+
+def transcribe_local_with_confidence(audio_data, local_model=None, word_callback=None):
+    """
+    Transcribe an audio file using a local model, keeping each word's confidence.
+
+    Args:
+        audio_data: Audio data to transcribe
+        local_model: Optional pre-initialized model
+        word_callback: Optional callback function for word-by-word updates
+
+    Returns:
+        Tuple of (text, list of (word, probability) tuples whose words join up to the
+        text). The list is None for long recordings decoded in parallel chunks, whose
+        stitched text doesn't map back onto the words.
+    """
+    return _transcribe_local(audio_data, local_model, word_callback, with_confidence=True)[:2]
+
+def _transcribe_local(audio_data, local_model, word_callback, with_confidence=False):
+    """Transcribe with a local model, returning (text, word confidences or None, detected language)."""
     if not local_model:
         local_model = create_local_model()
-    model_options = ConfigManager.get_config_section('model_options')
 
-    # Convert int16 to float32
-    audio_data_float = audio_data.astype(np.float32) / 32768.0
+    local_options = ConfigManager.get_config_section('model_options')['local']
+    sample_rate = ConfigManager.get_config_section('recording_options').get('sample_rate') or 16000
+    duration_seconds = len(audio_data) / sample_rate
+    num_workers = max(1, local_options.get('num_workers') or 1)
+    threshold = local_options.get('long_form_threshold') or 0
 
-    response = local_model.transcribe(audio=audio_data_float,
-                                      language=model_options['common']['language'],
-                                      initial_prompt=model_options['common']['initial_prompt'],
-                                      condition_on_previous_text=model_options['local']['condition_on_previous_text'],
-                                      temperature=model_options['common']['temperature'],
-                                      vad_filter=model_options['local']['vad_filter'],)
-    
-    # Process segments and emit words
-    text = ""
-    for segment in response[0]:
-        words = segment.text.strip().split()
-        for word in words:
+    start_time = time.time()
+    confidences = None
+    with tracing.span('model_decode', audio_seconds=round(duration_seconds, 2)):
+        if num_workers > 1 and threshold and duration_seconds > threshold:
+            text, chunk_count, language = _transcribe_local_parallel(audio_data, local_model, word_callback,
+                                                                     sample_rate, num_workers)
+            mode = f'{num_workers} workers over {chunk_count} chunks'
+        else:
+            # Process segments and emit words
+            text = ""
+            if with_confidence:
+                confidences = []
+            segments, language = _run_local_model(audio_data, local_model, word_timestamps=with_confidence)
+            for segment in segments:
+                words = segment.text.strip().split()
+                for word in words:
+                    if word_callback:
+                        word_callback(word)
+                if with_confidence:
+                    confidences.extend((word.word, word.probability) for word in segment.words or [])
+                text += segment.text
+            if confidences:
+                # Word timings can split text slightly differently; keep the two consistent
+                text = ''.join(word for word, _ in confidences)
+            mode = 'single stream'
+
+    decode_time = time.time() - start_time
+    if duration_seconds > 0:
+        ConfigManager.console_print(f'Decoded {duration_seconds:.1f}s of audio in {decode_time:.2f}s '
+                                    f'(real-time factor {decode_time / duration_seconds:.3f}, {mode}).')
+    cost_tracker.log_local_usage(duration_seconds, local_options.get('model') or 'local',
+                                 latency={'decode': decode_time})
+    return text, confidences, language
+
+def _transcribe_local_parallel(audio_data, local_model, word_callback, sample_rate, num_workers):
+    """
+    Split audio at silences and decode the chunks concurrently, stitching the text in order.
+
+    Returns:
+        Tuple of (text, number of chunks, language detected in the first chunk)
+    """
+    chunk_seconds = ConfigManager.get_config_value('model_options', 'local', 'long_form_chunk_duration') or 30
+    chunks = split_at_silence(audio_data, sample_rate, chunk_seconds, overlap_seconds=0.5)
+
+    def decode(chunk):
+        start, end = chunk
+        with tracing.span('model_decode_chunk'):
+            segments, language = _run_local_model(audio_data[start:end], local_model)
+            return ''.join(segment.text for segment in segments), language
+
+    text = ''
+    language = None
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        # Results come back in chunk order, so words can be emitted as soon as each chunk is ready
+        for chunk_text, chunk_language in pool.map(decode, chunks):
+            language = language or chunk_language
+            new_text = stitch_transcripts(text, chunk_text)
             if word_callback:
-                word_callback(word)
-        text += segment.text
-    
-    return text
+                for word in new_text.split():
+                    word_callback(word)
+            text = f'{text} {new_text}' if text else new_text
+
+    return text, len(chunks), language
+
+def transcribe_local_words(audio_data, local_model=None, initial_prompt=None):
+    """
+    Transcribe audio with a local model and return word-level results.
+
+    Args:
+        audio_data: Audio data to transcribe
+        local_model: Optional pre-initialized model
+        initial_prompt: Optional prompt, e.g. previously committed text
+
+    Returns:
+        Tuple of (list of faster-whisper words (start, end, word, probability), with
+        times relative to the start of `audio_data`, detected language)
+    """
+    if not local_model:
+        local_model = create_local_model()
+
+    segments, language = _run_local_model(audio_data, local_model, initial_prompt, word_timestamps=True)
+    return [word for segment in segments for word in (segment.words or [])], language
+
+# OpenAI's upload limit is 25MB, keep a safety margin
+API_MAX_UPLOAD_BYTES = 23 * 1024 * 1024
 
 def transcribe_api(audio_data, word_callback=None):
     """
@@ -96,199 +283,573 @@ def transcribe_api(audio_data, word_callback=None):
         word_callback: Optional callback function for word-by-word updates
         
     Note:
-        OpenAI has a 25MB file size limit. This function will automatically
-        check and warn if the audio file approaches this limit.
-    """
-    # Check estimated file size (assuming 16-bit audio at 16kHz)
-    estimated_size_mb = (len(audio_data) * 2) / (1024 * 1024)  # Convert bytes to MB
-    if estimated_size_mb > 23:  # Use 23MB as safety margin
-        ConfigManager.console_print(f"Warning: Audio file size ({estimated_size_mb:.1f}MB) is approaching OpenAI's 25MB limit.")
-        return "Error: Recording too long. Please try a shorter recording."
-    global detected_language
+        OpenAI has a 25MB file size limit. The audio is encoded in memory with the
+        configured upload format; recordings that are still too large are split at
+        silences and the pieces are uploaded concurrently.
+    """
+    return _transcribe_api(audio_data, word_callback)[0]
+
+def _transcribe_api(audio_data, word_callback=None):
+    """Transcribe with the OpenAI API, returning (text, language or None when it is unknown)."""
     model_options = ConfigManager.get_config_section('model_options')
-    client = OpenAI(
-        api_key=os.getenv('OPENAI_API_KEY') or None,
-        base_url=model_options['api']['base_url'] or 'https://api.openai.com/v1'
-    )
+    client = get_openai_client(base_url=model_options['api']['base_url'])
 
     # Get sample rate from config
     sample_rate = ConfigManager.get_config_section('recording_options').get('sample_rate') or 16000
 
-    # Create a temporary file for the audio
-    import tempfile
-    
-    temp_file = tempfile.NamedTemporaryFile(suffix='.mp3', delete=False)
-    try:
-        # Convert to float32 for soundfile
-        audio_float = audio_data.astype(np.float32) / 32768.0
-        
-        # Write the audio data to the temporary file
-        sf.write(temp_file.name, audio_float, sample_rate, format='mp3')
-        temp_file.close()  # Close the file before reopening
-        
-        # Calculate audio duration
-        duration_seconds = len(audio_data) / sample_rate
-        
-        # Handle language setting
-        language = None  # Always let Whisper auto-detect
-        ConfigManager.console_print("Using Whisper's automatic language detection")
-        
-        # Reopen the file in binary read mode for actual transcription
-        with open(temp_file.name, 'rb') as audio_file:
-            response = client.audio.transcriptions.create(
-                model=model_options['api']['model'],
-                file=audio_file,
-                prompt=model_options['common']['initial_prompt'],
-                temperature=model_options['common']['temperature'],
-            )
-            
-            # Get detected language from response
-            global detected_language
-            detected_language = getattr(response, 'language', 'en')
-            ConfigManager.console_print(f"Whisper detected language: {detected_language}")
-            
-            # Process response text word by word
-            if word_callback:
-                words = response.text.strip().split()
-                for word in words:
-                    word_callback(word)
-            
-            # Log Whisper API usage
-            whisper_cost = cost_tracker.log_whisper_usage(
-                duration_seconds=duration_seconds,
-                model=model_options['api']['model']
-            )
-            ConfigManager.console_print(f"Whisper API cost: ${whisper_cost:.4f}")
-            
-    finally:
-        # Make sure the file is closed
-        if not temp_file.closed:
-            temp_file.close()
-        # Clean up the temporary file
+    # Handle language setting
+    ConfigManager.console_print("Using Whisper's automatic language detection")
+
+    # Encode the audio in memory
+    audio_file, encoded_size, encode_time = _encode_for_upload(audio_data, sample_rate, model_options['api'])
+    if encoded_size > API_MAX_UPLOAD_BYTES:
+        return _transcribe_api_chunked(client, audio_data, word_callback, sample_rate,
+                                       model_options, encoded_size)
+
+    response, request_time = _request_transcription(client, audio_file, model_options)
+
+    language = _response_language(response, model_options)
+
+    # Process response text word by word
+    if word_callback:
+        words = response.text.strip().split()
+        for word in words:
+            word_callback(word)
+
+    # Log Whisper API usage
+    _log_whisper_cost(len(audio_data) / sample_rate, model_options,
+                      {'encode': encode_time, 'upload': request_time})
+
+    return response.text, language
+
+def _response_language(response, model_options):
+    """
+    Return the ISO-639-1 code of a transcription's language, or None when it is unknown.
+
+    The default json response carries no language, so unless one is configured the
+    language is unknown and only language-neutral formatting rules apply.
+    """
+    language = getattr(response, 'language', None)
+    if not (isinstance(language, str) and len(language) == 2):
+        configured = model_options['common'].get('language')
+        language = configured if configured and configured != 'auto' else None
+    if language:
+        ConfigManager.console_print(f"Whisper language: {language}")
+    return language
+
+def _encode_for_upload(audio_data, sample_rate, api_options):
+    """
+    Encode audio with the configured upload format and log the size/time trade-off.
+
+    Returns:
+        Tuple of (in-memory file, encoded size in bytes, encoding time in seconds)
+    """
+    upload_format = api_options.get('upload_format') or 'mp3'
+    with tracing.span('encoding', format=upload_format):
+        audio_file, encoded_size, encode_time = encode_audio(
+            audio_data, sample_rate, upload_format, api_options.get('upload_compression_level'))
+    ConfigManager.console_print(f"Encoded {len(audio_data) / sample_rate:.1f}s of audio as {upload_format}: "
+                                f"{encoded_size / 1024:.1f}KB in {encode_time * 1000:.0f}ms")
+    return audio_file, encoded_size, encode_time
+
+def _request_transcription(client, audio_file, model_options):
+    """Upload one encoded file to the transcription endpoint, returning (response, request time in seconds)."""
+    upload_start = time.perf_counter()
+    with tracing.span('api_upload'):
+        response = client.audio.transcriptions.create(
+            model=model_options['api']['model'],
+            file=audio_file,
+            prompt=model_options['common']['initial_prompt'],
+            temperature=model_options['common']['temperature'],
+        )
+    request_time = time.perf_counter() - upload_start
+    ConfigManager.console_print(f"Whisper API request took {request_time:.2f}s")
+    return response, request_time
+
+def _log_whisper_cost(duration_seconds, model_options, latency=None):
+    """Record the cost and stage latencies of one transcription request."""
+    whisper_cost = cost_tracker.log_whisper_usage(
+        duration_seconds=duration_seconds,
+        model=model_options['api']['model'],
+        latency=latency
+    )
+    ConfigManager.console_print(f"Whisper API cost: ${whisper_cost:.4f}")
+
+def _transcribe_api_chunked(client, audio_data, word_callback, sample_rate, model_options, encoded_size):
+    """
+    Split a recording that exceeds the upload limit at silences and transcribe the
+    pieces concurrently, stitching the text in order.
+
+    A piece that still encodes over the limit is split again before it is uploaded.
+    A piece whose request fails is left out, so one failure doesn't lose the rest of
+    the recording; the error is only raised when every piece fails.
+
+    Returns:
+        Tuple of (text, language of the first piece, or None when it is unknown)
+    """
+    duration_seconds = len(audio_data) / sample_rate
+    chunks = split_at_silence(audio_data, sample_rate, _upload_chunk_seconds(duration_seconds, encoded_size),
+                              overlap_seconds=0.5)
+    max_workers = max(1, model_options['api'].get('max_concurrent_requests') or 4)
+    ConfigManager.console_print(f"Recording exceeds the upload limit, sending it as {len(chunks)} pieces "
+                                f"over {min(max_workers, len(chunks))} concurrent requests.")
+
+    def transcribe_chunk(chunk):
+        """Transcribe one piece, returning a list of (start, end, response or error, latency)."""
+        start, end = chunk
         try:
-            os.unlink(temp_file.name)
-        except PermissionError:
-            pass  # Ignore if file is still in use
-            
-    return response.text
+            audio_file, size, encode_time = _encode_for_upload(audio_data[start:end], sample_rate,
+                                                               model_options['api'])
+            if size > API_MAX_UPLOAD_BYTES:
+                pieces = split_at_silence(audio_data[start:end], sample_rate,
+                                          _upload_chunk_seconds((end - start) / sample_rate, size),
+                                          overlap_seconds=0.5)
+                if len(pieces) > 1:
+                    ConfigManager.console_print(f"Piece encoded to {size / 1024 / 1024:.1f}MB, "
+                                                f"splitting it into {len(pieces)} pieces.")
+                    return [result for piece_start, piece_end in pieces
+                            for result in transcribe_chunk((start + piece_start, start + piece_end))]
+            response, request_time = _request_transcription(client, audio_file, model_options)
+            return [(start, end, response, {'encode': encode_time, 'upload': request_time})]
+        except Exception as e:
+            return [(start, end, e, None)]
+
+    text = ''
+    language = None
+    errors = []
+    transcribed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Results come back in chunk order, so words can be emitted as soon as each piece is ready
+        for results in pool.map(transcribe_chunk, chunks):
+            for start, end, response, latency in results:
+                if isinstance(response, Exception):
+                    ConfigManager.console_print(f"Transcribing {start / sample_rate:.1f}s-{end / sample_rate:.1f}s "
+                                                f"failed, leaving it out: {response}")
+                    errors.append(response)
+                    continue
+                transcribed += 1
+                if transcribed == 1:
+                    language = _response_language(response, model_options)
+                new_text = stitch_transcripts(text, response.text)
+                if word_callback:
+                    for word in new_text.split():
+                        word_callback(word)
+                text = f'{text} {new_text}' if text else new_text
+                _log_whisper_cost((end - start) / sample_rate, model_options, latency)
 
-def enhance_transcription(text):
+    if errors and not transcribed:
+        raise errors[0]
+    return text, language
+
+def _upload_chunk_seconds(duration_seconds, encoded_size):
+    """Size pieces from the measured bitrate, leaving room for the overlap and uneven cuts."""
+    return duration_seconds * API_MAX_UPLOAD_BYTES / encoded_size * 0.8
+
+def enhance_transcription(text, delta_callback=None, context=None, language=None):
     """
     Use GPT-4 to enhance and correct the transcription.
+
+    Transcripts longer than `parallel_enhancement_threshold` words are split into
+    sentence chunks that are enhanced concurrently.
+
+    Args:
+        text: Transcription to enhance
+        delta_callback: Optional callback; when given, the response is streamed and
+            every text delta is passed to it as it arrives
+        context: Optional text preceding `text`, sent for reference only
+        language: Language detected by the transcription, which selects the prompt
+
+    Returns:
+        The enhanced text, or `text` if enhancement fails. When streaming, a failure is
+        raised instead, since part of the response may already have been passed on.
     """
-    global detected_language
     post_processing = ConfigManager.get_config_section('post_processing')
     if not post_processing.get('enhance_with_gpt', True):
         return text
 
-    client = OpenAI(
-        api_key=os.getenv('OPENAI_API_KEY') or None,
-        base_url=ConfigManager.get_config_value('model_options', 'api', 'base_url') or 'https://api.openai.com/v1'
-    )
+    threshold = post_processing.get('parallel_enhancement_threshold') or 0
+    if threshold and context is None and len(text.split()) > threshold:
+        return _enhance_in_chunks(text, delta_callback, post_processing, language)
+    return _enhance_once(text, delta_callback, context, language, post_processing)
+
+def _enhance_once(text, delta_callback, context, language, post_processing):
+    """Enhance `text` with a single request, or from the cache; see enhance_transcription()."""
+    model = post_processing.get('gpt_model', 'gpt-4o-2024-08-06')
+    temperature = post_processing.get('enhancement_temperature', 0.3)
+    cache_key = None
+    if post_processing.get('enhancement_cache'):
+        enhancement_cache.max_entries = post_processing.get('enhancement_cache_size') or 1000
+        cache_key = EnhancementCache.make_key(f'{context}\n{text}' if context else text, language,
+                                              PROMPT_VERSION, model, temperature)
+        cached_text = enhancement_cache.get(cache_key)
+        if cached_text is not None:
+            ConfigManager.console_print(f"Enhancement cache hit ({enhancement_cache.hits} hits, "
+                                        f"{enhancement_cache.misses} misses): {cached_text}")
+            cost_tracker.log_gpt_usage(model=model, input_tokens=0, output_tokens=0,
+                                       original_text=text, enhanced_text=cached_text, cached=True)
+            if delta_callback:
+                delta_callback(cached_text)
+            return cached_text
+
+    client = get_openai_client()
     
     try:
         ConfigManager.console_print("Enhancing transcription with GPT...")
-        
-        # Create language-specific instructions
-        # Get the language of the original text
-        original_lang = detected_language
-        
-        # Create language-specific instructions
-        lang_instructions = {
-            'da': """
-                Special Danish instructions:
-                - Preserve Danish grammar and word order
-                - Keep Danish-specific characters (æ, ø, å)
-                - Maintain Danish expressions and idioms
-                - Do not translate to English
-                - Keep informal/formal tone as in original
-                - Preserve Danish interjections (sgu, jo, vel, etc.)
-                - Add proper Danish commas according to these rules:
-                    * Before subordinate clauses (at, som, der, hvis, når, etc.)
-                    * Between main clauses joined by og, eller, men
-                    * Before and after parenthetical expressions
-                    * Before infinitive markers (at + verb)
-                    * After introductory phrases
-                - Fix Danish sentence structure while maintaining natural flow
-                - Ensure proper spacing around punctuation marks
-                - Handle Danish quotation marks correctly („")
-            """,
-            'en': """
-                Special English instructions:
-                - Maintain English grammar and style
-                - Do not translate to other languages
-                - Keep original English expressions and idioms
-                - Preserve English sentence structure
-                - Use English punctuation rules
-            """,
-            # Add other languages as needed
-        }
-        
-        system_prompt = f"""You are a transcription enhancement expert. Your task is to:
-        1. Fix any obvious speech-to-text errors
-        2. Add proper punctuation and capitalization
-        3. Maintain the original meaning and intent
-        4. Keep the text natural and conversational
-        5. Only make changes when there's high confidence they're correct
-        6. Preserve technical terms and proper nouns exactly as spoken
-        7. IMPORTANT: DO NOT TRANSLATE - keep the text in its original language
-        8. For Danish text, follow these comma rules strictly:
-           - Place commas before subordinate clauses (at, som, der, hvis, når, etc.)
-           - Place commas between main clauses joined by og, eller, men
-           - Place commas before and after parenthetical expressions
-           - Place commas before infinitive markers (at + verb)
-           - Place commas after introductory phrases
-        
-        {lang_instructions.get(detected_language, "Maintain original language and style.")}"""
-        
-        user_prompt = f"Please enhance this transcription while maintaining its original language and meaning: {text}"
-        
-        # Get accurate token counts using tiktoken
-        model = post_processing.get('gpt_model', 'gpt-4o-2024-08-06')
-        enc = tiktoken.encoding_for_model(model)
-        input_tokens = len(enc.encode(system_prompt)) + len(enc.encode(user_prompt))
-        
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=post_processing.get('enhancement_temperature', 0.3)
-        )
-        
-        enhanced_text = response.choices[0].message.content.strip()
-        output_tokens = len(enc.encode(enhanced_text))
-        
-        # Log GPT API usage with accurate token counts
-        gpt_cost = cost_tracker.log_gpt_usage(
-            model=model,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
-            original_text=text,
-            enhanced_text=enhanced_text
-        )
-        
-        ConfigManager.console_print(f"Original: {text}")
-        ConfigManager.console_print(f"Enhanced: {enhanced_text}")
-        ConfigManager.console_print(f"Token usage - Input: {input_tokens}, Output: {output_tokens}")
-        ConfigManager.console_print(f"GPT API cost: ${gpt_cost:.4f}")
+
+        enhanced_text = None
+        if post_processing.get('enhancement_mode') == 'edits':
+            # Ask for an edit list instead of the whole text, which cuts output tokens
+            start_time = time.perf_counter()
+            edit_list, input_tokens, output_tokens = _request_enhancement(client, text, model, temperature, 'edits',
+                                                                          context=context, language=language)
+            request_time = time.perf_counter() - start_time
+            try:
+                enhanced_text = apply_edits(text, parse_edits(edit_list))
+                ConfigManager.console_print(f"Applied edit list: {edit_list}")
+            except EditError as e:
+                ConfigManager.console_print(f"Edit list could not be applied ({e}), "
+                                            "falling back to full-text enhancement.")
+            _log_enhancement(model, text, enhanced_text or text, input_tokens, output_tokens, request_time)
+            if enhanced_text is not None and delta_callback:
+                delta_callback(enhanced_text)
+
+        if enhanced_text is None:
+            start_time = time.perf_counter()
+            enhanced_text, input_tokens, output_tokens = _request_enhancement(
+                client, text, model, temperature, 'full', delta_callback, context, language)
+            _log_enhancement(model, text, enhanced_text, input_tokens, output_tokens,
+                             time.perf_counter() - start_time)
+
+        if cache_key:
+            enhancement_cache.put(cache_key, enhanced_text)
         
         return enhanced_text
     except Exception as e:
         ConfigManager.console_print(f"Transcription enhancement failed: {str(e)}")
+        if delta_callback:
+            raise
         return text  # Return original text if enhancement fails
 
-def post_process_transcription(transcription):
+def _enhance_in_chunks(text, delta_callback, post_processing, language=None):
+    """
+    Enhance a long transcript as concurrent sentence chunks, reassembled in order.
+
+    Each chunk is sent with the last sentence of the chunk before it as context, so
+    the model sees where it starts without returning that text again. Chunks are
+    enhanced with one request each and never split again.
+    """
+    chunk_words = post_processing.get('enhancement_chunk_words') or 150
+    threshold = post_processing.get('parallel_enhancement_threshold') or chunk_words
+    chunks = split_sentences(text, min(chunk_words, threshold))
+    max_workers = max(1, post_processing.get('enhancement_workers') or 4)
+    ConfigManager.console_print(f"Enhancing {len(text.split())} words as {len(chunks)} chunks "
+                                f"over {min(max_workers, len(chunks))} concurrent requests.")
+
+    def enhance_chunk(index):
+        context = last_sentence(chunks[index - 1]) if index else None
+        return _enhance_once(chunks[index], None, context or None, language, post_processing)
+
+    enhanced_chunks = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Results come back in chunk order, so text can be passed on as soon as each chunk is ready
+        for enhanced in pool.map(enhance_chunk, range(len(chunks))):
+            if delta_callback:
+                delta_callback(f' {enhanced}' if enhanced_chunks else enhanced)
+            enhanced_chunks.append(enhanced)
+    return ' '.join(enhanced_chunks)
+
+def _request_enhancement(client, text, model, temperature, mode, delta_callback=None, context=None, language=None):
+    """
+    Send one enhancement request.
+
+    Args:
+        client: OpenAI client
+        text: Transcription to enhance
+        model: GPT model to use
+        temperature: Sampling temperature
+        mode: 'full' for the corrected text, 'edits' for an edit list
+        delta_callback: Optional callback; when given, the response is streamed
+        context: Optional text preceding `text`, sent for reference only
+        language: Language of the transcription
+
+    Returns:
+        Tuple of (response text, input tokens, output tokens)
+    """
+    messages = build_messages(text, language, mode, context)
+
+    with tracing.span('gpt_enhancement', mode=mode, streamed=bool(delta_callback)):
+        if delta_callback:
+            response_text, usage = _stream_enhancement(client, model, messages, temperature, delta_callback)
+        else:
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature
+            )
+            response_text = response.choices[0].message.content
+            usage = None
+    response_text = response_text.strip()
+
+    if usage:
+        # Use the token counts reported by the API
+        return response_text, usage.prompt_tokens, usage.completion_tokens
+    # Count tokens locally; the system prompt's count is cached
+    input_tokens = system_prompt_tokens(language, model, mode) + count_tokens(messages[-1]['content'], model)
+    return response_text, input_tokens, count_tokens(response_text, model)
+
+def _log_enhancement(model, text, enhanced_text, input_tokens, output_tokens, request_time):
+    """Log the usage, cost and latency of one enhancement request."""
+    # Log GPT API usage with accurate token counts
+    gpt_cost = cost_tracker.log_gpt_usage(
+        model=model,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        original_text=text,
+        enhanced_text=enhanced_text,
+        latency={'enhancement': request_time}
+    )
+    
+    ConfigManager.console_print(f"Original: {text}")
+    ConfigManager.console_print(f"Enhanced: {enhanced_text}")
+    ConfigManager.console_print(f"Token usage - Input: {input_tokens}, Output: {output_tokens}")
+    ConfigManager.console_print(f"GPT API cost: ${gpt_cost:.4f}")
+
+def _stream_enhancement(client, model, messages, temperature, delta_callback):
+    """
+    Request an enhancement as a stream, passing text deltas to `delta_callback` as they arrive.
+
+    Returns:
+        Tuple of (full response text, usage reported in the final chunk or None)
+    """
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+
+    parts = []
+    usage = None
+    start_time = time.perf_counter()
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            if not parts:
+                ConfigManager.console_print(f"First enhanced token after {time.perf_counter() - start_time:.2f}s")
+            parts.append(chunk.choices[0].delta.content)
+            delta_callback(chunk.choices[0].delta.content)
+        if getattr(chunk, 'usage', None):
+            usage = chunk.usage
+    return ''.join(parts), usage
+
+class StreamingFormatter:
+    """
+    Apply the post-processing rules to text that arrives in pieces.
+
+    Text is passed on as soon as it can no longer be affected by the rules: leading
+    whitespace is dropped, and trailing whitespace and a trailing period are held
+    back until more text follows or the stream ends.
+    """
+
+    def __init__(self, post_processing, emit):
+        """
+        Initialize the formatter.
+
+        Args:
+            post_processing: The post_processing config section
+            emit: Callback receiving formatted text as it becomes final
+        """
+        self.post_processing = post_processing
+        self.emit = emit
+        self.text = ''  # Everything emitted so far
+        self.pending = ''  # Held back tail
+
+    @property
+    def started(self):
+        """Whether any text has been received."""
+        return bool(self.text or self.pending)
+
+    def feed(self, delta):
+        """Add a piece of text, emitting what is final."""
+        if self.post_processing['remove_capitalization']:
+            delta = delta.lower()
+        if not self.started:
+            delta = delta.lstrip()
+        pending = self.pending + delta
+        held = len(pending) - len(pending.rstrip())
+        if self.post_processing['remove_trailing_period'] and pending.rstrip().endswith('.'):
+            held += 1
+        self._emit(pending[:len(pending) - held])
+        self.pending = pending[len(pending) - held:]
+
+    def finish(self):
+        """
+        End the stream, emitting the final part.
+
+        Returns:
+            The complete formatted text
+        """
+        tail = self.pending.rstrip()
+        if self.post_processing['remove_trailing_period'] and tail.endswith('.'):
+            tail = tail[:-1]
+        if self.post_processing['add_trailing_space']:
+            tail += ' '
+        self.pending = ''
+        self._emit(tail)
+        return self.text
+
+    def abort(self, text):
+        """
+        End a stream that broke off, emitting `text` in full in place of the rest.
+
+        Text that was already emitted can't be taken back, so `text` follows it after
+        a space and nothing of the dictation is lost.
+
+        Returns:
+            `text`, formatted
+        """
+        started = bool(self.text)
+        self.text = ''
+        self.pending = ''
+        if started:
+            self.emit(' ')
+        self.feed(text)
+        return self.finish()
+
+    def _emit(self, text):
+        if text:
+            self.text += text
+            self.emit(text)
+
+def enhance_low_confidence_spans(confidences, threshold, context_words=3, language=None, max_workers=4):
+    """
+    Enhance only the parts of a transcription that the model was unsure about.
+
+    Words below `threshold` are grouped into spans, merging spans at most two
+    `context_words` apart, and the spans are enhanced concurrently. Only the span is
+    sent for correction; the `context_words` words before it go along as context. When
+    every word is above the threshold, no request is made at all.
+
+    Args:
+        confidences: List of (word, probability) tuples; the words join up to the text
+        threshold: Word probability below which a word is considered unreliable
+        context_words: Words of context before every span
+        language: Language detected by the transcription
+        max_workers: Maximum number of spans enhanced at once
+
+    Returns:
+        The transcription with the low-confidence spans enhanced
+    """
+    words = [word for word, _ in confidences]
+    spans = []
+    for i, (_, probability) in enumerate(confidences):
+        if probability >= threshold:
+            continue
+        if spans and i - spans[-1][1] <= 2 * context_words:
+            spans[-1] = (spans[-1][0], i + 1)
+        else:
+            spans.append((i, i + 1))
+
+    if not spans:
+        ConfigManager.console_print(f"All words above confidence {threshold}, skipping GPT enhancement.")
+        return ''.join(words)
+
+    covered = sum(end - start for start, end in spans)
+    ConfigManager.console_print(f"Enhancing {len(spans)} low-confidence spans ({covered}/{len(words)} words).")
+    if covered > len(words) // 2:
+        # Mostly unreliable; one request for everything is cheaper than many
+        return enhance_transcription(''.join(words), language=language)
+
+    def enhance_span(span):
+        start, end = span
+        context = ''.join(words[max(0, start - context_words):start]).strip()
+        starts_sentence = start == 0 or words[start - 1].rstrip().endswith(('.', '!', '?'))
+        return _enhance_span(''.join(words[start:end]), context or None, starts_sentence, language)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(spans)))) as pool:
+        enhanced_spans = list(pool.map(enhance_span, spans))
+
+    parts = []
+    position = 0
+    for (start, end), enhanced in zip(spans, enhanced_spans):
+        parts.append(''.join(words[position:start]))
+        parts.append(enhanced)
+        position = end
+    parts.append(''.join(words[position:]))
+    return ''.join(parts)
+
+# Punctuation the enhancement may add at the end of a span that continues the sentence
+_SPAN_END_PUNCTUATION = '.,;:!?…'
+
+def _enhance_span(span, context, starts_sentence, language=None):
+    """
+    Enhance part of a sentence, keeping the whitespace around it and its open ends.
+
+    Punctuation added at the end of the span is dropped, and unless the span starts a
+    sentence its first letter keeps its original case.
+    """
+    stripped = span.strip()
+    enhanced = enhance_transcription(stripped, context=context, language=language).strip()
+    original_end = stripped[len(stripped.rstrip(_SPAN_END_PUNCTUATION)):]
+    enhanced = enhanced.rstrip(_SPAN_END_PUNCTUATION) + original_end
+    if enhanced and not starts_sentence and stripped[:1].islower():
+        enhanced = enhanced[0].lower() + enhanced[1:]
+    leading = span[:len(span) - len(span.lstrip())]
+    trailing = span[len(span.rstrip()):]
+    return f'{leading}{enhanced}{trailing}'
+
+def post_process_transcription(transcription, delta_callback=None, confidences=None, language=None):
     """
     Apply post-processing to the transcription.
+
+    Args:
+        transcription: Raw transcription
+        delta_callback: Optional callback; when streaming enhancement is enabled, the
+            formatted text is passed to it incrementally while GPT is still generating
+        confidences: Optional list of (word, probability) tuples making up the
+            transcription; with confidence gating, only low-confidence spans are enhanced
+        language: Language detected by the transcription, for formatting and enhancement
     """
+    post_processing = ConfigManager.get_config_section('post_processing')
+    use_gpt = post_processing.get('enhance_with_gpt', True)
+
+    if use_gpt and confidences is not None and post_processing.get('confidence_gating'):
+        transcription = enhance_low_confidence_spans(
+            confidences, post_processing.get('confidence_threshold', 0.6),
+            post_processing.get('confidence_context_words', 3), language,
+            post_processing.get('enhancement_workers') or 4)
+        use_gpt = False
+    skip_when_clean = use_gpt and post_processing.get('skip_gpt_when_clean')
+
+    # Rule-based punctuation and casing, standalone or as a gate in front of GPT
+    if post_processing.get('local_formatting') or skip_when_clean:
+        start_time = time.perf_counter()
+        formatted = format_text(transcription, language)
+        ConfigManager.console_print(f"Local formatting took {(time.perf_counter() - start_time) * 1000:.3f}ms")
+        if skip_when_clean and is_clean(formatted):
+            ConfigManager.console_print("Transcription is already clean, skipping GPT enhancement.")
+            use_gpt = False
+        if post_processing.get('local_formatting') or not use_gpt:
+            transcription = formatted
+
+    if delta_callback and use_gpt and post_processing.get('stream_enhancement'):
+        formatter = StreamingFormatter(post_processing, delta_callback)
+        try:
+            enhanced = enhance_transcription(transcription, formatter.feed, language=language)
+        except Exception:
+            # Don't let a stream that broke off cut the end of the dictation
+            ConfigManager.console_print("Using the original transcription instead.")
+            return formatter.abort(transcription)
+        if not formatter.started:
+            formatter.feed(enhanced)
+        return formatter.finish()
+
     # First enhance the transcription with GPT-4
-    transcription = enhance_transcription(transcription)
+    if use_gpt:
+        transcription = enhance_transcription(transcription, language=language)
     
     # Then apply basic formatting rules
     transcription = transcription.strip()
-    post_processing = ConfigManager.get_config_section('post_processing')
     if post_processing['remove_trailing_period'] and transcription.endswith('.'):
         transcription = transcription[:-1]
     if post_processing['add_trailing_space']:
@@ -298,7 +859,20 @@ def post_process_transcription(transcription):
 
     return transcription
 
-def transcribe(audio_data, local_model=None, word_callback=None):
+def exceeds_max_duration(audio_data):
+    """Return whether a recording is longer than `max_duration` and so isn't transcribed; 0 is unlimited."""
+    recording_options = ConfigManager.get_config_section('recording_options')
+    sample_rate = recording_options.get('sample_rate') or 16000
+    max_duration = recording_options.get('max_duration')
+    if not max_duration:
+        return False
+
+    if len(audio_data) / sample_rate > max_duration:
+        ConfigManager.console_print(f"Recording exceeded maximum duration of {max_duration} seconds.")
+        return True
+    return False
+
+def transcribe(audio_data, local_model=None, word_callback=None, delta_callback=None):
     """
     Transcribe audio data using the OpenAI API or a local model, depending on config.
     
@@ -306,22 +880,18 @@ def transcribe(audio_data, local_model=None, word_callback=None):
         audio_data: Audio data to transcribe
         local_model: Optional pre-initialized model
         word_callback: Optional callback function for word-by-word updates
+        delta_callback: Optional callback receiving the final text incrementally when
+            streaming enhancement is enabled
     """
-    if audio_data is None:
-        return ''
-
-    # Check recording duration
-    sample_rate = ConfigManager.get_config_section('recording_options').get('sample_rate') or 16000
-    duration_seconds = len(audio_data) / sample_rate
-    max_duration = ConfigManager.get_config_section('recording_options').get('max_duration') or 120
-
-    if max_duration > 0 and duration_seconds > max_duration:
-        ConfigManager.console_print(f"Recording exceeded maximum duration of {max_duration} seconds.")
+    if audio_data is None or exceeds_max_duration(audio_data):
         return ''
 
+    confidences = None
     if ConfigManager.get_config_value('model_options', 'use_api'):
-        transcription = transcribe_api(audio_data, word_callback)
+        transcription, language = _transcribe_api(audio_data, word_callback)
     else:
-        transcription = transcribe_local(audio_data, local_model, word_callback)
+        with_confidence = bool(ConfigManager.get_config_value('post_processing', 'confidence_gating'))
+        transcription, confidences, language = _transcribe_local(audio_data, local_model, word_callback,
+                                                                 with_confidence)
 
-    return post_process_transcription(transcription)
+    return post_process_transcription(transcription, delta_callback, confidences, language)
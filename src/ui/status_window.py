@@ -195,8 +195,12 @@ class StatusWindow(BaseWindow):
         elif status == 'transcribing':
             self.status_label.setText('Transcribing...')
             self.waveform.stop_animation()
+        elif status == 'loading':
+            self.status_label.setText('Loading model...')
+            self.waveform.stop_animation()
+            self.show()
 
-        if status in ('idle', 'error', 'cancel'):
+        if status in ('idle', 'error', 'cancel', 'ready'):
             self.close()
 
 if __name__ == '__main__':
@@ -0,0 +1,232 @@
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+# Entry type codes stored in the `type` column
+WHISPER = 0
+GPT = 1
+LOCAL = 2
+TYPING = 3
+
+ENTRY_TYPE_CODES = {"whisper": WHISPER, "gpt": GPT, "local": LOCAL, "typing": TYPING}
+
+# Schema of the columns, one row per logged entry. Columns that don't apply to an entry type are 0,
+# or NaN for latency when it wasn't recorded. Latency is the sum of the entry's stages.
+USAGE_DTYPE = np.dtype([
+    ("timestamp", "datetime64[us]"),
+    ("type", "u1"),
+    ("model", "u2"),  # Index into UsageHistory.models
+    ("duration_seconds", "f4"),
+    ("input_tokens", "i4"),
+    ("output_tokens", "i4"),
+    ("cost", "f8"),
+    ("latency_seconds", "f4"),
+])
+
+NUMERIC_COLUMNS = ("duration_seconds", "input_tokens", "output_tokens", "cost", "latency_seconds")
+
+
+class UsageHistory:
+    """
+    Usage history as NumPy columns, for vectorised analytics.
+
+    Each USAGE_DTYPE field is one contiguous array, rows sorted by timestamp, with
+    models stored as indices into `models`. A million requests take about 30 MB and
+    every query below is a handful of array operations over the columns it needs.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], models: Sequence[str]):
+        """
+        Initialize the history.
+
+        Args:
+            columns: Array per USAGE_DTYPE field, rows sorted by timestamp
+            models: Model names the `model` column indexes into
+        """
+        self.columns = columns
+        self.models = list(models)
+
+    def __len__(self):
+        return len(self.columns["timestamp"])
+
+    @classmethod
+    def from_records(cls, records: np.ndarray, models: Sequence[str]) -> "UsageHistory":
+        """
+        Build the history from a structured array of USAGE_DTYPE rows.
+
+        Args:
+            records: Rows to analyse, in any order
+            models: Model names the `model` field indexes into
+        """
+        records = records[np.argsort(records["timestamp"], kind="stable")]
+        return cls({name: np.ascontiguousarray(records[name]) for name in USAGE_DTYPE.names}, models)
+
+    def to_records(self) -> np.ndarray:
+        """Return the history as a structured array of USAGE_DTYPE rows."""
+        records = np.empty(len(self), dtype=USAGE_DTYPE)
+        for name, values in self.columns.items():
+            records[name] = values
+        return records
+
+    @classmethod
+    def from_entries(cls, entries: Dict[str, Iterable[Dict]]) -> "UsageHistory":
+        """
+        Build the history from CostTracker entries.
+
+        Args:
+            entries: Entries per entry type ("whisper", "gpt", "local" or "typing");
+                entries without a model, such as typing, use the type as model name
+        """
+        model_index = {}
+        columns = {name: [] for name in USAGE_DTYPE.names}
+        for entry_type, type_entries in entries.items():
+            code = ENTRY_TYPE_CODES[entry_type]
+            for entry in type_entries:
+                columns["timestamp"].append(entry["timestamp"])
+                columns["type"].append(code)
+                columns["model"].append(model_index.setdefault(entry.get("model", entry_type), len(model_index)))
+                columns["duration_seconds"].append(entry.get("duration_seconds", 0))
+                columns["input_tokens"].append(entry.get("input_tokens", 0))
+                columns["output_tokens"].append(entry.get("output_tokens", 0))
+                columns["cost"].append(entry.get("cost", entry.get("total_cost", 0.0)))
+                latency = entry.get("latency")
+                columns["latency_seconds"].append(sum(latency.values()) if latency else np.nan)
+
+        columns = {name: np.asarray(values, dtype=USAGE_DTYPE[name]) for name, values in columns.items()}
+        order = np.argsort(columns["timestamp"], kind="stable")
+        return cls({name: values[order] for name, values in columns.items()},
+                   [str(model) for model in model_index])
+
+    def _select(self, column: str, entry_type: Optional[int] = None, model: Optional[str] = None) -> np.ndarray:
+        """Return a column's values for one entry type and/or model."""
+        mask = None
+        if entry_type is not None:
+            mask = self.columns["type"] == entry_type
+        if model is not None:
+            code = self.models.index(model) if model in self.models else -1
+            model_mask = self.columns["model"] == code
+            mask = model_mask if mask is None else mask & model_mask
+        values = self.columns[column]
+        return values if mask is None else values[mask]
+
+    def between(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> "UsageHistory":
+        """
+        Return the history between two dates, inclusive, without copying the columns.
+
+        Args:
+            start_date: Optional start date in ISO format
+            end_date: Optional end date in ISO format
+        """
+        timestamps = self.columns["timestamp"]
+        first = np.searchsorted(timestamps, np.datetime64(start_date, "us"), "left") if start_date else 0
+        last = np.searchsorted(timestamps, np.datetime64(end_date, "us"), "right") if end_date else len(timestamps)
+        return UsageHistory({name: values[first:last] for name, values in self.columns.items()}, self.models)
+
+    def percentiles(self, column: str, percentiles: Sequence[float] = (50, 90, 99),
+                    entry_type: Optional[int] = None, model: Optional[str] = None) -> Dict[float, float]:
+        """
+        Compute percentiles of a column, ignoring rows where it wasn't recorded.
+
+        Args:
+            column: One of NUMERIC_COLUMNS
+            percentiles: Percentiles to compute, between 0 and 100
+            entry_type: Optional entry type code to only include one type of entry
+            model: Optional model to only include its requests
+
+        Returns:
+            Dictionary of percentile -> value, NaN when there are no values
+        """
+        values = self._select(column, entry_type, model).astype(np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return {p: float("nan") for p in percentiles}
+        return dict(zip(percentiles, np.percentile(values, percentiles).tolist()))
+
+    def by_model(self) -> Dict[str, Dict]:
+        """
+        Break usage down per model.
+
+        Returns:
+            Dictionary of model -> requests, duration, tokens and cost
+        """
+        codes = self.columns["model"]
+        size = len(self.models)
+        counts = np.bincount(codes, minlength=size)
+        sums = {column: np.bincount(codes, weights=self.columns[column], minlength=size)
+                for column in ("duration_seconds", "input_tokens", "output_tokens", "cost")}
+        return {
+            model: {
+                "requests": int(counts[i]),
+                "duration_seconds": float(sums["duration_seconds"][i]),
+                "input_tokens": int(sums["input_tokens"][i]),
+                "output_tokens": int(sums["output_tokens"][i]),
+                "cost": float(sums["cost"][i]),
+            }
+            for i, model in enumerate(self.models) if counts[i]
+        }
+
+    def daily_totals(self, column: str = "cost", entry_type: Optional[int] = None):
+        """
+        Sum a column per day, including days without usage.
+
+        Args:
+            column: One of NUMERIC_COLUMNS other than latency_seconds
+            entry_type: Optional entry type code to only include one type of entry
+
+        Returns:
+            Tuple of (days as datetime64[D] array, sums array), empty without usage
+        """
+        timestamps = self._select("timestamp", entry_type)
+        if not len(timestamps):
+            return np.array([], dtype="datetime64[D]"), np.array([])
+        days = timestamps.astype("datetime64[D]")
+        offsets = (days - days[0]).astype(np.int64)
+        sums = np.bincount(offsets, weights=self._select(column, entry_type))
+        return days[0] + np.arange(len(sums)), sums
+
+    def moving_average(self, column: str = "cost", window_days: int = 7,
+                       entry_type: Optional[int] = None):
+        """
+        Compute a trailing moving average of a column's daily totals.
+
+        Args:
+            column: One of NUMERIC_COLUMNS other than latency_seconds
+            window_days: Number of days averaged; the first days average what is available
+            entry_type: Optional entry type code to only include one type of entry
+
+        Returns:
+            Tuple of (days as datetime64[D] array, averages array)
+        """
+        days, sums = self.daily_totals(column, entry_type)
+        cumulative = np.concatenate(([0.0], np.cumsum(sums)))
+        ends = np.arange(1, len(sums) + 1)
+        starts = np.maximum(ends - window_days, 0)
+        return days, (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+    def cost_per_minute(self) -> float:
+        """Return the total cost of all requests per minute of audio sent to the API, or NaN without any."""
+        minutes = self._select("duration_seconds", WHISPER).sum(dtype=np.float64) / 60
+        return float(self.columns["cost"].sum() / minutes) if minutes else float("nan")
+
+    def report(self) -> Dict:
+        """
+        Build an overview of the history.
+
+        Returns:
+            Dictionary with entry counts, total cost, cost per spoken minute, per-model
+            breakdown, Whisper duration percentiles and latency percentiles per entry type
+        """
+        counts = np.bincount(self.columns["type"], minlength=len(ENTRY_TYPE_CODES))
+        return {
+            "num_transcriptions": int(counts[WHISPER]),
+            "num_enhancements": int(counts[GPT]),
+            "num_local_transcriptions": int(counts[LOCAL]),
+            "num_typed": int(counts[TYPING]),
+            "total_cost": float(self.columns["cost"].sum()),
+            "cost_per_minute": self.cost_per_minute(),
+            "by_model": self.by_model(),
+            "duration_percentiles": self.percentiles("duration_seconds", entry_type=WHISPER),
+            "latency_percentiles": {entry_type: self.percentiles("latency_seconds", entry_type=code)
+                                    for entry_type, code in ENTRY_TYPE_CODES.items()},
+        }
+
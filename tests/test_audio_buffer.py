@@ -0,0 +1,109 @@
+import unittest
+import weakref
+import numpy as np
+from src.audio_buffer import AudioBuffer, PreRollRing
+
+class TestAudioBuffer(unittest.TestCase):
+    def setUp(self):
+        """Set up a small buffer so growth is exercised."""
+        self.buffer = AudioBuffer(sample_rate=1000, initial_seconds=0.01)  # 10 samples
+
+    def test_write_and_data(self):
+        """Test that written blocks are stored contiguously as int16."""
+        self.buffer.write(np.arange(4, dtype=np.int16))
+        self.buffer.write(np.arange(4, 8, dtype=np.int16))
+
+        data = self.buffer.data()
+        self.assertEqual(data.dtype, np.int16)
+        np.testing.assert_array_equal(data, np.arange(8, dtype=np.int16))
+        self.assertAlmostEqual(self.buffer.duration, 0.008)
+
+    def test_growth_keeps_existing_views_valid(self):
+        """Test that the arena grows and earlier views are not invalidated."""
+        self.buffer.write(np.arange(8, dtype=np.int16))
+        view = self.buffer.data()
+        self.buffer.write(np.arange(8, 30, dtype=np.int16))
+
+        self.assertGreaterEqual(self.buffer.capacity, 30)
+        np.testing.assert_array_equal(view, np.arange(8, dtype=np.int16))
+        np.testing.assert_array_equal(self.buffer.data(), np.arange(30, dtype=np.int16))
+
+    def test_read_frame(self):
+        """Test that frames are returned in order as zero-copy views."""
+        self.buffer.write(np.arange(7, dtype=np.int16))
+
+        first = self.buffer.read_frame(3)
+        second = self.buffer.read_frame(3)
+        self.assertIsNone(self.buffer.read_frame(3))  # Only one sample left
+        np.testing.assert_array_equal(first, [0, 1, 2])
+        np.testing.assert_array_equal(second, [3, 4, 5])
+        self.assertTrue(np.shares_memory(first, self.buffer.data()))
+        self.assertEqual(self.buffer.available(), 1)
+
+    def test_take(self):
+        """Test that detached audio is unaffected by later writes and the rest is kept."""
+        self.buffer.write(np.arange(8, dtype=np.int16))
+        self.buffer.read_frame(6)
+        taken = self.buffer.take(5)
+        self.buffer.write(np.arange(100, 120, dtype=np.int16))
+
+        np.testing.assert_array_equal(taken, np.arange(5, dtype=np.int16))
+        self.assertEqual(self.buffer.available(), 22)  # Two unread samples before the write
+        np.testing.assert_array_equal(self.buffer.data()[:3], [5, 6, 7])
+        self.assertEqual(len(self.buffer), 23)
+
+    def test_take_keeps_arena(self):
+        """Test that take copies out the detached samples and keeps writing into the same arena."""
+        self.buffer.write(np.arange(8, dtype=np.int16))
+        arena = weakref.ref(self.buffer._data)
+        utterance = self.buffer.take(3)
+        self.buffer.take(2)
+        self.buffer.write(np.arange(100, 105, dtype=np.int16))
+
+        self.assertIs(self.buffer._data, arena())
+        self.assertFalse(np.shares_memory(utterance, self.buffer._data))
+        np.testing.assert_array_equal(utterance, [0, 1, 2])
+        np.testing.assert_array_equal(self.buffer.data(), [5, 6, 7, 100, 101, 102, 103, 104])
+
+    def test_clear(self):
+        """Test that clearing resets length and read position."""
+        self.buffer.write(np.arange(5, dtype=np.int16))
+        self.buffer.read_frame(2)
+        self.buffer.clear()
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.available(), 0)
+
+
+class TestPreRollRing(unittest.TestCase):
+    def test_keeps_most_recent_samples_in_order(self):
+        """Test that the ring overwrites the oldest samples and drains oldest first."""
+        ring = PreRollRing(5)
+        ring.write(np.arange(3, dtype=np.int16))
+        ring.write(np.arange(3, 7, dtype=np.int16))  # Wraps around
+
+        target = AudioBuffer(sample_rate=1000, initial_seconds=0.01)
+        self.assertEqual(ring.drain_into(target), 5)
+        np.testing.assert_array_equal(target.data(), [2, 3, 4, 5, 6])
+        self.assertEqual(len(ring), 0)
+
+    def test_block_larger_than_capacity(self):
+        """Test that a block larger than the ring keeps only its tail."""
+        ring = PreRollRing(4)
+        ring.write(np.arange(10, dtype=np.int16))
+
+        target = AudioBuffer(sample_rate=1000, initial_seconds=0.01)
+        ring.drain_into(target)
+        np.testing.assert_array_equal(target.data(), [6, 7, 8, 9])
+
+    def test_zero_capacity(self):
+        """Test that a disabled pre-roll stores nothing."""
+        ring = PreRollRing(0)
+        ring.write(np.arange(10, dtype=np.int16))
+
+        target = AudioBuffer(sample_rate=1000, initial_seconds=0.01)
+        self.assertEqual(ring.drain_into(target), 0)
+        self.assertEqual(len(target), 0)
+
+if __name__ == '__main__':
+    unittest.main()
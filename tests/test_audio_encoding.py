@@ -0,0 +1,44 @@
+import unittest
+import numpy as np
+import soundfile as sf
+from src.audio_encoding import encode_audio, UPLOAD_FORMATS
+
+
+class TestAudioEncoding(unittest.TestCase):
+    def setUp(self):
+        """One second of a 440 Hz tone at 16 kHz."""
+        t = np.arange(16000) / 16000
+        self.audio_data = (np.sin(2 * np.pi * 440 * t) * 8000).astype(np.int16)
+
+    def test_formats_are_named_and_decodable(self):
+        """Every upload format produces a named in-memory file that decodes to the same length."""
+        for upload_format in UPLOAD_FORMATS:
+            audio_file, size, encode_time = encode_audio(self.audio_data, 16000, upload_format)
+            self.assertEqual(audio_file.name, f'audio.{UPLOAD_FORMATS[upload_format][2]}')
+            self.assertEqual(size, len(audio_file.getvalue()))
+            self.assertGreaterEqual(encode_time, 0)
+            if upload_format in ('flac', 'wav'):
+                decoded, sample_rate = sf.read(audio_file, dtype='int16')
+                self.assertEqual(sample_rate, 16000)
+                np.testing.assert_array_equal(decoded, self.audio_data)
+
+    def test_compressed_formats_are_smaller(self):
+        """Compressed formats are smaller than WAV."""
+        wav_size = encode_audio(self.audio_data, 16000, 'wav')[1]
+        for upload_format in ('flac', 'ogg', 'mp3'):
+            self.assertLess(encode_audio(self.audio_data, 16000, upload_format)[1], wav_size)
+
+    def test_compression_level(self):
+        """The full compression range is accepted, and wav ignores it."""
+        for upload_format in UPLOAD_FORMATS:
+            for compression_level in (0.0, 1.0):
+                encode_audio(self.audio_data, 16000, upload_format, compression_level)
+
+    def test_unsupported_format(self):
+        """Unknown formats are rejected."""
+        with self.assertRaises(ValueError):
+            encode_audio(self.audio_data, 16000, 'aac')
+
+
+if __name__ == '__main__':
+    unittest.main()
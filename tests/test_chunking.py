@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+from src.chunking import last_sentence, split_at_silence, split_sentences, stitch_transcripts
+
+class TestSplitAtSilence(unittest.TestCase):
+    def setUp(self):
+        """Build 10 seconds of 'speech' at 1kHz with a pause from 4.0s to 4.3s."""
+        self.sample_rate = 1000
+        rng = np.random.default_rng(0)
+        self.audio = rng.integers(-8000, 8000, 10 * self.sample_rate).astype(np.int16)
+        self.audio[4000:4300] = 0
+
+    def test_short_audio_is_not_split(self):
+        """Test that audio under the limit is returned as one chunk."""
+        self.assertEqual(split_at_silence(self.audio, self.sample_rate, 20), [(0, 10000)])
+
+    def test_cut_lands_in_pause(self):
+        """Test that the cut is placed in the quiet region and chunks cover the audio."""
+        chunks = split_at_silence(self.audio, self.sample_rate, 5)
+
+        self.assertTrue(4000 <= chunks[0][1] <= 4300)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], 10000)
+        for (_, end), (start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, start)
+        self.assertTrue(all(end - start <= 5000 for start, end in chunks))
+
+    def test_overlap(self):
+        """Test that every chunk but the first starts before the previous cut."""
+        chunks = split_at_silence(self.audio, self.sample_rate, 5, overlap_seconds=0.5)
+        plain = split_at_silence(self.audio, self.sample_rate, 5)
+
+        self.assertEqual(chunks[0], plain[0])
+        self.assertEqual(chunks[1][0], plain[1][0] - 500)
+
+class TestStitchTranscripts(unittest.TestCase):
+    def test_removes_repeated_words(self):
+        """Test that words repeated across the overlap are dropped."""
+        self.assertEqual(stitch_transcripts("we went to the store.", "The store was closed"), "was closed")
+
+    def test_no_overlap(self):
+        """Test that text without overlap is kept as is."""
+        self.assertEqual(stitch_transcripts("hello there", " general Kenobi"), "general Kenobi")
+
+
+class TestSplitSentences(unittest.TestCase):
+    def test_groups_whole_sentences(self):
+        """Test that chunks hold whole sentences up to the word limit."""
+        text = "One two three. Four five. Six seven eight nine! Ten?"
+        self.assertEqual(split_sentences(text, 5), ["One two three. Four five.", "Six seven eight nine! Ten?"])
+
+    def test_long_sentence_is_split_at_words(self):
+        """Test that a sentence over the limit is split at word boundaries."""
+        self.assertEqual(split_sentences("a b c d e f g", 3), ["a b c", "d e f", "g"])
+
+    def test_last_sentence(self):
+        """Test that the last sentence is used as context."""
+        self.assertEqual(last_sentence("First one. And the second"), "And the second")
+
+if __name__ == '__main__':
+    unittest.main()
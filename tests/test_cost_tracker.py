@@ -1,19 +1,25 @@
 import os
 import json
+import shutil
+import threading
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 from src.cost_tracker import CostTracker
 
 class TestCostTracker(unittest.TestCase):
     def setUp(self):
         """Set up test environment before each test."""
-        self.test_log_file = "test_usage_costs.json"
+        self.test_log_file = "test_usage_costs.jsonl"
+        self.test_legacy_file = "test_usage_costs.json"
         self.cost_tracker = CostTracker(self.test_log_file)
 
     def tearDown(self):
         """Clean up test environment after each test."""
-        if os.path.exists(self.test_log_file):
-            os.remove(self.test_log_file)
+        self.cost_tracker.close()
+        for path in (self.test_log_file, self.test_legacy_file, f"{self.test_legacy_file}.migrated"):
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(self.cost_tracker.archive_dir, ignore_errors=True)
 
     def test_whisper_cost_calculation(self):
         """Test Whisper API cost calculations."""
@@ -54,13 +60,73 @@ class TestCostTracker(unittest.TestCase):
             enhanced_text="Enhanced test"
         )
 
-        # Verify log file exists and contains valid JSON
+        # Verify log file exists and holds one JSON line per request
+        self.cost_tracker.flush()
         self.assertTrue(os.path.exists(self.test_log_file))
         with open(self.test_log_file, 'r') as f:
-            data = json.load(f)
-            self.assertTrue('whisper_usage' in data)
-            self.assertTrue('gpt_usage' in data)
-            self.assertTrue('total_cost' in data)
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line['type'] for line in lines], ['whisper', 'gpt'])
+        self.assertEqual(lines[0]['duration_seconds'], 300)
+        self.assertEqual(lines[1]['enhanced_text'], "Enhanced test")
+
+        # Verify a new tracker loads the same totals
+        reloaded = CostTracker(self.test_log_file)
+        self.assertAlmostEqual(reloaded.usage_data['total_cost'], self.cost_tracker.usage_data['total_cost'])
+        self.assertEqual(len(reloaded.usage_data['gpt_usage']), 1)
+
+    def test_legacy_migration(self):
+        """Test that an old-format JSON usage file is read, and migrated on the first write."""
+        os.remove(self.test_log_file) if os.path.exists(self.test_log_file) else None
+        legacy_data = {
+            "whisper_usage": [{"timestamp": "2024-01-01T10:00:00", "model": "whisper-1",
+                               "duration_seconds": 60, "cost": 0.006}],
+            "gpt_usage": [],
+            "total_cost": 0.006,
+            "last_updated": "2024-01-01T10:00:00"
+        }
+        with open(self.test_legacy_file, 'w') as f:
+            json.dump(legacy_data, f)
+
+        tracker = CostTracker(self.test_log_file)
+        self.assertEqual(tracker.usage_data['whisper_usage'], legacy_data['whisper_usage'])
+        self.assertAlmostEqual(tracker.usage_data['total_cost'], 0.006)
+        self.assertFalse(os.path.exists(self.test_log_file))
+
+        tracker.log_whisper_usage(duration_seconds=60)
+        tracker.close()
+        self.assertFalse(os.path.exists(self.test_legacy_file))
+        self.assertTrue(os.path.exists(f"{self.test_legacy_file}.migrated"))
+        reloaded = CostTracker(self.test_log_file)
+        self.assertEqual(len(reloaded.usage_data['whisper_usage']), 2)
+        self.assertAlmostEqual(reloaded.usage_data['total_cost'], 0.012)
+
+    def test_torn_line_is_skipped(self):
+        """Test that a line torn by a crash doesn't affect other entries."""
+        self.cost_tracker.log_whisper_usage(duration_seconds=60)
+        self.cost_tracker.flush()
+        with open(self.test_log_file, 'a') as f:
+            f.write('{"type": "whisper", "times')
+        self.cost_tracker.log_whisper_usage(duration_seconds=120)
+        self.cost_tracker.flush()
+
+        reloaded = CostTracker(self.test_log_file)
+        self.assertEqual([e['duration_seconds'] for e in reloaded.usage_data['whisper_usage']], [60, 120])
+
+    def test_latency_and_local_entries(self):
+        """Entries carry stage latencies, and local transcriptions and typing are tracked too."""
+        self.cost_tracker.log_whisper_usage(duration_seconds=60, latency={"encode": 0.02, "upload": 1.5})
+        self.cost_tracker.log_local_usage(duration_seconds=12.345, model="base", latency={"decode": 0.8})
+        self.cost_tracker.log_typing(characters=42, seconds=0.3)
+        self.cost_tracker.flush()
+
+        reloaded = CostTracker(self.test_log_file)
+        self.assertEqual(reloaded.usage_data['whisper_usage'][0]['latency'], {"encode": 0.02, "upload": 1.5})
+        self.assertEqual(reloaded.usage_data['local_usage'][0]['duration_seconds'], 12.35)
+        summary = reloaded.get_usage_summary()
+        self.assertEqual(summary['local_usage']['num_transcriptions'], 1)
+        self.assertEqual(summary['typing']['total_characters'], 42)
+        self.assertAlmostEqual(summary['total_cost'], 0.006)
+        self.assertAlmostEqual(reloaded.get_usage_history().report()['latency_percentiles']['local'][50], 0.8, places=5)
 
     def test_usage_summary(self):
         """Test usage summary generation."""
@@ -92,6 +158,187 @@ class TestCostTracker(unittest.TestCase):
         self.assertEqual(summary['gpt_usage']['total_input_tokens'], 300_000)
         self.assertEqual(summary['gpt_usage']['total_output_tokens'], 125_000)
 
+    def test_usage_since_snapshot(self):
+        """Test that the usage of a request is measured from a snapshot of the running totals."""
+        self.cost_tracker.log_whisper_usage(duration_seconds=300)
+        snapshot = self.cost_tracker.snapshot()
+        whisper_cost = self.cost_tracker.log_whisper_usage(duration_seconds=60)
+        gpt_cost = self.cost_tracker.log_gpt_usage(
+            model="gpt-4o-2024-08-06",
+            input_tokens=1000,
+            output_tokens=500,
+            original_text="Test",
+            enhanced_text="Enhanced test"
+        )
+
+        usage = self.cost_tracker.usage_since(snapshot)
+        self.assertEqual(usage['whisper_duration_seconds'], 60)
+        self.assertEqual(usage['gpt_input_tokens'] + usage['gpt_output_tokens'], 1500)
+        self.assertAlmostEqual(usage['whisper_cost'], whisper_cost)
+        self.assertAlmostEqual(usage['total_cost'], whisper_cost + gpt_cost)
+
+    def test_summary_matches_date_range_totals(self):
+        """Test that the O(1) summary agrees with a full scan and reloads the same."""
+        self.cost_tracker.log_whisper_usage(duration_seconds=300)
+        self.cost_tracker.log_gpt_usage(
+            model="gpt-4o-2024-08-06",
+            input_tokens=1000,
+            output_tokens=500,
+            original_text="Test",
+            enhanced_text="Enhanced test"
+        )
+
+        summary = self.cost_tracker.get_usage_summary()
+        scanned = self.cost_tracker.get_usage_summary(start_date="2000-01-01T00:00:00")
+        self.cost_tracker.flush()
+        reloaded = CostTracker(self.test_log_file).get_usage_summary()
+        for other in (scanned, reloaded):
+            self.assertEqual(other['whisper_usage'], summary['whisper_usage'])
+            self.assertEqual(other['gpt_usage'], summary['gpt_usage'])
+            self.assertAlmostEqual(other['total_cost'], summary['total_cost'])
+        self.assertNotIn('entries', summary['whisper_usage'])
+        self.assertEqual(len(self.cost_tracker.get_usage_summary(include_entries=True)['gpt_usage']['entries']), 1)
+
+    def test_background_writer(self):
+        """Logged entries are counted at once and written in batches by the writer thread."""
+        tracker = CostTracker(self.test_log_file, flush_interval=60, batch_size=3)
+        tracker.log_whisper_usage(duration_seconds=60)
+        tracker.log_whisper_usage(duration_seconds=60)
+        self.assertEqual(tracker.get_usage_summary()['whisper_usage']['num_transcriptions'], 2)
+        self.assertFalse(os.path.exists(self.test_log_file))
+
+        # A full batch wakes the writer without waiting for the interval
+        tracker.log_whisper_usage(duration_seconds=60)
+        for _ in range(100):
+            written = len(CostTracker(self.test_log_file).usage_data['whisper_usage'])
+            if written == 3:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(written, 3)
+
+        # Closing writes what is still queued
+        tracker.log_whisper_usage(duration_seconds=60)
+        tracker.close()
+        self.assertEqual(len(CostTracker(self.test_log_file).usage_data['whisper_usage']), 4)
+
+    def test_concurrent_writers(self):
+        """Several trackers can append to the same log without losing or tearing lines."""
+        trackers = [CostTracker(self.test_log_file, flush_interval=0.01, batch_size=5) for _ in range(3)]
+
+        def log_many(tracker):
+            for _ in range(40):
+                tracker.log_whisper_usage(duration_seconds=1)
+
+        threads = [threading.Thread(target=log_many, args=(tracker,)) for tracker in trackers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for tracker in trackers:
+            tracker.close()
+
+        with open(self.test_log_file, 'r') as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(len(lines), 120)
+
+    def test_usage_history(self):
+        """The logged entries can be loaded as columns for analytics."""
+        self._write_entries_over_days()
+        history = CostTracker(self.test_log_file).get_usage_history()
+        self.assertEqual(len(history), 24)
+        self.assertEqual(history.report()['num_enhancements'], 12)
+
+    def _write_entries_over_days(self):
+        """Write a log with entries spread over three days, three hours apart, and return them."""
+        entries = []
+        start = datetime(2024, 3, 1, 0, 30)
+        with open(self.test_log_file, 'w', encoding='utf-8') as f:
+            for i in range(24):
+                timestamp = (start + timedelta(hours=3 * i, minutes=7 * i)).isoformat()
+                if i % 2:
+                    entry = {"type": "gpt", "timestamp": timestamp, "model": "gpt-4o-2024-08-06",
+                             "input_tokens": 100 * i, "output_tokens": 10 * i, "total_cost": 0.01 * i}
+                else:
+                    entry = {"type": "whisper", "timestamp": timestamp, "model": "whisper-1",
+                             "duration_seconds": i, "cost": 0.001 * i}
+                f.write(json.dumps(entry) + "\n")
+                entries.append(entry)
+        return entries
+
+    def test_date_range_rollups(self):
+        """Date-range totals from the rollups match a scan over the entries."""
+        entries = self._write_entries_over_days()
+        cost_tracker = CostTracker(self.test_log_file)
+
+        ranges = [("2024-03-01T02:00:00", "2024-03-03T05:15:00"), ("2024-03-01", "2024-03-02"),
+                  ("2024-03-02T06:00:00", None), (None, "2024-03-01T22:59:59"),
+                  ("2024-03-01T03:37:00", "2024-03-01T03:37:00"), ("2025-01-01", None)]
+        for start_date, end_date in ranges:
+            in_range = [e for e in entries if (not start_date or e["timestamp"] >= datetime.fromisoformat(start_date).isoformat())
+                        and (not end_date or e["timestamp"] <= datetime.fromisoformat(end_date).isoformat())]
+            whisper = [e for e in in_range if e["type"] == "whisper"]
+            gpt = [e for e in in_range if e["type"] == "gpt"]
+
+            summary = cost_tracker.get_usage_summary(start_date, end_date, include_entries=True)
+            self.assertEqual(summary['whisper_usage']['num_transcriptions'], len(whisper))
+            self.assertEqual(summary['whisper_usage']['total_duration_seconds'], sum(e["duration_seconds"] for e in whisper))
+            self.assertEqual(summary['gpt_usage']['num_enhancements'], len(gpt))
+            self.assertEqual(summary['gpt_usage']['total_input_tokens'], sum(e["input_tokens"] for e in gpt))
+            self.assertAlmostEqual(summary['total_cost'], sum(e.get("cost", e.get("total_cost")) for e in in_range))
+            self.assertEqual([e["timestamp"] for e in summary['gpt_usage']['entries']], [e["timestamp"] for e in gpt])
+
+    def test_daily_usage(self):
+        """Per-day series come from the daily rollups."""
+        entries = self._write_entries_over_days()
+        cost_tracker = CostTracker(self.test_log_file)
+
+        series = cost_tracker.get_daily_usage()
+        self.assertEqual([day["date"] for day in series], ["2024-03-01", "2024-03-02", "2024-03-03", "2024-03-04"])
+        for day in series:
+            same_day = [e for e in entries if e["timestamp"].startswith(day["date"])]
+            self.assertEqual(day["num_transcriptions"] + day["num_enhancements"], len(same_day))
+            self.assertAlmostEqual(day["total_cost"], sum(e.get("cost", e.get("total_cost")) for e in same_day))
+        self.assertEqual([day["date"] for day in cost_tracker.get_daily_usage("2024-03-02", "2024-03-03")],
+                         ["2024-03-02", "2024-03-03"])
+
+    def test_compaction(self):
+        """Old days are rolled up in the log and archived, without changing any totals."""
+        entries = self._write_entries_over_days()
+        with open(self.test_log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"type": "whisper", "timestamp": datetime.now().isoformat(), "model": "whisper-1",
+                                "duration_seconds": 5, "cost": 0.0005}) + "\n")
+        cost_tracker = CostTracker(self.test_log_file)
+        summary = cost_tracker.get_usage_summary()
+        daily = cost_tracker.get_daily_usage()
+        march_2 = cost_tracker.get_usage_summary("2024-03-02", "2024-03-03")
+
+        self.assertEqual(cost_tracker.compact(retention_days=30), len(entries))
+        self.assertEqual(cost_tracker.compact(retention_days=30), 0)
+        self.assertEqual(len(cost_tracker.usage_data['whisper_usage']), 1)
+        with open(self.test_log_file, 'r', encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line['type'] for line in lines], ['rollup'] * 4 + ['whisper'])
+
+        for tracker in (cost_tracker, CostTracker(self.test_log_file)):
+            compacted = tracker.get_usage_summary()
+            self.assertEqual(compacted['whisper_usage'], summary['whisper_usage'])
+            self.assertEqual(compacted['gpt_usage']['total_input_tokens'], summary['gpt_usage']['total_input_tokens'])
+            self.assertAlmostEqual(compacted['total_cost'], summary['total_cost'])
+            self.assertEqual(tracker.get_daily_usage(), daily)
+            self.assertAlmostEqual(tracker.get_usage_summary("2024-03-02", "2024-03-03")['total_cost'],
+                                   march_2['total_cost'])
+
+            # A range starting and ending inside compacted days counts those whole days
+            partial = tracker.get_usage_summary("2024-03-02T12:00:00", "2024-03-03T05:00:00")
+            whole_days = [e for e in entries if e["timestamp"][:10] in ("2024-03-02", "2024-03-03")]
+            self.assertEqual(partial['whisper_usage']['num_transcriptions'] + partial['gpt_usage']['num_enhancements'],
+                             len(whole_days))
+            self.assertAlmostEqual(partial['total_cost'], sum(e.get("cost", e.get("total_cost")) for e in whole_days))
+
+        archived = cost_tracker.get_archived_entries("2024-03-02")
+        self.assertEqual(archived, [e for e in entries if e["timestamp"].startswith("2024-03-02")])
+        self.assertEqual(cost_tracker.get_archived_entries("2024-02-01"), [])
+
     def test_detailed_usage(self):
         """Test detailed usage report generation."""
         # Log some usage
@@ -0,0 +1,69 @@
+import os
+import time
+import unittest
+from src.enhancement_cache import EnhancementCache
+
+
+class TestEnhancementCache(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment before each test."""
+        self.test_cache_file = "test_enhancement_cache.json"
+        self.cache = EnhancementCache(self.test_cache_file, max_entries=2)
+
+    def tearDown(self):
+        """Clean up test environment after each test."""
+        self.cache.close()
+        if os.path.exists(self.test_cache_file):
+            os.remove(self.test_cache_file)
+
+    def test_key_normalization(self):
+        """Whitespace and case differences share a key; other inputs do not."""
+        key = EnhancementCache.make_key("thank you", 'en', '1', 'gpt-4o', 0.3)
+        self.assertEqual(key, EnhancementCache.make_key("  Thank   you ", 'en', '1', 'gpt-4o', 0.3))
+        self.assertNotEqual(key, EnhancementCache.make_key("thank you", 'da', '1', 'gpt-4o', 0.3))
+        self.assertNotEqual(key, EnhancementCache.make_key("thank you", 'en', '2', 'gpt-4o', 0.3))
+        self.assertNotEqual(key, EnhancementCache.make_key("thank you", 'en', '1', 'gpt-4', 0.3))
+        self.assertNotEqual(key, EnhancementCache.make_key("thank you", 'en', '1', 'gpt-4o', 0.0))
+
+    def test_hits_and_misses(self):
+        """Lookups are counted as hits or misses."""
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.put('a', "Yes.")
+        self.assertEqual(self.cache.get('a'), "Yes.")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted over the limit."""
+        self.cache.put('a', "A")
+        self.cache.put('b', "B")
+        self.cache.get('a')
+        self.cache.put('c', "C")
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), "A")
+
+    def test_persistence(self):
+        """Entries survive a reload, in LRU order."""
+        self.cache.put('a', "Tak.")
+        self.cache.put('b', "Hej.")
+        self.cache.close()
+        reloaded = EnhancementCache(self.test_cache_file, max_entries=2)
+        self.assertEqual(reloaded.get('a'), "Tak.")
+        reloaded.put('c', "Farvel.")
+        self.assertIsNone(reloaded.get('b'))
+        reloaded.close()
+
+    def test_puts_are_saved_in_the_background(self):
+        """Storing an enhancement doesn't write the file; the background writer does."""
+        cache = EnhancementCache(self.test_cache_file, max_entries=2, save_interval=0.05)
+        cache.put('a', "Tak.")
+        self.assertFalse(os.path.exists(self.test_cache_file))
+        deadline = time.time() + 5
+        while not os.path.exists(self.test_cache_file) and time.time() < deadline:
+            time.sleep(0.01)
+        cache.close()
+        self.assertEqual(EnhancementCache(self.test_cache_file).get('a'), "Tak.")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+from src.model_registry import ModelRegistry, estimate_model_size
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        """Set up a registry that fits two int8 base models (~74MB each)."""
+        self.registry = ModelRegistry(budget_mb=150)
+
+    def test_cached_model_is_not_reloaded(self):
+        """Test that a second request for the same configuration is a cache hit."""
+        key = ('base', 'cpu', 'int8', 1)
+        loader = MagicMock(side_effect=lambda: (object(), key))
+
+        first = self.registry.get(key, loader)
+        second = self.registry.get(key, loader)
+
+        self.assertIs(first, second)
+        loader.assert_called_once()
+        self.assertEqual((self.registry.hits, self.registry.misses), (1, 1))
+
+    def test_least_recently_used_model_is_evicted(self):
+        """Test that exceeding the budget evicts the least recently used model."""
+        base_cpu = ('base', 'cpu', 'int8', 1)
+        base_en = ('base.en', 'cpu', 'int8', 1)
+        tiny = ('tiny', 'cpu', 'int8', 1)
+
+        self.registry.get(base_cpu, lambda: (object(), base_cpu))
+        self.registry.get(base_en, lambda: (object(), base_en))
+        self.registry.get(base_cpu, lambda: (object(), base_cpu))  # base_en is now least recently used
+        self.registry.get(tiny, lambda: (object(), tiny))
+
+        self.assertIn(base_cpu, self.registry)
+        self.assertIn(tiny, self.registry)
+        self.assertNotIn(base_en, self.registry)
+
+    def test_fallback_is_cached_under_loaded_device(self):
+        """Test that a model that fell back to CPU isn't cached as a CUDA model."""
+        requested = ('base', 'cuda', 'float16', 1)
+        loaded = ('base', 'cpu', 'float16', 1)
+        loader = MagicMock(side_effect=lambda: (object(), loaded))
+
+        first = self.registry.get(requested, loader)
+        second = self.registry.get(requested, loader)
+
+        self.assertIs(first, second)
+        loader.assert_called_once()
+        self.assertIn(loaded, self.registry)
+        self.assertNotIn(requested, self.registry)
+
+    def test_lookups_do_not_wait_for_a_load(self):
+        """Test that a resident model is returned while another model is loading."""
+        tiny = ('tiny', 'cpu', 'int8', 1)
+        base = ('base', 'cpu', 'int8', 1)
+        cached = self.registry.get(tiny, lambda: (object(), tiny))
+        loading = threading.Event()
+        release = threading.Event()
+
+        def slow_loader():
+            loading.set()
+            release.wait(5)
+            return object(), base
+
+        loaders = [threading.Thread(target=self.registry.get, args=(base, slow_loader)) for _ in range(2)]
+        for thread in loaders:
+            thread.start()
+        self.assertTrue(loading.wait(5))
+        try:
+            self.assertIs(self.registry.get(tiny, MagicMock()), cached)
+        finally:
+            release.set()
+            for thread in loaders:
+                thread.join(5)
+        self.assertEqual(self.registry.misses, 2)  # tiny, then base loaded once for both threads
+
+    def test_estimate_model_size(self):
+        """Test the size estimate for named models."""
+        self.assertEqual(estimate_model_size('small', 'cpu', 'int8'), 244_000_000)
+        self.assertEqual(estimate_model_size('small.en', 'cuda', 'default'), 488_000_000)
+        self.assertEqual(estimate_model_size('small', 'cpu', 'default'), 976_000_000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from src.prompts import (BASE_INSTRUCTIONS, build_messages, count_tokens, get_encoder,
+                         get_system_prompt, system_prompt_tokens)
+
+
+class TestPrompts(unittest.TestCase):
+    def test_stable_content_first(self):
+        """Every prompt starts with the shared instructions and the text comes last."""
+        for language in ('da', 'en', 'fr', None):
+            self.assertTrue(get_system_prompt(language).startswith(BASE_INSTRUCTIONS))
+        messages = build_messages("hello world", 'en')
+        self.assertEqual(messages[0]['role'], 'system')
+        self.assertEqual(messages[-1], {"role": "user", "content": "Transcription: hello world"})
+
+    def test_transcription_is_labelled(self):
+        """The transcription is always labelled, so dictated questions aren't answered."""
+        question = "can you write me an email to Anna"
+        self.assertEqual(build_messages(question, 'en')[-1]['content'], f"Transcription: {question}")
+        self.assertEqual(build_messages(question, 'en', context="Hi.")[-1]['content'],
+                         f"Context: Hi.\nTranscription: {question}")
+
+    def test_prompts_are_precompiled(self):
+        """The same prompt object is returned on every call."""
+        self.assertIs(get_system_prompt('da'), get_system_prompt('da'))
+
+    def test_danish_comma_rules_appear_once(self):
+        """The Danish comma rules are not repeated."""
+        self.assertEqual(get_system_prompt('da').count('subordinate clauses'), 1)
+
+    @patch('src.prompts.tiktoken')
+    def test_cached_token_counts(self, mock_tiktoken):
+        """The encoder is loaded once and each prompt is only tokenised once per model."""
+        encoder = MagicMock()
+        encoder.encode.side_effect = lambda text: text.split()
+        mock_tiktoken.encoding_for_model.return_value = encoder
+        get_encoder.cache_clear()
+        system_prompt_tokens.cache_clear()
+
+        model = 'gpt-4o-2024-08-06'
+        self.assertIs(get_encoder(model), get_encoder(model))
+        mock_tiktoken.encoding_for_model.assert_called_once_with(model)
+
+        count = system_prompt_tokens('da', model)
+        self.assertEqual(count, len(get_system_prompt('da').split()))
+        self.assertEqual(count, count_tokens(get_system_prompt('da'), model))
+        encoder.encode.reset_mock()
+        self.assertEqual(system_prompt_tokens('da', model), count)
+        encoder.encode.assert_not_called()
+
+        get_encoder.cache_clear()
+        system_prompt_tokens.cache_clear()
+
+if __name__ == '__main__':
+    unittest.main()
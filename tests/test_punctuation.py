@@ -0,0 +1,49 @@
+import time
+import unittest
+from src.punctuation import format_text, is_clean
+
+
+class TestPunctuation(unittest.TestCase):
+    def test_spacing_and_casing(self):
+        """Whitespace is normalised, sentences are capitalised and the text is terminated."""
+        self.assertEqual(format_text("  hello  world . how are you ,friend"),
+                         "Hello world. How are you, friend.")
+        self.assertEqual(format_text("is it done? yes"), "Is it done? Yes.")
+        self.assertEqual(format_text(""), "")
+
+    def test_english_rules(self):
+        """English pronoun casing, commas and thousands grouping."""
+        self.assertEqual(format_text("i think i'm late but it is fine", 'en'),
+                         "I think I'm late, but it is fine.")
+        self.assertEqual(format_text("yes we paid 10 000 dollars", 'en'), "Yes, we paid 10,000 dollars.")
+        self.assertEqual(format_text("nothing but trouble", 'en'), "Nothing but trouble.")
+
+    def test_danish_rules(self):
+        """Danish commas before subordinate clauses, after introductory words and thousands grouping."""
+        self.assertEqual(format_text("jeg kommer hvis du vil", 'da'), "Jeg kommer, hvis du vil.")
+        self.assertEqual(format_text("nej det ved jeg ikke hvorfor", 'da'), "Nej, det ved jeg ikke hvorfor.")
+        self.assertEqual(format_text("det koster 25 000 kroner men det er godt", 'da'),
+                         "Det koster 25.000 kroner, men det er godt.")
+
+    def test_already_formatted_text_is_unchanged(self):
+        """Punctuated Whisper output passes through as is."""
+        text = "Hello, this is a test. It works, right?"
+        self.assertEqual(format_text(text, 'en'), text)
+
+    def test_is_clean(self):
+        """Long unpunctuated runs are not clean."""
+        self.assertTrue(is_clean("Thank you. See you tomorrow."))
+        self.assertFalse(is_clean(format_text(" ".join(["word"] * 20))))
+
+    def test_speed(self):
+        """Formatting a typical utterance takes well under a millisecond."""
+        text = "so i was thinking we could meet tomorrow but only if you have time which i doubt"
+        format_text(text, 'en')
+        start_time = time.perf_counter()
+        for _ in range(1000):
+            format_text(text, 'en')
+        self.assertLess((time.perf_counter() - start_time) / 1000, 0.001)
+
+
+if __name__ == '__main__':
+    unittest.main()
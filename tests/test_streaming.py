@@ -0,0 +1,94 @@
+import unittest
+from collections import namedtuple
+from unittest.mock import patch
+import numpy as np
+from src.audio_buffer import AudioBuffer
+from src.streaming import LocalAgreement, StreamingTranscriber
+
+Word = namedtuple('Word', ['start', 'end', 'word', 'probability'])
+
+def words(*texts, start=0.0):
+    """Build consecutive half-second words."""
+    return [Word(start + i * 0.5, start + (i + 1) * 0.5, f" {text}", 0.9) for i, text in enumerate(texts)]
+
+class TestLocalAgreement(unittest.TestCase):
+    def test_commits_common_prefix(self):
+        """Test that only words two hypotheses agree on are committed."""
+        agreement = LocalAgreement()
+        self.assertEqual(agreement.update(words("hello", "word")), [])
+
+        committed = agreement.update(words("Hello,", "world", "how"))
+        self.assertEqual([w.word for w in committed], [" Hello,"])
+        self.assertEqual(agreement.text(), " Hello,")
+
+    def test_tail_is_compared_after_commit(self):
+        """Test that the next hypothesis is compared with the uncommitted tail only."""
+        agreement = LocalAgreement()
+        agreement.update(words("one", "two", "tree"))
+        agreement.update(words("one", "two", "three", "four"))
+
+        committed = agreement.update(words("three", "four", "five"))
+        self.assertEqual([w.word for w in committed], [" three", " four"])
+        self.assertEqual(agreement.text(), " one two three four")
+
+class TestStreamingTranscriber(unittest.TestCase):
+    @patch('src.streaming.ConfigManager')
+    @patch('src.streaming.get_cost_tracker')
+    @patch('src.streaming.transcribe_local_words')
+    def test_finish_decodes_only_uncommitted_tail(self, mock_words, mock_get_cost_tracker, mock_config):
+        """Test that finish decodes from the last committed word and joins the text."""
+        audio_buffer = AudioBuffer(sample_rate=1000, initial_seconds=1)
+        audio_buffer.write(np.zeros(3000, dtype=np.int16))
+        emitted = []
+        streamer = StreamingTranscriber(audio_buffer, local_model=object(), word_callback=emitted.append)
+
+        # Simulate two agreeing background decodes
+        mock_words.return_value = words("good", "morning"), 'en'
+        streamer.agreement.update(streamer._decode(audio_buffer.data())[0])
+        for word in streamer.agreement.update(streamer._decode(audio_buffer.data())[0]):
+            streamer._emit(word)
+        streamer._offset = int(streamer.agreement.committed[-1].end * 1000)
+
+        mock_words.return_value = words("everyone"), 'en'
+        text = streamer.finish()
+
+        self.assertEqual(text, " good morning everyone")
+        self.assertEqual(streamer.language, 'en')
+        self.assertEqual(emitted, ["good", "morning", "everyone"])
+        self.assertEqual(len(mock_words.call_args[0][0]), 2000)  # Only audio after 1.0s
+        self.assertEqual(mock_words.call_args[1]['initial_prompt'], " good morning")
+
+    @patch('src.streaming.ConfigManager')
+    @patch('src.streaming.get_cost_tracker')
+    @patch('src.streaming.transcribe_local_words')
+    def test_finished_session_is_logged(self, mock_words, mock_get_cost_tracker, mock_config):
+        """Test that a finished session is logged as one local transcription of the whole recording."""
+        audio_buffer = AudioBuffer(sample_rate=1000, initial_seconds=1)
+        audio_buffer.write(np.zeros(2500, dtype=np.int16))
+        mock_words.return_value = words("hello"), 'en'
+        mock_config.get_config_value.return_value = 'base'
+
+        StreamingTranscriber(audio_buffer, local_model=object()).finish()
+
+        mock_cost_tracker = mock_get_cost_tracker.return_value
+        mock_cost_tracker.log_local_usage.assert_called_once()
+        args, kwargs = mock_cost_tracker.log_local_usage.call_args
+        self.assertEqual(args, (2.5, 'base'))
+        self.assertIn('decode', kwargs['latency'])
+
+    @patch('src.streaming.ConfigManager')
+    @patch('src.streaming.transcribe_local_words', side_effect=RuntimeError("CUDA out of memory"))
+    def test_failed_decode_is_reported(self, mock_words, mock_config):
+        """Test that a failing background decode stops streaming and flags the failure."""
+        audio_buffer = AudioBuffer(sample_rate=1000, initial_seconds=1)
+        streamer = StreamingTranscriber(audio_buffer, local_model=object(), interval=0.1)
+        streamer.start()
+        audio_buffer.write(np.zeros(500, dtype=np.int16))
+        streamer._thread.join(5)
+
+        self.assertFalse(streamer._thread.is_alive())
+        self.assertTrue(streamer.failed)
+        mock_words.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from src.text_edits import EditError, apply_edits, parse_edits
+
+
+class TestTextEdits(unittest.TestCase):
+    def setUp(self):
+        self.text = "hello world how are you i am fine"
+
+    def test_apply_edits(self):
+        """Edits are applied at their offsets, independent of their order."""
+        edits = parse_edits('[[24,"you i","you? I"],[0,"hello world how","Hello world, how"]]')
+        self.assertEqual(apply_edits(self.text, edits), "Hello world, how are you? I am fine")
+
+    def test_empty_edit_list(self):
+        """An empty edit list leaves the text unchanged."""
+        self.assertEqual(apply_edits(self.text, parse_edits('[]')), self.text)
+
+    def test_code_fence(self):
+        """Edit lists wrapped in a Markdown code fence are accepted."""
+        self.assertEqual(parse_edits('```json\n[[0,"hello","Hello"]]\n```'), [(0, "hello", "Hello")])
+
+    def test_miscounted_offset(self):
+        """An offset that is off by a few characters still applies."""
+        self.assertEqual(apply_edits(self.text, [(22, "you i", "you? I")]),
+                         "hello world how are you? I am fine")
+
+    def test_invalid_edits(self):
+        """Unparseable, missing, empty or overlapping edits raise EditError."""
+        with self.assertRaises(EditError):
+            parse_edits("Hello world, how are you?")
+        with self.assertRaises(EditError):
+            parse_edits('[[0,"","Hello "]]')
+        with self.assertRaises(EditError):
+            apply_edits(self.text, [(0, "goodbye", "Goodbye")])
+        with self.assertRaises(EditError):
+            apply_edits(self.text, [(0, "hello world", "Hello world"), (6, "world how", "world, how")])
+
+
+if __name__ == '__main__':
+    unittest.main()
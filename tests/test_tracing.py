@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import timeit
+import unittest
+from src import tracing
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.trace_file = "test_trace.json"
+        tracing.clear()
+        tracing.configure(True)
+
+    def tearDown(self):
+        tracing.configure(False)
+        tracing.clear()
+        if os.path.exists(self.trace_file):
+            os.remove(self.trace_file)
+
+    def test_disabled_records_nothing(self):
+        """Spans and instants are no-ops while tracing is off."""
+        tracing.configure(False)
+        with tracing.span('encoding'):
+            pass
+        tracing.instant('key_press')
+        self.assertEqual(tracing.stage_histograms(), {})
+        self.assertEqual(tracing.export_chrome_trace(self.trace_file), 0)
+
+    def test_disabled_overhead(self):
+        """A disabled span costs about as much as an empty function call."""
+        tracing.configure(False)
+
+        def traced():
+            with tracing.span('typing', characters=10):
+                pass
+
+        per_call = min(timeit.repeat(traced, number=10_000, repeat=3)) / 10_000
+        self.assertLess(per_call, 1e-5)
+
+    def test_chrome_trace_export(self):
+        """Spans and instants are written as Chrome trace events, with thread names."""
+        tracing.instant('key_press')
+        with tracing.span('api_upload', size=3):
+            pass
+
+        def worker():
+            with tracing.span('model_decode_chunk'):
+                pass
+
+        thread = threading.Thread(target=worker, name='decoder')
+        thread.start()
+        thread.join()
+
+        self.assertEqual(tracing.export_chrome_trace(self.trace_file), 3)
+        with open(self.trace_file, 'r', encoding='utf-8') as f:
+            events = json.load(f)['traceEvents']
+        by_name = {event['name']: event for event in events if event['ph'] != 'M'}
+        self.assertEqual(by_name['key_press']['ph'], 'i')
+        self.assertEqual(by_name['api_upload']['ph'], 'X')
+        self.assertEqual(by_name['api_upload']['args'], {'size': 3})
+        self.assertGreaterEqual(by_name['api_upload']['dur'], 0)
+        self.assertLessEqual(by_name['key_press']['ts'], by_name['api_upload']['ts'])
+        thread_names = {event['args']['name'] for event in events if event['ph'] == 'M'}
+        self.assertIn('decoder', thread_names)
+
+    def test_stage_histograms(self):
+        """Span durations are summarised per stage."""
+        for _ in range(5):
+            with tracing.span('encoding'):
+                pass
+        with tracing.span('typing'):
+            pass
+        tracing.instant('first_speech')
+
+        histograms = tracing.stage_histograms(bins=4)
+        self.assertEqual(set(histograms), {'encoding', 'typing'})
+        self.assertEqual(histograms['encoding']['count'], 5)
+        self.assertEqual(sum(histograms['encoding']['counts']), 5)
+        self.assertEqual(len(histograms['encoding']['bin_edges_ms']), 5)
+        self.assertLessEqual(histograms['encoding']['p50_ms'], histograms['encoding']['max_ms'])
+        self.assertIn('encoding', tracing.format_histograms(histograms))
+
+    def test_event_limit(self):
+        """Only the most recent events are kept."""
+        tracing.configure(True, max_events=3)
+        try:
+            for i in range(5):
+                tracing.instant(f'event {i}')
+            self.assertEqual(tracing.export_chrome_trace(self.trace_file), 3)
+        finally:
+            tracing.configure(False, max_events=100_000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,11 @@
 import unittest
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 import numpy as np
-from src.transcription import transcribe_api, enhance_transcription
+from src.punctuation import format_text
+from src.transcription import (transcribe, transcribe_api, exceeds_max_duration, _encode_for_upload, _response_language,
+                               warm_up_local_model, enhance_transcription, enhance_low_confidence_spans,
+                               post_process_transcription, StreamingFormatter)
 from src.cost_tracker import CostTracker
 
 class TestTranscription(unittest.TestCase):
@@ -10,7 +14,7 @@ class TestTranscription(unittest.TestCase):
         self.mock_audio_data = np.zeros(16000, dtype=np.int16)  # 1 second of silence
         self.mock_text = "This is a test transcription."
 
-    @patch('src.transcription.OpenAI')
+    @patch('src.transcription.get_openai_client')
     @patch('src.transcription.cost_tracker')
     def test_transcribe_api(self, mock_cost_tracker, mock_openai):
         """Test the Whisper API transcription with cost tracking."""
@@ -34,7 +38,148 @@ class TestTranscription(unittest.TestCase):
         # Verify result
         self.assertEqual(result, "Test transcription")
 
-    @patch('src.transcription.OpenAI')
+    @patch('src.transcription.cost_tracker')
+    def test_detected_language_is_passed_on(self, mock_cost_tracker):
+        """Test that the language of the decode producing the transcript reaches post-processing."""
+        config = {
+            'model_options': {
+                'local': {'model': 'base', 'condition_on_previous_text': True, 'vad_filter': False},
+                'common': {'language': 'auto', 'initial_prompt': None, 'temperature': 0.0},
+            },
+            'recording_options': {'sample_rate': 16000},
+        }
+        local_model = MagicMock()
+        local_model.transcribe.return_value = ([MagicMock(text=" Hej med dig")], MagicMock(language='da'))
+
+        with patch('src.transcription.ConfigManager') as mock_config, \
+                patch('src.transcription.post_process_transcription') as mock_post_process:
+            mock_config.get_config_section.side_effect = lambda section: config[section]
+            mock_config.get_config_value.return_value = False
+            transcribe(self.mock_audio_data, local_model)
+
+        self.assertEqual(mock_post_process.call_args[0], (" Hej med dig", None, None, 'da'))
+
+    def test_api_language_is_unknown_without_a_language_field(self):
+        """Test that the API path doesn't assume English when the response has no language."""
+        auto = {'common': {'language': 'auto'}}
+        with patch('src.transcription.ConfigManager'):
+            self.assertIsNone(_response_language(SimpleNamespace(text="jeg bor i byen"), auto))
+            self.assertEqual(_response_language(SimpleNamespace(text="jeg bor i byen"), {'common': {'language': 'da'}}),
+                             'da')
+            self.assertEqual(_response_language(SimpleNamespace(text="hej", language='da'), auto), 'da')
+        # Without a language only neutral rules apply, so the Danish "i" isn't taken for the English "I"
+        self.assertEqual(format_text("jeg bor i byen", None), "Jeg bor i byen.")
+
+    def test_max_duration_zero_is_unlimited(self):
+        """Test that a max_duration of 0, the default, doesn't limit the recording length."""
+        three_minutes = np.zeros(16000 * 180, dtype=np.int16)
+        with patch('src.transcription.ConfigManager') as mock_config:
+            mock_config.get_config_section.return_value = {'sample_rate': 16000, 'max_duration': 0}
+            self.assertFalse(exceeds_max_duration(three_minutes))
+            mock_config.get_config_section.return_value = {'sample_rate': 16000, 'max_duration': 120}
+            self.assertTrue(exceeds_max_duration(three_minutes))
+
+    def test_warm_up_bypasses_vad(self):
+        """Test that the warm-up decode isn't dropped by the VAD filter, so the model actually runs."""
+        config = {
+            'model_options': {
+                'local': {'condition_on_previous_text': True, 'vad_filter': True},
+                'common': {'language': 'auto', 'initial_prompt': None, 'temperature': 0.0},
+            },
+            'recording_options': {'sample_rate': 16000},
+        }
+        local_model = MagicMock()
+        local_model.transcribe.return_value = ([], MagicMock(language='en'))
+
+        with patch('src.transcription.ConfigManager') as mock_config:
+            mock_config.get_config_section.side_effect = lambda section: config[section]
+            warm_up_local_model(local_model)
+
+        self.assertFalse(local_model.transcribe.call_args[1]['vad_filter'])
+
+    @patch('src.transcription.API_MAX_UPLOAD_BYTES', 64 * 1024)
+    @patch('src.transcription.get_openai_client')
+    @patch('src.transcription.cost_tracker')
+    def test_transcribe_api_chunked(self, mock_cost_tracker, mock_openai):
+        """Test that recordings over the upload limit are split and every piece is billed."""
+        config = {
+            'model_options': {
+                'api': {'model': 'whisper-1', 'base_url': None, 'upload_format': 'wav',
+                        'max_concurrent_requests': 2},
+                'common': {'initial_prompt': None, 'temperature': 0.0},
+            },
+            'recording_options': {'sample_rate': 16000},
+        }
+        mock_client = MagicMock()
+        mock_client.audio.transcriptions.create.side_effect = (
+            lambda **kwargs: MagicMock(text=f"piece {len(kwargs['file'].getvalue())}"))
+        mock_openai.return_value = mock_client
+        mock_cost_tracker.log_whisper_usage.return_value = 0.0
+        audio_data = (np.random.default_rng(0).standard_normal(16000 * 10) * 1000).astype(np.int16)
+
+        with patch('src.transcription.ConfigManager') as mock_config:
+            mock_config.get_config_section.side_effect = lambda section: config[section]
+            result = transcribe_api(audio_data)
+
+        # 10 seconds of 16 kHz WAV is ~312KB, so at least five pieces are needed
+        calls = mock_client.audio.transcriptions.create.call_count
+        self.assertGreaterEqual(calls, 5)
+        self.assertEqual(len(result.split()), 2 * calls)
+        for call in mock_client.audio.transcriptions.create.call_args_list:
+            self.assertLessEqual(len(call[1]['file'].getvalue()), 64 * 1024)
+
+        # Each piece is logged, overlaps included
+        self.assertEqual(mock_cost_tracker.log_whisper_usage.call_count, calls)
+        billed = sum(call[1]['duration_seconds'] for call in mock_cost_tracker.log_whisper_usage.call_args_list)
+        self.assertGreaterEqual(billed, 10.0)
+
+    @patch('src.transcription.API_MAX_UPLOAD_BYTES', 64 * 1024)
+    @patch('src.transcription.get_openai_client')
+    @patch('src.transcription.cost_tracker')
+    def test_transcribe_api_chunked_resplits_and_keeps_pieces(self, mock_cost_tracker, mock_openai):
+        """Test that pieces encoding over the limit are split again, and a failed piece doesn't lose the rest."""
+        config = {
+            'model_options': {
+                'api': {'model': 'whisper-1', 'base_url': None, 'upload_format': 'wav',
+                        'max_concurrent_requests': 2},
+                'common': {'initial_prompt': None, 'temperature': 0.0},
+            },
+            'recording_options': {'sample_rate': 16000},
+        }
+        requests = []
+
+        def create(**kwargs):
+            requests.append(kwargs['file'])
+            if len(requests) == 2:
+                raise ConnectionError("Connection reset")
+            return MagicMock(text=f"piece {len(requests)}")
+
+        mock_client = MagicMock()
+        mock_client.audio.transcriptions.create.side_effect = create
+        mock_openai.return_value = mock_client
+        mock_cost_tracker.log_whisper_usage.return_value = 0.0
+        audio_data = (np.random.default_rng(0).standard_normal(16000 * 10) * 1000).astype(np.int16)
+        encode = _encode_for_upload
+
+        def encode_poorly(audio, sample_rate, api_options):
+            # Pieces over a second compress worse than the whole recording did
+            audio_file, size, encode_time = encode(audio, sample_rate, api_options)
+            return audio_file, size * 2 if sample_rate < len(audio) < len(audio_data) else size, encode_time
+
+        with patch('src.transcription.ConfigManager') as mock_config, \
+                patch('src.transcription._encode_for_upload', side_effect=encode_poorly):
+            mock_config.get_config_section.side_effect = lambda section: config[section]
+            result = transcribe_api(audio_data)
+
+        # Every upload is a re-split piece of at most a second
+        self.assertGreaterEqual(len(requests), 10)
+        for audio_file in requests:
+            self.assertLessEqual(len(audio_file.getvalue()), 16000 * 2 + 1024)
+        # Only the failed piece is missing
+        self.assertEqual(len(result.split()), 2 * (len(requests) - 1))
+        self.assertEqual(mock_cost_tracker.log_whisper_usage.call_count, len(requests) - 1)
+
+    @patch('src.transcription.get_openai_client')
     @patch('src.transcription.cost_tracker')
     def test_enhance_transcription(self, mock_cost_tracker, mock_openai):
         """Test GPT enhancement with cost tracking."""
@@ -63,7 +208,213 @@ class TestTranscription(unittest.TestCase):
         # Verify result
         self.assertEqual(result, "Enhanced test transcription")
 
-    @patch('src.transcription.OpenAI')
+    @patch('src.transcription.get_openai_client')
+    @patch('src.transcription.cost_tracker')
+    def test_enhance_transcription_streamed(self, mock_cost_tracker, mock_openai):
+        """Test streamed enhancement passes deltas on and bills the reported usage."""
+        deltas = ["Enhanced", " test", " transcription."]
+        chunks = [MagicMock(choices=[MagicMock(delta=MagicMock(content=delta))], usage=None)
+                  for delta in deltas]
+        chunks.append(MagicMock(choices=[], usage=MagicMock(prompt_tokens=120, completion_tokens=4)))
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.return_value = iter(chunks)
+        mock_openai.return_value = mock_client
+        mock_cost_tracker.log_gpt_usage.return_value = 0.0
+
+        received = []
+        with patch('src.transcription.ConfigManager') as mock_config:
+            mock_config.get_config_section.return_value = {'enhance_with_gpt': True}
+            result = enhance_transcription(self.mock_text, received.append)
+
+        self.assertEqual(received, deltas)
+        self.assertEqual(result, "Enhanced test transcription.")
+        kwargs = mock_client.chat.completions.create.call_args[1]
+        self.assertTrue(kwargs['stream'])
+        args = mock_cost_tracker.log_gpt_usage.call_args[1]
+        self.assertEqual(args['input_tokens'], 120)
+        self.assertEqual(args['output_tokens'], 4)
+
+    @patch('src.transcription.get_openai_client')
+    @patch('src.transcription.cost_tracker')
+    def test_enhancement_cache_hit(self, mock_cost_tracker, mock_openai):
+        """Test that a cached enhancement skips the API and is logged at zero cost."""
+        with patch('src.transcription.enhancement_cache') as mock_cache, \
+                patch('src.transcription.ConfigManager') as mock_config:
+            mock_config.get_config_section.return_value = {'enhance_with_gpt': True,
+                                                           'enhancement_cache': True}
+            mock_cache.get.return_value = "Thank you."
+            result = enhance_transcription("thank you")
+
+        self.assertEqual(result, "Thank you.")
+        mock_openai.assert_not_called()
+        args = mock_cost_tracker.log_gpt_usage.call_args[1]
+        self.assertEqual((args['input_tokens'], args['output_tokens']), (0, 0))
+        self.assertTrue(args['cached'])
+
+    @patch('src.transcription.get_openai_client')
+    @patch('src.transcription.cost_tracker')
+    def test_enhance_transcription_edits(self, mock_cost_tracker, mock_openai):
+        """Test that edit lists are applied locally and fall back to full text when invalid."""
+        def response(content):
+            return MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        mock_cost_tracker.log_gpt_usage.return_value = 0.0
+
+        with patch('src.transcription.ConfigManager') as mock_config, \
+                patch('src.transcription.count_tokens', return_value=5), \
+                patch('src.transcription.system_prompt_tokens', return_value=100):
+            mock_config.get_config_section.return_value = {'enhance_with_gpt': True,
+                                                           'enhancement_mode': 'edits'}
+            mock_client.chat.completions.create.side_effect = [response('[[0,"this is","This is"]]')]
+            self.assertEqual(enhance_transcription("this is a test"), "This is a test")
+
+            mock_client.chat.completions.create.side_effect = [response('not an edit list'),
+                                                                response("This is a test.")]
+            self.assertEqual(enhance_transcription("this is a test"), "This is a test.")
+
+        # One edits request, then a failed edits request and the full-text fallback
+        self.assertEqual(mock_client.chat.completions.create.call_count, 3)
+        self.assertEqual(mock_cost_tracker.log_gpt_usage.call_count, 3)
+
+    def test_enhance_low_confidence_spans(self):
+        """Test that only low-confidence words are enhanced, with the words before them as context."""
+        words = " one two three four five six seven eight nine ten eleven twelve".split(' ')[1:]
+        confidences = [(f' {word}', 0.9) for word in words]
+
+        with patch('src.transcription.enhance_transcription') as mock_enhance, \
+                patch('src.transcription.ConfigManager'):
+            # Everything is reliable, so GPT is skipped
+            self.assertEqual(enhance_low_confidence_spans(confidences, 0.6, 1), " " + " ".join(words))
+            mock_enhance.assert_not_called()
+
+            # Two unreliable words get their own spans; what GPT adds at the ends is dropped
+            confidences[1] = (' too', 0.2)
+            confidences[9] = (' then', 0.3)
+            corrections = {"too": "Two.", "then": "Ten,"}
+            mock_enhance.side_effect = lambda text, context=None, language=None: corrections[text]
+            result = enhance_low_confidence_spans(confidences, 0.6, 1)
+
+        # Spans are enhanced concurrently, so the requests may be sent in any order
+        self.assertEqual(sorted((call[0][0], call[1]['context']) for call in mock_enhance.call_args_list),
+                         [("then", "nine"), ("too", "one")])
+        self.assertEqual(result, " " + " ".join(words))
+
+    def test_low_confidence_span_starting_a_sentence(self):
+        """Test that a span starting a sentence may be capitalised, and keeps its own end punctuation."""
+        confidences = [(' hello', 0.2), (' there.', 0.9), (' how', 0.9), (' r', 0.1), (' you?', 0.9),
+                       (' fine', 0.9), (' thanks', 0.9), (' a', 0.9), (' lot.', 0.9)]
+
+        with patch('src.transcription.enhance_transcription') as mock_enhance, \
+                patch('src.transcription.ConfigManager'):
+            mock_enhance.side_effect = lambda text, context=None, language=None: {"hello": "Hello,", "r": "Are"}[text]
+            result = enhance_low_confidence_spans(confidences, 0.6, 0)
+
+        self.assertEqual(result, " Hello there. how are you? fine thanks a lot.")
+
+    def test_zero_confidence_settings_are_kept(self):
+        """Test that a confidence threshold or context of 0 isn't replaced by the default."""
+        confidences = [(' one', 0.9), (' too', 0.2), (' three', 0.9)]
+        post_processing = {'enhance_with_gpt': True, 'confidence_gating': True, 'confidence_threshold': 0.6,
+                           'confidence_context_words': 0, 'remove_trailing_period': False,
+                           'add_trailing_space': False, 'remove_capitalization': False}
+
+        with patch('src.transcription.enhance_transcription') as mock_enhance, \
+                patch('src.transcription.ConfigManager') as mock_config:
+            mock_config.get_config_section.return_value = post_processing
+            mock_enhance.side_effect = lambda text, context=None, language=None: 'two'
+            self.assertEqual(post_process_transcription("one too three", confidences=confidences), "one two three")
+
+            # A threshold of 0 trusts every word
+            post_processing['confidence_threshold'] = 0.0
+            mock_enhance.reset_mock()
+            self.assertEqual(post_process_transcription("one too three", confidences=confidences), "one too three")
+            mock_enhance.assert_not_called()
+
+    def _enhance_chunked(self, text, post_processing):
+        """Enhance `text` with the chunk requests mocked, returning (result, deltas, (chunk, context) calls)."""
+        calls = []
+
+        def enhance_once(chunk, delta_callback, context, language, post_processing):
+            calls.append((chunk, context))
+            return chunk.upper()
+
+        received = []
+        with patch('src.transcription.ConfigManager') as mock_config, \
+                patch('src.transcription._enhance_once', side_effect=enhance_once):
+            mock_config.get_config_section.return_value = post_processing
+            result = enhance_transcription(text, received.append)
+        return result, received, calls
+
+    def test_parallel_enhancement(self):
+        """Test that long transcripts are enhanced as concurrent sentence chunks, in order."""
+        sentences = [f"sentence number {i} is here." for i in range(12)]
+        post_processing = {'enhance_with_gpt': True, 'parallel_enhancement_threshold': 20,
+                           'enhancement_chunk_words': 10, 'enhancement_workers': 3}
+
+        result, received, calls = self._enhance_chunked(' '.join(sentences), post_processing)
+
+        self.assertEqual(result, ' '.join(sentences).upper())
+        self.assertEqual(''.join(received), result)
+        self.assertEqual(len(calls), 6)
+        # Every chunk but the first gets the previous chunk's last sentence as context
+        contexts = dict(calls)
+        self.assertIsNone(contexts["sentence number 0 is here. sentence number 1 is here."])
+        self.assertEqual(contexts["sentence number 2 is here. sentence number 3 is here."],
+                         "sentence number 1 is here.")
+
+    def test_chunks_larger_than_threshold_are_not_split_again(self):
+        """Test that chunk sizes at or above the threshold are clamped and each chunk is one request."""
+        sentences = [f"sentence number {i} is here." for i in range(12)]
+        post_processing = {'enhance_with_gpt': True, 'parallel_enhancement_threshold': 20,
+                           'enhancement_chunk_words': 30, 'enhancement_workers': 3}
+
+        result, _, calls = self._enhance_chunked(' '.join(sentences), post_processing)
+
+        self.assertEqual(result, ' '.join(sentences).upper())
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(all(len(chunk.split()) <= 20 for chunk, _ in calls))
+
+    @patch('src.transcription.get_openai_client')
+    @patch('src.transcription.cost_tracker')
+    def test_stream_failure_keeps_original(self, mock_cost_tracker, mock_openai):
+        """Test that a stream breaking off after a delta is reported, and the original text is typed after it."""
+        def broken_stream():
+            yield MagicMock(choices=[MagicMock(delta=MagicMock(content="Enhanced"))], usage=None)
+            raise ConnectionError("stream reset")
+
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.side_effect = lambda **kwargs: broken_stream()
+        mock_openai.return_value = mock_client
+        post_processing = {'enhance_with_gpt': True, 'stream_enhancement': True, 'remove_trailing_period': False,
+                           'add_trailing_space': False, 'remove_capitalization': False}
+
+        with patch('src.transcription.ConfigManager') as mock_config:
+            mock_config.get_config_section.return_value = post_processing
+            with self.assertRaises(ConnectionError):
+                enhance_transcription(self.mock_text, lambda delta: None)
+
+            emitted = []
+            result = post_process_transcription(self.mock_text, emitted.append)
+
+        self.assertEqual(result, self.mock_text)
+        self.assertEqual(''.join(emitted), f"Enhanced {self.mock_text}")
+        mock_cost_tracker.log_gpt_usage.assert_not_called()
+
+    def test_streaming_formatter(self):
+        """Test that streamed text is formatted like the complete text."""
+        post_processing = {'remove_trailing_period': True, 'add_trailing_space': True,
+                           'remove_capitalization': True}
+        emitted = []
+        formatter = StreamingFormatter(post_processing, emitted.append)
+        for delta in ["  Hello.", " World", ".", "  "]:
+            formatter.feed(delta)
+        # The trailing period and whitespace are held back until the end
+        self.assertEqual(''.join(emitted), "hello. world")
+        self.assertEqual(formatter.finish(), "hello. world ")
+        self.assertEqual(''.join(emitted), "hello. world ")
+
+    @patch('src.transcription.get_openai_client')
     @patch('src.transcription.cost_tracker')
     def test_enhancement_disabled(self, mock_cost_tracker, mock_openai):
         """Test that enhancement is skipped when disabled in config."""
@@ -81,7 +432,7 @@ class TestTranscription(unittest.TestCase):
             # Verify original text is returned unchanged
             self.assertEqual(result, self.mock_text)
 
-    @patch('src.transcription.OpenAI')
+    @patch('src.transcription.get_openai_client')
     @patch('src.transcription.cost_tracker')
     def test_error_handling(self, mock_cost_tracker, mock_openai):
         """Test error handling in transcription and enhancement."""
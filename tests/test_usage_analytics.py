@@ -0,0 +1,95 @@
+import math
+import unittest
+import numpy as np
+from src.usage_analytics import GPT, LOCAL, TYPING, WHISPER, UsageHistory
+
+
+class TestUsageAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.whisper_entries = [
+            {"timestamp": f"2024-03-0{day}T10:00:00", "model": "whisper-1", "duration_seconds": 60 * day,
+             "cost": 0.006 * day, "latency": {"encode": 0.1 * day, "upload": 0.4 * day}}
+            for day in (1, 2, 4)
+        ]
+        self.gpt_entries = [
+            {"timestamp": "2024-03-01T10:00:05", "model": "gpt-4o-2024-08-06", "input_tokens": 100,
+             "output_tokens": 50, "total_cost": 0.01},
+            {"timestamp": "2024-03-04T09:00:00", "model": "gpt-3.5-turbo", "input_tokens": 200,
+             "output_tokens": 20, "total_cost": 0.002},
+        ]
+        self.local_entries = [
+            {"timestamp": "2024-03-03T12:00:00", "model": "large-v3", "duration_seconds": 30, "cost": 0.0,
+             "latency": {"decode": 3.0}},
+        ]
+        self.typing_entries = [
+            {"timestamp": "2024-03-03T12:00:04", "characters": 80, "latency": {"typing": 0.25}},
+        ]
+        self.history = UsageHistory.from_entries({"whisper": self.whisper_entries, "gpt": self.gpt_entries,
+                                                  "local": self.local_entries, "typing": self.typing_entries})
+
+    def test_columns(self):
+        """Rows are sorted by time and models stored as indices."""
+        records = self.history.to_records()
+        self.assertEqual(len(self.history), 7)
+        self.assertTrue(np.all(np.diff(records["timestamp"]) >= np.timedelta64(0)))
+        self.assertEqual(records["type"].tolist(), [WHISPER, GPT, WHISPER, LOCAL, TYPING, GPT, WHISPER])
+        self.assertEqual(self.history.models[records["model"][5]], "gpt-3.5-turbo")
+        self.assertEqual(self.history.models[records["model"][4]], "typing")
+        self.assertAlmostEqual(float(records["latency_seconds"][2]), 1.0)
+        self.assertTrue(np.isnan(records["latency_seconds"][1]))
+        rebuilt = UsageHistory.from_records(records[::-1], self.history.models)
+        self.assertEqual(rebuilt.to_records()["timestamp"].tolist(), records["timestamp"].tolist())
+        np.testing.assert_array_equal(rebuilt.columns["latency_seconds"], self.history.columns["latency_seconds"])
+
+    def test_between(self):
+        """Date ranges are inclusive and select rows by timestamp."""
+        self.assertEqual(len(self.history.between("2024-03-02", "2024-03-04T09:00:00")), 4)
+        self.assertEqual(len(self.history.between(start_date="2024-03-04")), 2)
+        self.assertEqual(len(self.history.between(end_date="2024-01-01")), 0)
+
+    def test_percentiles(self):
+        """Percentiles ignore rows where the column wasn't recorded."""
+        latencies = self.history.percentiles("latency_seconds", (0, 50, 100), entry_type=WHISPER)
+        self.assertEqual(latencies, {0: 0.5, 50: 1.0, 100: 2.0})
+        self.assertEqual(self.history.percentiles("latency_seconds", (50,), entry_type=LOCAL), {50: 3.0})
+        tokens = self.history.percentiles("input_tokens", (50,), entry_type=GPT, model="gpt-3.5-turbo")
+        self.assertEqual(tokens, {50: 200.0})
+        self.assertTrue(math.isnan(self.history.percentiles("cost", (50,), model="gpt-4")[50]))
+
+    def test_by_model(self):
+        """Usage is broken down per model."""
+        breakdown = self.history.by_model()
+        self.assertEqual(breakdown["whisper-1"]["requests"], 3)
+        self.assertAlmostEqual(breakdown["whisper-1"]["duration_seconds"], 420)
+        self.assertEqual(breakdown["gpt-4o-2024-08-06"]["output_tokens"], 50)
+        self.assertAlmostEqual(breakdown["gpt-3.5-turbo"]["cost"], 0.002)
+
+    def test_daily_totals_and_moving_average(self):
+        """Daily series include days without usage, and averages use the days available."""
+        days, sums = self.history.daily_totals("cost")
+        self.assertEqual([str(day) for day in days], ["2024-03-01", "2024-03-02", "2024-03-03", "2024-03-04"])
+        np.testing.assert_allclose(sums, [0.016, 0.012, 0.0, 0.026])
+
+        _, averages = self.history.moving_average("cost", window_days=2)
+        np.testing.assert_allclose(averages, [0.016, 0.014, 0.006, 0.013])
+
+        days, sums = UsageHistory.from_entries({}).daily_totals()
+        self.assertEqual((len(days), len(sums)), (0, 0))
+
+    def test_cost_per_minute(self):
+        """Cost per minute sent to the API includes enhancement costs."""
+        self.assertAlmostEqual(self.history.cost_per_minute(), (0.042 + 0.012) / 7)
+        self.assertTrue(math.isnan(UsageHistory.from_entries({"gpt": self.gpt_entries}).cost_per_minute()))
+
+    def test_report(self):
+        """The report combines the queries above."""
+        report = self.history.report()
+        self.assertEqual((report["num_transcriptions"], report["num_enhancements"]), (3, 2))
+        self.assertEqual((report["num_local_transcriptions"], report["num_typed"]), (1, 1))
+        self.assertEqual(report["latency_percentiles"]["typing"][50], 0.25)
+        self.assertAlmostEqual(report["total_cost"], 0.054)
+        self.assertEqual(set(report["by_model"]), {"whisper-1", "gpt-4o-2024-08-06", "gpt-3.5-turbo", "large-v3", "typing"})
+
+
+if __name__ == '__main__':
+    unittest.main()